@@ -0,0 +1,7 @@
+"""
+Dependency-free benchmarks for Tokamak's router.
+
+Run the whole suite with `python -m benchmark`; see `benchmark.suite` for options.
+The Werkzeug comparison in `benchmark.compare_werkzeug` additionally requires
+the "benchmarks" extra.
+"""
@@ -0,0 +1,103 @@
+"""
+Compares a `Tree` used as a mapping with a plain `dict`, on keys that share long
+prefixes (URLs and file paths), for memory and exact-key lookup speed:
+
+    $ python -m benchmark.compare_dict --keys 200000
+
+Memory is what `tracemalloc` sees retained after building each container from the
+same (already allocated) list of keys. A dict holds on to those keys while the tree
+only stores labels, so the size of the keys is added to the dict's figure.
+"""
+import argparse
+import gc
+import random
+import string
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from tokamak.radix_tree import Tree
+
+
+def _token(rng: random.Random, length: int) -> str:
+    return "".join(rng.choices(string.ascii_lowercase + string.digits, k=length))
+
+
+def url_keys(count: int, seed: int = 0) -> list[str]:
+    """URLs of a few hosts, with a handful of sections each"""
+    rng = random.Random(seed)
+    hosts = [f"/https/www.{_token(rng, 8)}.com" for _ in range(20)]
+    sections = ["products", "blog/posts", "help/articles", "users/profiles", "static/img"]
+    keys: set[str] = set()
+    while len(keys) < count:
+        keys.add(f"{rng.choice(hosts)}/{rng.choice(sections)}/{_token(rng, rng.randint(6, 14))}")
+    return sorted(keys)
+
+
+def file_keys(count: int, seed: int = 0) -> list[str]:
+    """File paths in a deep directory hierarchy"""
+    rng = random.Random(seed)
+    directories = ["/srv/data"]
+    while len(directories) < max(1, count // 20):
+        directories.append(f"{rng.choice(directories)}/{_token(rng, rng.randint(3, 10))}")
+    keys: set[str] = set()
+    while len(keys) < count:
+        name = f"{_token(rng, rng.randint(4, 12))}.{rng.choice(['json', 'csv', 'parquet'])}"
+        keys.add(f"{rng.choice(directories)}/{name}")
+    return sorted(keys)
+
+
+def build_tree(keys: list[str]) -> Tree:
+    new_tree = Tree()
+    for idx, key in enumerate(keys):
+        new_tree[key] = idx
+    return new_tree
+
+
+def build_dict(keys: list[str]) -> dict[str, int]:
+    return {key: idx for idx, key in enumerate(keys)}
+
+
+def measure(
+    build: Callable[[list[str]], Any], keys: list[str], lookups: list[str], holds_keys: bool
+) -> dict[str, float]:
+    gc.collect()
+    tracemalloc.start()
+    container = build(keys)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if holds_keys:
+        retained += sum(sys.getsizeof(key) for key in keys)
+
+    get = container.__getitem__
+    start = time.perf_counter()
+    for key in lookups:
+        get(key)
+    elapsed = time.perf_counter() - start
+    return {"bytes_per_key": retained / len(keys), "lookups_per_sec": len(lookups) / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=50_000, help="keys in each key set")
+    parser.add_argument("--lookups", type=int, default=100_000, help="lookups per container")
+    args = parser.parse_args()
+
+    print(f"{'key set'.ljust(8)} {'container'.ljust(10)} {'B/key':>8} {'lookups/s':>12}")
+    for name, make_keys in (("urls", url_keys), ("files", file_keys)):
+        keys = make_keys(args.keys)
+        rng = random.Random(1)
+        lookups = [rng.choice(keys) for _ in range(args.lookups)]
+        for container, build, holds_keys in (("Tree", build_tree, False), ("dict", build_dict, True)):
+            result = measure(build, keys, lookups, holds_keys)
+            print(
+                f"{name.ljust(8)} {container.ljust(10)} {result['bytes_per_key']:>8.0f} "
+                f"{result['lookups_per_sec']:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares building a tree with `build_tree` on a growing number of processes with
+inserting every route in turn, on URL-like and file-path keys:
+
+    $ python -m benchmark.parallel_build --keys 1000000 --workers 1 2 4 8
+
+Speedups are relative to serial `Tree.insert`. The parent's share is the time the
+parent spends unpacking and grafting subtrees (measured in-process): the speedup
+can't exceed the serial time divided by it, whatever the number of workers.
+"""
+import argparse
+import os
+import time
+
+from tokamak.radix_tree import node, packed, Tree
+from tokamak.radix_tree.parallel import _build_partition, build_tree, PARTITIONS_PER_WORKER
+
+from .compare_dict import file_keys, url_keys
+
+
+def serial_build(keys: list[str]) -> float:
+    start = time.perf_counter()
+    new_tree = Tree()
+    for idx, key in enumerate(keys):
+        new_tree.insert(key, idx)
+    return time.perf_counter() - start
+
+
+def parallel_build(keys: list[str], workers: int) -> float:
+    start = time.perf_counter()
+    build_tree(((key, idx) for idx, key in enumerate(keys)), workers=workers)
+    return time.perf_counter() - start
+
+
+def parent_share(keys: list[str], partitions: int) -> float:
+    """Time spent unpacking and grafting `partitions` subtrees"""
+    bounds = [len(keys) * idx // partitions for idx in range(partitions + 1)]
+    root = Tree()._root
+    elapsed = 0.0
+    for begin, end in zip(bounds, bounds[1:], strict=False):
+        data, table, _ = _build_partition(keys[begin:end], begin, {})
+        start = time.perf_counter()
+        node.merge_tree(root, packed.PackedTree(data, table).unpack(), consume=True)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=200_000, help="keys in each key set")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+        help="numbers of worker processes to try",
+    )
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}")
+    print(f"{'key set'.ljust(8)} {'build'.ljust(14)} {'seconds':>8} {'speedup':>8}")
+    for name, make_keys in (("urls", url_keys), ("files", file_keys)):
+        keys = make_keys(args.keys)
+        serial = serial_build(keys)
+        print(f"{name.ljust(8)} {'serial insert'.ljust(14)} {serial:>8.2f} {1:>8.2f}")
+        for workers in args.workers:
+            elapsed = parallel_build(keys, workers)
+            label = f"{workers} worker{'s' if workers > 1 else ''}"
+            print(f"{name.ljust(8)} {label.ljust(14)} {elapsed:>8.2f} {serial / elapsed:>8.2f}")
+        share = parent_share(keys, max(args.workers) * PARTITIONS_PER_WORKER)
+        print(f"{name.ljust(8)} {'parent share'.ljust(14)} {share:>8.2f} {serial / share:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Route sets used by the benchmark suite.
+
+Every route set is generated deterministically from a seed so that results are
+comparable between runs and between machines. No route set needs the network or
+any third-party package.
+"""
+import random
+import string
+from collections.abc import Callable
+from string import Formatter
+
+# With thanks to https://github.com/richardolsson/falcon-routing-survey for the paths below
+GITHUB_PATHS = [
+    "/",
+    "/events",
+    "/repos/{owner}/{repo}/events",
+    "/repos/{owner}/{repo}/issues/events/",
+    "/networks/{owner}/{repo}/events",
+    "/orgs/{org}/events",
+    "/users/{username}/received_events",
+    "/users/{username}/received_events/public",
+    "/users/{username}/events",
+    "/users/{username}/events/public",
+    "/users/{username}/events/orgs/{org}",
+    "/feeds",
+    "/repos/{owner}/{repo}/notifications",
+    "/notifications",
+    "/notifications/threads/{id}",
+    "/notifications/threads/{id}/subscription",
+    "/repos/{owner}/{repo}/stargazers",
+    "/users/{username}/starred",
+    "/user/starred",
+    "/user/starred/{owner}/{repo}",
+    "/repos/{owner}/{repo}/subscribers",
+    "/users/{username}/subscriptions",
+    "/user/subscriptions",
+    "/repos/{owner}/{repo}/subscription",
+    "/user/subscriptions/{owner}/{repo}",
+    "/repos/{owner}/{repo}/issues/events/{id}",
+    "/repos/{owner}/{repo}/labels",
+    "/repos/{owner}/{repo}/labels/{name}",
+    "/repos/{owner}/{repo}/issues/{number}/labels",
+    "/repos/{owner}/{repo}/issues/{number}/labels/{name}",
+    "/repos/{owner}/{repo}/milestones/{number}/labels",
+    "/repos/{owner}/{repo}/milestones",
+    "/repos/{owner}/{repo}/milestones/{number}",
+    "/emojis",
+    "/gitignore/templates",
+    "/gitignore/templates/{language}",
+    "/markdown",
+    "/markdown/raw",
+    "/meta",
+    "/rate_limit",
+    "/user/orgs",
+    "/users/{username}/orgs",
+    "/orgs/{org}",
+    "/orgs/{org}/members",
+    "/orgs/{org}/members/{username}",
+    "/orgs/{org}/public_members",
+    "/orgs/{org}/public_members/{username}",
+    "/user/memberships/orgs",
+    "/user/memberships/orgs/{org}",
+    "/orgs/{org}/teams",
+    "/teams/{id}",
+    "/teams/{id}/members",
+    "/teams/{id}/members/{username}",
+    "/teams/{id}/memberships/{username}",
+    "/teams/{id}/repos",
+    "/teams/{id}/repos/{owner}/{repo}",
+    "/user/teams",
+    "/orgs/{org}/hooks",
+    "/orgs/{org}/hooks/{id}",
+    "/orgs/{org}/hooks/{id}/pings",
+    "/repos/{owner}/{repo}/pulls",
+    "/repos/{owner}/{repo}/pulls/{number}",
+    "/repos/{owner}/{repo}/pulls/{number}/commits",
+    "/repos/{owner}/{repo}/pulls/{number}/files",
+    "/repos/{owner}/{repo}/pulls/{number}/merge",
+    "/repos/{owner}/{repo}/pulls/{number}/comments",
+    "/repos/{owner}/{repo}/pulls/comments",
+    "/repos/{owner}/{repo}/pulls/comments/{number}",
+    "/users/{username}/repos",
+    "/orgs/{org}/repos",
+    "/repositories",
+    "/user/repos",
+    "/repos/{owner}/{repo}",
+    "/repos/{owner}/{repo}/contributors",
+    "/repos/{owner}/{repo}/languages",
+    "/repos/{owner}/{repo}/teams",
+    "/repos/{owner}/{repo}/tags",
+    "/repos/{owner}/{repo}/branches",
+    "/repos/{owner}/{repo}/branches/{branch}",
+    "/repos/{owner}/{repo}/collaborators",
+    "/repos/{owner}/{repo}/collaborators/{username}",
+    "/repos/{owner}/{repo}/comments",
+    "/repos/{owner}/{repo}/commits/{ref}/comments",
+    "/repos/{owner}/{repo}/comments/{id}",
+    "/repos/{owner}/{repo}/commits",
+    "/repos/{owner}/{repo}/commits/{sha}/",
+    # "/repos/{owner}/{repo}/compare/{base}...{head}",
+    # "/repos/{owner}/{repo}/compare/{user1}:{branch1}...{user2}:{branch2}",
+    "/repos/{owner}/{repo}/readme",
+    "/repos/{owner}/{repo}/contents/{path}",
+    # "/repos/{owner}/{repo}/{archive}_format/{ref}",
+    "/repos/{owner}/{repo}/keys",
+    "/repos/{owner}/{repo}/keys/{id}",
+    "/repos/{owner}/{repo}/deployments",
+    "/repos/{owner}/{repo}/deployments/{id}/statuses",
+    "/repos/{owner}/{repo}/downloads",
+    "/repos/{owner}/{repo}/downloads/{id}",
+    "/repos/{owner}/{repo}/forks",
+    "/repos/{owner}/{repo}/hooks",
+    "/repos/{owner}/{repo}/hooks/{id}",
+    "/repos/{owner}/{repo}/hooks/{id}/tests",
+    "/repos/{owner}/{repo}/hooks/{id}/pings",
+    "/repos/{owner}/{repo}/merges",
+    "/repos/{owner}/{repo}/pages",
+    "/repos/{owner}/{repo}/pages/builds",
+    "/repos/{owner}/{repo}/pages/builds/latest",
+    "/repos/{owner}/{repo}/releases",
+    "/repos/{owner}/{repo}/releases/{id}",
+    "/repos/{owner}/{repo}/releases/{id}/assets",
+    "/repos/{owner}/{repo}/releases/assets/{id}",
+    "/repos/{owner}/{repo}/stats/contributors",
+    "/repos/{owner}/{repo}/stats/commit_activity",
+    "/repos/{owner}/{repo}/stats/code_frequency",
+    "/repos/{owner}/{repo}/stats/participation",
+    "/repos/{owner}/{repo}/stats/punch_card",
+    "/repos/{owner}/{repo}/statuses/{sha}",
+    "/repos/{owner}/{repo}/commits/{ref}/statuses",
+    "/repos/{owner}/{repo}/commits/{ref}/status",
+    "/repos/{owner}/{repo}/commits/{ref}",
+    "/search/repositories",
+    "/search/code",
+    "/search/issues",
+    "/search/users",
+    "/users/{username}",
+    "/user",
+    "/users",
+    "/user/emails",
+    "/users/{username}/followers",
+    "/user/followers",
+    "/users/{username}/following",
+    "/user/following",
+    "/user/following/{username}",
+    # "/users/{username}/following/{target}_user",
+    "/users/{username}/keys",
+    "/user/keys",
+    "/user/keys/{id}",
+    "/users/{username}/site_admin",
+    "/users/{username}/suspended",
+    "/enterprise/stats/{type}",
+    "/enterprise/settings/license",
+    "/staff/indexing_jobs",
+    "/setup/api/start",
+    "/setup/api/upgrade",
+    "/setup/api/configcheck",
+    "/setup/api/configure",
+    "/setup/api/settings",
+    "/setup/api/maintenance",
+    "/setup/api/settings/authorized-keys",
+]
+
+
+SCANNER_PREFIXES = [
+    "/wp-admin",
+    "/wp-login.php",
+    "/.env",
+    "/.git/config",
+    "/phpmyadmin",
+    "/admin",
+    "/cgi-bin",
+    "/vendor/phpunit",
+    "/actuator/health",
+    "/server-status",
+    "/xmlrpc.php",
+    "/api/v1/../../etc/passwd",
+]
+
+
+class RouteSet:
+    """
+    A named collection of route patterns and the paths we look up against them.
+
+    Args:
+        name (str): Identifier used in benchmark output.
+        routes (List[str]): Route patterns to insert into the router.
+        lookups (List[str]): Concrete request paths to search for.
+    """
+
+    __slots__ = ["name", "routes", "lookups"]
+
+    def __init__(self, name: str, routes: list[str], lookups: list[str]):
+        self.name = name
+        self.routes = routes
+        self.lookups = lookups
+
+
+def _token(rng: random.Random, length: int = 8) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=length))
+
+
+def fill_params(route: str, value: str) -> str:
+    """Replace every `{param}` in a route with `value`"""
+    names = [fn for _, fn, _, _ in Formatter().parse(route) if fn is not None]
+    return route.format(**{name: value for name in names})
+
+
+def github(lookup_count: int, seed: int = 0) -> RouteSet:
+    rng = random.Random(seed)
+    lookups = [
+        fill_params(rng.choice(GITHUB_PATHS), _token(rng)) for _ in range(lookup_count)
+    ]
+    return RouteSet("github", list(GITHUB_PATHS), lookups)
+
+
+def static_routes(route_count: int, lookup_count: int, seed: int = 0) -> RouteSet:
+    """
+    Static routes shaped like a large REST API: a service, a resource, and an action.
+
+    Routes share long prefixes, which is the case radix trees are built for.
+    """
+    rng = random.Random(seed)
+    services = [f"svc-{_token(rng, 6)}" for _ in range(max(1, route_count // 1000))]
+    resources = [_token(rng, rng.randint(4, 10)) for _ in range(50)]
+    actions = ["list", "create", "detail", "update", "delete", "history", "export"]
+    routes: set[str] = set()
+    while len(routes) < route_count:
+        routes.add(
+            f"/{rng.choice(services)}/v{rng.randint(1, 3)}/{rng.choice(resources)}"
+            f"/{rng.choice(actions)}/{rng.randint(0, 99)}"
+        )
+    route_list = sorted(routes)
+    lookups = [rng.choice(route_list) for _ in range(lookup_count)]
+    name = f"static_{route_count // 1000}k"
+    return RouteSet(name, route_list, lookups)
+
+
+def deep_nesting(lookup_count: int, depth: int = 24, seed: int = 0) -> RouteSet:
+    """Long routes alternating static segments and params, branching at every level"""
+    rng = random.Random(seed)
+    routes = []
+    for branch in ("alpha", "beta", "gamma", "delta"):
+        segments = []
+        for level in range(depth):
+            if level % 2:
+                segments.append(f"{{p{level}}}")
+            else:
+                segments.append(f"{branch}{level}")
+            routes.append("/" + "/".join(segments))
+    lookups = [fill_params(rng.choice(routes), _token(rng)) for _ in range(lookup_count)]
+    return RouteSet("deep_nesting", routes, lookups)
+
+
+REGEX_ROUTES = [
+    "/items/{item_id:[0-9]+}",
+    "/items/{item_id:[0-9]+}/reviews/{review_id:[0-9]+}",
+    "/items/{slug:[a-z][a-z0-9-]*}",
+    "/items/{slug:[a-z][a-z0-9-]*}/related",
+    "/orders/{uid:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}}",
+    "/orders/{uid:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}}/lines",
+    "/archive/{year:[0-9]{4}}-{month:[0-9]{2}}-{day:[0-9]{2}}",
+    "/archive/{year:[0-9]{4}}-{month:[0-9]{2}}",
+    "/users/{username:[a-zA-Z][a-zA-Z0-9_]{2,31}}",
+    "/users/{username:[a-zA-Z][a-zA-Z0-9_]{2,31}}/keys/{key_id:[0-9]+}",
+    "/tags/{tag:[a-z]+}",
+    "/tags/{tag:[a-z]+}/items/{item_id:[0-9]+}",
+    "/hex/{value:0x[0-9a-fA-F]+}",
+    "/version/{major:[0-9]+}.{minor:[0-9]+}.{patch:[0-9]+}",
+]
+
+
+def _regex_lookup(rng: random.Random) -> str:
+    uid = "-".join(
+        "".join(rng.choices("0123456789abcdef", k=n)) for n in (8, 4, 4, 4, 12)
+    )
+    return rng.choice(
+        [
+            f"/items/{rng.randint(1, 10**6)}",
+            f"/items/{rng.randint(1, 10**6)}/reviews/{rng.randint(1, 999)}",
+            f"/items/{_token(rng)}-{_token(rng, 4)}",
+            f"/items/{_token(rng)}/related",
+            f"/orders/{uid}",
+            f"/orders/{uid}/lines",
+            f"/archive/{rng.randint(1990, 2030)}-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}",
+            f"/archive/{rng.randint(1990, 2030)}-{rng.randint(1, 12):02}",
+            f"/users/{_token(rng)}",
+            f"/users/{_token(rng)}/keys/{rng.randint(1, 99)}",
+            f"/tags/{_token(rng)}",
+            f"/tags/{_token(rng)}/items/{rng.randint(1, 999)}",
+            f"/hex/0x{rng.randint(0, 2**32):x}",
+            f"/version/{rng.randint(0, 9)}.{rng.randint(0, 30)}.{rng.randint(0, 99)}",
+        ]
+    )
+
+
+def regex_heavy(lookup_count: int, seed: int = 0) -> RouteSet:
+    rng = random.Random(seed)
+    lookups = [_regex_lookup(rng) for _ in range(lookup_count)]
+    return RouteSet("regex_heavy", list(REGEX_ROUTES), lookups)
+
+
+def not_found_heavy(
+    lookup_count: int, miss_ratio: float = 0.9, seed: int = 0
+) -> RouteSet:
+    """GitHub API routes hit mostly by scanner-style traffic that cannot match"""
+    rng = random.Random(seed)
+    lookups = []
+    for _ in range(lookup_count):
+        if rng.random() < miss_ratio:
+            lookups.append(f"{rng.choice(SCANNER_PREFIXES)}/{_token(rng, rng.randint(1, 12))}")
+        else:
+            lookups.append(fill_params(rng.choice(GITHUB_PATHS), _token(rng)))
+    return RouteSet("not_found_heavy", list(GITHUB_PATHS), lookups)
+
+
+def route_set_builders(lookup_count: int, seed: int = 0) -> dict[str, Callable[[], RouteSet]]:
+    """Functions building each route set known to the suite, keyed by name"""
+    return {
+        "github": lambda: github(lookup_count, seed=seed),
+        "static_10k": lambda: static_routes(10_000, lookup_count, seed=seed),
+        "static_100k": lambda: static_routes(100_000, lookup_count, seed=seed),
+        "deep_nesting": lambda: deep_nesting(lookup_count, seed=seed),
+        "regex_heavy": lambda: regex_heavy(lookup_count, seed=seed),
+        "not_found_heavy": lambda: not_found_heavy(lookup_count, seed=seed),
+    }
+
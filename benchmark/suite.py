@@ -0,0 +1,194 @@
+"""
+Router benchmark suite.
+
+For every route set this measures:
+
+  - build time for an `AsgiRouter`,
+  - per-lookup latency (p50, p99, mean),
+  - lookup throughput in a tight loop,
+  - peak and retained memory while building (via `tracemalloc`).
+
+Results are printed as a table and, optionally, written as JSON so that runs
+can be compared across commits:
+
+    $ python -m benchmark --output bench.json
+    $ python -m benchmark --sets github regex_heavy --lookups 50000
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Iterable
+from datetime import datetime, UTC
+from typing import Any
+
+import tokamak
+from tokamak.router import AsgiRouter, Route, UnknownEndpointError
+
+from . import routes as route_sets
+
+DEFAULT_LOOKUPS = 20_000
+
+
+def handler(request):  # pragma: no cover
+    return None
+
+
+def percentile(sorted_values: list[int], pct: float) -> int:
+    """Nearest-rank percentile of an already-sorted list"""
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def build_router(routes: Iterable[Route], **router_options: Any) -> AsgiRouter:
+    router = AsgiRouter(**router_options)
+    for route in routes:
+        router.add_route(route)
+    return router
+
+
+def measure_build(
+    route_set: route_sets.RouteSet, **router_options: Any
+) -> tuple[AsgiRouter, dict[str, Any]]:
+    routes = [Route(path, handler=handler, methods=["GET"]) for path in route_set.routes]
+
+    gc.collect()
+    start = time.perf_counter()
+    build_router(routes, **router_options)
+    build_seconds = time.perf_counter() - start
+
+    # Build a second time under tracemalloc: tracing slows allocation down
+    # so we keep it away from the timing above.
+    gc.collect()
+    tracemalloc.start()
+    router = build_router(routes, **router_options)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return router, {
+        "routes": len(routes),
+        "build_seconds": build_seconds,
+        "peak_memory_bytes": peak,
+        "retained_memory_bytes": retained,
+        "bytes_per_route": retained / len(routes) if routes else 0,
+    }
+
+
+def measure_lookups(router: AsgiRouter, lookups: list[str]) -> dict[str, Any]:
+    get_route = router.get_route
+    timer = time.perf_counter_ns
+
+    hits = 0
+    samples = []
+    for path in lookups:
+        start = timer()
+        try:
+            get_route(path)
+        except UnknownEndpointError:
+            end = timer()
+        else:
+            end = timer()
+            hits += 1
+        samples.append(end - start)
+
+    start = timer()
+    for path in lookups:
+        try:
+            get_route(path)
+        except UnknownEndpointError:
+            pass
+    elapsed = timer() - start
+
+    samples.sort()
+    return {
+        "lookups": len(lookups),
+        "hit_rate": hits / len(lookups) if lookups else 0,
+        "p50_ns": percentile(samples, 50),
+        "p99_ns": percentile(samples, 99),
+        "mean_ns": statistics.fmean(samples) if samples else 0,
+        "throughput_per_sec": len(lookups) / (elapsed / 1e9) if elapsed else 0,
+    }
+
+
+def run_route_set(route_set: route_sets.RouteSet, **router_options: Any) -> dict[str, Any]:
+    router, build = measure_build(route_set, **router_options)
+    lookups = measure_lookups(router, route_set.lookups)
+    return {"name": route_set.name, **build, **lookups}
+
+
+def metadata() -> dict[str, Any]:
+    return {
+        "tokamak_version": tokamak.__version__,
+        "python": sys.version,
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(UTC).isoformat(),
+    }
+
+
+def print_results(results: list[dict[str, Any]]) -> None:
+    header = (
+        f"{'route set'.ljust(16)} {'routes':>8} {'build ms':>10} {'p50 ns':>8} "
+        f"{'p99 ns':>8} {'lookups/s':>11} {'peak KiB':>10} {'B/route':>8} {'hits':>6}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['name'].ljust(16)} {result['routes']:>8} "
+            f"{result['build_seconds'] * 1000:>10.1f} {result['p50_ns']:>8} "
+            f"{result['p99_ns']:>8} {result['throughput_per_sec']:>11.0f} "
+            f"{result['peak_memory_bytes'] / 1024:>10.0f} {result['bytes_per_route']:>8.0f} "
+            f"{result['hit_rate']:>6.0%}"
+        )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sets",
+        nargs="*",
+        help="Route sets to run (default: all)",
+    )
+    parser.add_argument(
+        "--lookups",
+        type=int,
+        default=DEFAULT_LOOKUPS,
+        help=f"Lookups per route set (default: {DEFAULT_LOOKUPS})",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for generated routes and paths")
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="Build routers with a negative-lookup prefilter",
+    )
+    parser.add_argument("--output", help="Write machine-readable JSON results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> list[dict[str, Any]]:
+    args = parse_args(argv)
+    # only the requested route sets are built: the largest take a while
+    available = route_sets.route_set_builders(args.lookups, seed=args.seed)
+    names = args.sets or list(available)
+    unknown = set(names) - set(available)
+    if unknown:
+        raise SystemExit(f"Unknown route sets: {', '.join(sorted(unknown))}")
+
+    router_options = {"prefilter": args.prefilter}
+    results = [run_route_set(available[name](), **router_options) for name in names]
+    print_results(results)
+
+    if args.output:
+        meta = {**metadata(), "router_options": router_options}
+        with open(args.output, "w") as fl:
+            json.dump({"meta": meta, "results": results}, fl, indent=2)
+            fl.write("\n")
+    return results
@@ -55,7 +55,7 @@ async def index(path_context, scope, receive, send):
 
 
 async def other_handler(path_context, scope, receive, send):
-    context = bytes(json.dumps(path_context), encoding="utf-8")
+    context = bytes(json.dumps(dict(path_context)), encoding="utf-8")
     message = await receive()
     if message["type"] == "http.request":
         body = message.get("body", b"")
@@ -0,0 +1,124 @@
+import pytest
+from tokamak.radix_tree import Tree
+from tokamak.radix_tree.explain import (
+    ALTERNATION,
+    BACKTRACK,
+    COMPARE,
+    explain,
+    LIMIT,
+    PREFILTER,
+    REGEX,
+    STOP,
+)
+from tokamak.radix_tree.limits import LookupLimits
+
+
+def actions(explanation) -> list[tuple[str, str, bool]]:
+    return [(step.action, step.route, step.matched) for step in explanation.steps]
+
+
+def test_explain_match() -> None:
+    route_tree = Tree()
+    for path in ("/files/list", "/files/{id:[0-9]+}/x", "/archives/{archive}_format"):
+        route_tree.insert(path, path)
+
+    explanation = explain(route_tree, "/files/12/x/")
+    assert explanation.path == "/files/12/x"
+    assert explanation.route == explanation.handler == "/files/{id:[0-9]+}/x"
+    assert dict(explanation.context) == {"id": "12"}
+    # siblings are tried in no particular order, but static ones before parameters
+    assert [step for step in actions(explanation) if step[2]] == [
+        (COMPARE, "/", True),
+        (COMPARE, "/files/", True),
+        (REGEX, "/files/{id:[0-9]+}", True),
+        (COMPARE, "/files/{id:[0-9]+}/x", True),
+    ]
+    mismatch = next(step for step in explanation.steps if step.route == "/files/list")
+    assert (mismatch.action, mismatch.pos, mismatch.end) == (COMPARE, 7, None)
+    assert mismatch.reason == "expected 'list', found '12/x'"
+    assert explanation.visited == len(explanation.steps)
+    assert explanation.regex_calls == 1
+    assert str(explanation).splitlines()[-1] == (
+        "  matched '/files/{id:[0-9]+}/x' with {'id': '12'}"
+    )
+
+    # a greedy parameter swallows the rest of the path: the lookup stops at a node without a route
+    explanation = explain(route_tree, "/archives/backup_format")
+    assert explanation.route is None
+    assert explanation.handler is None
+    assert actions(explanation)[-2:] == [
+        (REGEX, "/archives/{archive}", True),
+        (STOP, "/archives/{archive}", False),
+    ]
+    assert "captured archive='backup_format'" in str(explanation)
+    assert route_tree.get_handler("/archives/backup_format")[0] is None
+
+
+def test_explain_backtracking() -> None:
+    route_tree = Tree(default_handler="default")
+    for path in ("/a/b/x", "/a/b/y", "/a/{name}/z"):
+        route_tree.insert(path, path)
+
+    explanation = explain(route_tree, "/a/b/z")
+    assert explanation.route == "/a/{name}/z"
+    steps = actions(explanation)
+    assert steps[:2] == [(COMPARE, "/a/", True), (COMPARE, "/a/b/", True)]
+    # static siblings are tried in no particular order
+    assert sorted(steps[2:4]) == [(COMPARE, "/a/b/x", False), (COMPARE, "/a/b/y", False)]
+    assert steps[4:] == [
+        (BACKTRACK, "/a/b/", False),
+        (REGEX, "/a/{name}", True),
+        (COMPARE, "/a/{name}/z", True),
+    ]
+    assert explanation.steps[4].reason == "no child matches 'z'"
+    assert str(explanation).splitlines()[-1] == "  matched '/a/{name}/z' with {'name': 'b'}"
+
+
+def test_explain_alternation() -> None:
+    route_tree = Tree(default_handler="default")
+    for path in ("/c/{id:[0-9]+}/x", "/c/{slug:[a-z]+}/x"):
+        route_tree.insert(path, path)
+    route_tree.freeze()
+
+    explanation = explain(route_tree, "/c/12/x")
+    assert explanation.route == "/c/{id:[0-9]+}/x"
+    assert actions(explanation)[1] == (ALTERNATION, "/c/{id:[0-9]+}", True)
+    assert (explanation.steps[1].pos, explanation.steps[1].end) == (3, 5)
+    assert explanation.steps[1].reason.startswith("{id:[0-9]+} is the first of")
+    assert explanation.regex_calls == 1
+
+    explanation = explain(route_tree, "/c/_/x")
+    assert actions(explanation) == [
+        (COMPARE, "/c/", True),
+        (ALTERNATION, "/c/", False),
+        (BACKTRACK, "/c/", False),
+    ]
+    assert explanation.handler == "default"
+
+
+@pytest.mark.parametrize(
+    "kwargs, path, searched",
+    (
+        ({"raw_bytes": True}, "/café/menu", "/caf%C3%A9/menu"),
+        ({"raw_bytes": True}, b"/caf%C3%A9/menu", "/caf%C3%A9/menu"),
+        ({"case_insensitive": True}, "/CAFÉ/Menu", "/café/menu"),
+    ),
+)
+def test_explain_tree_options(kwargs, path, searched: str) -> None:
+    route_tree = Tree(**kwargs)
+    route_tree.insert("/café/{page}", "page")
+    explanation = explain(route_tree, path)
+    assert explanation.path == searched
+    assert explanation.handler == "page"
+    assert explanation.context["page"] == route_tree.get_handler(path)[1]["page"]
+
+
+def test_explain_prefilter_and_limits() -> None:
+    route_tree = Tree(prefilter=True, limits=LookupLimits(max_path_length=20))
+    route_tree.insert("/users/{id}", "user")
+
+    explanation = explain(route_tree, "/wp-admin/setup.php")
+    assert actions(explanation) == [(PREFILTER, "", False)]
+    assert route_tree.prefilter.lookups == 0
+    assert actions(explain(route_tree, "/users/" + "1" * 20)) == [(LIMIT, "", False)]
+    assert explain(route_tree, "/users/1").handler == "user"
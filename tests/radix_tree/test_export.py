@@ -0,0 +1,118 @@
+import io
+import json
+
+import pytest
+from tokamak.radix_tree import Tree
+from tokamak.radix_tree.export import DYNAMIC, iter_nodes, ROOT, STATIC, write_dot, write_jsonl
+
+
+def read_jsonl(route_tree: Tree, **kwargs) -> list[dict]:
+    out = io.StringIO()
+    count = write_jsonl(route_tree, out, **kwargs)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert count == len(records)
+    return records
+
+
+def test_write_jsonl(large_tree: Tree) -> None:
+    records = read_jsonl(large_tree)
+    assert [record["id"] for record in records] == list(range(len(records)))
+    assert records[0]["kind"] == ROOT
+    assert records[0]["parent"] is None
+
+    by_id = {record["id"]: record for record in records}
+    for record in records[1:]:
+        parent = by_id[record["parent"]]
+        assert record["depth"] == parent["depth"] + 1
+        assert record["route"] == parent["route"] + record["label"]
+        assert record["kind"] == (DYNAMIC if record["label"].startswith("{") else STATIC)
+    # every node is exported, and every route shows up with its handler
+    for record in records:
+        assert record["child_count"] == sum(1 for child in records if child["parent"] == record["id"])
+    routes = {record["route"]: record["handler"] for record in records if record["handler"]}
+    assert routes == {path: repr(handler) for path, handler in large_tree.items()}
+
+    # children are exported in order of their labels: exports are reproducible
+    assert records == read_jsonl(large_tree)
+    assert read_jsonl(large_tree, handler_repr=str)[1]["handler"] == str(large_tree["/"])
+
+
+def test_export_max_depth(large_tree: Tree) -> None:
+    assert [record["kind"] for record in read_jsonl(large_tree, max_depth=0)] == [ROOT]
+    records = read_jsonl(large_tree, max_depth=2)
+    assert max(record["depth"] for record in records) == 2
+
+    out = io.StringIO()
+    count = write_dot(large_tree, out, max_depth=2)
+    graph = out.getvalue()
+    assert count == len(records)
+    assert graph.startswith('digraph "tree" {\n') and graph.endswith("}\n")
+    assert graph.count(" -> ") - graph.count("_more") // 2 == count - 1
+    for record in records:
+        if record["depth"] == 2 and record["child_count"]:
+            assert f'n{record["id"]}_more [label="{record["child_count"]} more"' in graph
+
+    with pytest.raises(ValueError):
+        list(iter_nodes(large_tree, max_depth=-1))
+
+
+def test_export_prefix(test_routes: list[str]) -> None:
+    route_tree = Tree()
+    for path in test_routes:
+        route_tree.insert(path, path)
+
+    records = read_jsonl(route_tree, prefix="/info/{user}/pro")
+    assert [record["route"] for record in records] == [
+        "",
+        "/",
+        "/info/",
+        "/info/{user}",
+        "/info/{user}/project",
+        "/info/{user}/project/",
+        "/info/{user}/project/{project}",
+        "/info/{user}/project/{project}/dept",
+        "/info/{user}/project/{project}/dept/",
+        "/info/{user}/project/{project}/dept/{dept}",
+    ]
+    assert read_jsonl(route_tree, prefix="/nowhere") == records[:2]
+
+    out = io.StringIO()
+    write_dot(route_tree, out, prefix="/info/", name='routes "v2"')
+    graph = out.getvalue()
+    assert graph.startswith('digraph "routes \\"v2\\"" {')
+    assert '[label="{user}", shape=box, style=dashed, peripheries=2]' in graph
+    # the other children of "/" were left out
+    assert f'n1_more [label="{records[1]["child_count"] - 1} more"' in graph
+
+
+@pytest.mark.parametrize(
+    "kwargs, prefix, route",
+    (
+        ({"case_insensitive": True}, "/Users/AL", "/users/alice"),
+        ({"raw_bytes": True}, "/café/ré", "/caf%C3%A9/r%C3%A9sum%C3%A9"),
+    ),
+)
+def test_export_prefix_normalized(kwargs, prefix: str, route: str) -> None:
+    route_tree = Tree(**kwargs)
+    for path in ("/users/alice", "/users/bob", "/café/résumé", "/café/menu"):
+        route_tree.insert(path, path)
+
+    leaves = [record for record in read_jsonl(route_tree, prefix=prefix) if not record["child_count"]]
+    assert [record["route"] for record in leaves] == [route]
+
+
+def test_export_deep_tree() -> None:
+    route_tree = Tree()
+    depth = 300
+    for length in range(1, depth + 1):
+        route_tree.insert("/" + "a" * length, length)
+
+    records = read_jsonl(route_tree)
+    assert len(records) == depth + 1
+    assert records[-1]["route"] == "/" + "a" * depth
+    out = io.StringIO()
+    assert write_dot(route_tree, out) == depth + 1
+
+    lines = route_tree._root.tree_as_str().splitlines()
+    assert len(lines) == depth + 1
+    assert lines[-1].endswith("└── a <*>")
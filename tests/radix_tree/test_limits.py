@@ -0,0 +1,159 @@
+import itertools
+import logging
+import re
+import sys
+
+import pytest
+from tokamak.radix_tree import limits, Tree, utils
+from tokamak.router import AsgiRouter, Route
+
+
+@pytest.mark.parametrize(
+    "regex,expected",
+    (
+        ("[0-9]+", False),
+        ("(a+)+", True),
+        ("(?:a*b)*", True),
+        (r"(\w+\s?)*", True),
+        ("(a+){1}", False),
+        ("(?>(a+)+)b", False),
+        ("(a+)?b", False),
+        ("(a|b+)+", True),
+    ),
+)
+def test_has_nested_quantifiers(regex: str, expected: bool) -> None:
+    assert limits.has_nested_quantifiers(regex) is expected
+
+
+@pytest.mark.parametrize(
+    "regex,expected",
+    (
+        ("[0-9]+", "[0-9]+"),
+        ("(a+)+", "(?>(a+)+)"),
+        ("(a+)+b", "(?>(a+)+)b"),
+        (r"(\w+\s?)*\.", r"(?>(\w+\s?)*)\."),
+        ("([a-z0-9]+-?)+/", "(?>([a-z0-9]+-?)+)/"),
+        (r"x(\d+\.?)+z", r"x(?>(\d+\.?)+)z"),
+        # what follows could be matched by the group
+        ("([a-z]+-?)+a", "([a-z]+-?)+a"),
+        ("(?:[a-z]+)+X", "(?:[a-z]+)+X"),
+        # a repetition could match in more than one way
+        (r"(\w+\d?)+x", r"(\w+\d?)+x"),
+        ("(a+b?a)+c", "(a+b?a)+c"),
+        ("(a|ab+)+c", "(a|ab+)+c"),
+        # syntax we leave alone
+        ("(a+)+|b", "(a+)+|b"),
+        (r"(a+)+\1", r"(a+)+\1"),
+    ),
+)
+def test_harden_regex(regex: str, expected: str) -> None:
+    hardened = limits.harden_regex(regex)
+    assert hardened == expected
+
+    # hardening never changes what a pattern matches
+    texts = ["".join(chars) for size in range(7) for chars in itertools.product("aAb1-./xz ", repeat=size)]
+    for flags in (0, re.IGNORECASE):
+        original, new = re.compile(regex, flags), re.compile(hardened, flags)
+        for text in texts[::7]:
+            left, right = original.match(text), new.match(text)
+            assert (left and left.end()) == (right and right.end()), text
+
+
+def test_harden_regex_logs_remaining_nested_quantifiers(caplog: pytest.LogCaptureFixture) -> None:
+    with caplog.at_level(logging.WARNING, logger="tokamak"):
+        assert limits.harden_regex("(b+c?b)+[0-9]") == "(b+c?b)+[0-9]"
+        limits.harden_regex("(b+c?b)+[0-9]")
+        limits.harden_regex("(b+)+[0-9]")
+    assert len(caplog.records) == 1
+    assert "LookupLimits" in caplog.records[0].getMessage()
+
+
+def test_harden_regex_without_regex_analysis(monkeypatch: pytest.MonkeyPatch) -> None:
+    # without CPython's private regex parser, regexes are left as they are
+    monkeypatch.setitem(sys.modules, "tokamak.radix_tree.regex_analysis", None)
+    monkeypatch.delattr("tokamak.radix_tree.regex_analysis", raising=False)
+    assert limits.harden_regex("(d+e?d)+[a-z]") == "(d+e?d)+[a-z]"
+    assert limits.harden_regex("[0-9]+x+") == "[0-9]+x+"
+    assert not limits.has_nested_quantifiers("(d+)+")
+
+
+def test_parameters_are_hardened() -> None:
+    parser = utils.DynamicParseNode("{slug:([a-z]+-?)+}", "slug", regex="([a-z]+-?)+")
+    assert parser.regex == "(?>([a-z]+-?)+)"
+
+    new_tree = Tree()
+    new_tree.insert("/posts/{slug:([a-z]+-?)+}.json", "post")
+    handler, context = new_tree.get_handler("/posts/hello-world.json")
+    assert handler == "post"
+    assert context == {"slug": "hello-world"}
+
+
+@pytest.mark.parametrize(
+    "kwargs", ({"max_path_length": 0}, {"max_nodes_visited": -1}, {"max_regex_calls": 0})
+)
+def test_lookup_limits_rejects_bad_arguments(kwargs: dict) -> None:
+    with pytest.raises(ValueError):
+        limits.LookupLimits(**kwargs)
+
+
+def test_tree_limits_match_unlimited_tree(test_routes: list[str]) -> None:
+    plain_tree = Tree(default_handler="default")
+    limited_tree = Tree(
+        default_handler="default",
+        limits=limits.LookupLimits(max_path_length=1000, max_nodes_visited=1000, max_regex_calls=1000),
+    )
+    for path in test_routes:
+        plain_tree.insert(path, path)
+        limited_tree.insert(path, path)
+
+    for path in (*test_routes, "/hello/world", "/doc/missing", "/info/gordon/project/tokamak"):
+        assert limited_tree.get_handler(path) == plain_tree.get_handler(path)
+
+
+@pytest.mark.parametrize(
+    "kwargs,path",
+    (
+        ({"max_path_length": 10}, "/users/12345678"),
+        ({"max_nodes_visited": 3}, "/users/12345678/pets"),
+        ({"max_regex_calls": 1}, "/users/12345678/pets"),
+    ),
+)
+def test_tree_limits_exceeded(kwargs: dict, path: str) -> None:
+    missing_tree = Tree(default_handler="default", limits=limits.LookupLimits(**kwargs))
+    raising_tree = Tree(limits=limits.LookupLimits(action=limits.LimitAction.RAISE, **kwargs))
+    for new_tree in (missing_tree, raising_tree):
+        new_tree.insert("/users/{id}", "user")
+        new_tree.insert("/users/{id}/{kind:pets|toys}", "things")
+        assert new_tree.get_handler("/users/1")[0] == "user"
+
+    handler, context = missing_tree.get_handler(path)
+    assert handler == "default"
+    assert not context
+    with pytest.raises(limits.LookupLimitError) as exc_info:
+        raising_tree.get_handler(path)
+    assert isinstance(exc_info.value, limits.PathTooLongError) == ("max_path_length" in kwargs)
+
+
+@pytest.mark.parametrize("kwargs", ({"raw_bytes": True}, {"case_insensitive": True}))
+def test_tree_limits_modes(kwargs: dict) -> None:
+    new_tree = Tree(limits=limits.LookupLimits(max_path_length=20), **kwargs)
+    new_tree.insert("/Café/{name}", "menu")
+
+    handler, context = new_tree.get_handler("/Café/Soupe")
+    assert handler == "menu"
+    assert context == {"name": "Soupe"}
+    # raw paths are measured in bytes
+    assert new_tree.get_handler("/Café/" + "x" * 14)[0] == ("menu" if not kwargs.get("raw_bytes") else None)
+
+
+def test_router_lookup_limits() -> None:
+    async def handler(*args, **kwargs):  # pragma: no cover
+        return None
+
+    router = AsgiRouter(
+        routes=[Route("/files/{name}", handler=handler)],
+        lookup_limits=limits.LookupLimits(max_path_length=32, action=limits.LimitAction.RAISE),
+    )
+    assert router.get_route("/files/notes.txt")[1] == {"name": "notes.txt"}
+    with pytest.raises(limits.LookupLimitError):
+        router.get_route("/files/" + "x" * 100)
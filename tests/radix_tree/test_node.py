@@ -95,15 +95,17 @@ def test_childset_ctor(some_nodes: list[node.RadixNode]) -> None:
 
 def test_childset_add(some_nodes: list[node.RadixNode]) -> None:
     childset = node.NodeChildSet(some_nodes)
-    # We will make some unlikely nodes here in order to test the swap
+    # static and dynamic nodes are never equal, even with the same raw path
     childset.add(node.StaticNode("{test}"))
     assert len(childset.static_nodes) == 3
-    assert len(childset.dynamic_nodes) == 1
-    assert len(childset) == 4
-    childset.add(node.DynamicNode(utils.DynamicParseNode("/b", "test", regex=None)))
-    assert len(childset.static_nodes) == 2
     assert len(childset.dynamic_nodes) == 2
-    assert len(childset) == 4
+    assert len(childset) == 5
+    # dynamic nodes are identified by name and regex, not raw text
+    childset.add(node.DynamicNode(utils.DynamicParseNode("{test:*}", "test", regex="*")))
+    assert len(childset.dynamic_nodes) == 2
+    childset.add(node.DynamicNode(utils.DynamicParseNode("{test:[0-9]+}", "test", regex="[0-9]+")))
+    assert len(childset.dynamic_nodes) == 3
+    assert len(childset) == 6
 
 
 def test_childset_discard(some_nodes: list[node.RadixNode]) -> None:
@@ -143,18 +145,17 @@ def test_radix_node_dunder(static_node: node.StaticNode) -> None:
     sn2 = node.StaticNode(
         static_node.path,
         children=node.NodeChildSet({node.StaticNode("now")}),
-        separator="::",
     )
     sn3 = node.StaticNode(
         "another_path",
         children=None,
-        separator=";",
     )
     # for now we compare _only_ paths
     assert static_node == sn2
     assert static_node != sn3
 
-    assert hash(static_node) == hash(static_node.path)
+    assert hash(static_node) == hash(sn2)
+    assert static_node.key == static_node.path
     as_str = str(static_node)
     assert "StaticNode" in as_str
     assert static_node.path in as_str
@@ -166,6 +167,13 @@ def test_radix_node_dunder(static_node: node.StaticNode) -> None:
     assert len(static_node) == 2
     assert len(sn3) == 1
 
+    # splitting a node must not change its hash: it may be in a parent's child set
+    before = hash(static_node)
+    static_node.split(2)
+    assert hash(static_node) == before
+    assert static_node == node.StaticNode(static_node.path)
+    assert static_node != "/a"
+
 
 def test_insert_node_various(static_node: node.StaticNode) -> None:
     path_orig = "/a/b/c/d/e/f"
@@ -232,13 +240,12 @@ def test_large_tree_search_path_static_paths(
     found_node, ctx = large_tree._root.search_path(path)
     if has_handler:
         msg = f"Expected handler for path {path}"
-        assert found_node is not None and found_node.leaf is not None, msg
+        assert found_node is not None and found_node.handler is not None, msg
         assert found_node.path == node_path, f"Path should be {found_node.path}, not {path}"
-        assert found_node.leaf.handler is not None
         assert not ctx
     else:
         assert (
-            found_node is None or found_node.leaf is None
+            found_node is None or found_node.handler is None
         ), f"Expected no handler for path {path}"
 
 
@@ -295,13 +302,12 @@ def test_large_tree_search_path_dynamic_paths(  # type: ignore
     found_node, ctx = large_tree._root.search_path(path)
     if has_handler:
         msg = f"Expected handler for path {path}"
-        assert found_node is not None and found_node.leaf is not None, msg
+        assert found_node is not None and found_node.handler is not None, msg
         assert found_node.path == node_path, f"Path should be {found_node.path}, not {path}"
-        assert found_node.leaf.handler is not None
         assert params == ctx
     else:
         assert (
-            found_node is None or found_node.leaf is None
+            found_node is None or found_node.handler is None
         ), f"Expected no handler for path {path}"
 
 
@@ -398,24 +404,24 @@ def test_static_node_init_and_clone(static_node: node.StaticNode) -> None:
     with pytest.raises(ValueError):
         node.StaticNode("")
     sn1 = node.StaticNode(
-        "//bla", leaf=node.LeafNode("Handle"), children=node.NodeChildSet([static_node])
+        "//bla", handler="Handle", children=node.NodeChildSet([static_node])
     )
     cloned_sn1 = sn1.clone()
     assert cloned_sn1.children == sn1.children
     assert cloned_sn1.path == sn1.path
-    assert cloned_sn1.leaf == sn1.leaf
+    assert cloned_sn1.handler == sn1.handler
 
 
 def test_static_node_split(static_node: node.StaticNode) -> None:
     cached_path = static_node.path
-    static_node.leaf = node.LeafNode("A")
+    static_node.handler = "A"
     assert static_node.split(2) is static_node
     assert static_node.path == cached_path[:2]
     assert len(static_node.children) == 1
     first_child = next(iter(static_node.children))
     assert first_child.path == cached_path[2:]
-    assert static_node.leaf is None
-    assert first_child.leaf is not None and first_child.leaf.handler == "A"
+    assert static_node.handler is None
+    assert first_child.handler == "A"
 
 
 # # # # # # # # # # # # # # # # # # # #
@@ -427,6 +433,64 @@ def test_dyn_node_init_and_clone(dynamic_node: node.DynamicNode) -> None:
     new_dyn = dynamic_node.clone()
     assert new_dyn is not dynamic_node
     assert new_dyn.path == dynamic_node.path
+    assert new_dyn == dynamic_node
+    assert hash(new_dyn) == hash(dynamic_node)
+
+
+def test_dyn_node_key() -> None:
+    plain, star, digits, letters = (
+        node.DynamicNode(parser) for parser in utils.parse_dynamic("{id}/{id:*}/{id:[0-9]+}/{id:[a-z]+}")
+        if isinstance(parser, utils.DynamicParseNode)
+    )
+    assert plain.key == star.key == ("id", utils.DynamicParseNode.MATCH_UP_TO_SLASH)
+    assert plain == star
+    assert hash(plain) == hash(star)
+    assert digits != letters
+    assert plain != node.StaticNode(plain.path)
+
+    root = node.RadixNode("")
+    root.insert("/a/{id:[0-9]+}/digits", "digits")
+    root.insert("/a/{id:[a-z]+}/letters", "letters")
+    root.insert("/a/{id}/plain", "plain")
+    root.insert("/a/{id:*}/star", "star")
+    assert len(root.search_path("/a/")[0].children) == 3
+    for path, handler in (
+        ("/a/12/digits", "digits"),
+        ("/a/ab/letters", "letters"),
+        ("/a/AB/plain", "plain"),
+        ("/a/AB/star", "star"),
+    ):
+        found, _ = root.search_path(path)
+        assert found is not None and found.handler == handler
+
+
+def test_dynamic_alternation() -> None:
+    digits, letters, backref, named = (
+        node.DynamicNode(parser)
+        for parser in utils.parse_dynamic("{id:[0-9]+}/{id:[a-z]+}/{x:(a)\\2}/{y:(?P<z>b)}")
+        if isinstance(parser, utils.DynamicParseNode)
+    )
+    assert node.DynamicAlternation.build((digits,)) is None
+    assert node.DynamicAlternation.build((digits, backref)) is None
+    assert node.DynamicAlternation.build((named, named)) is None
+
+    alternation = node.DynamicAlternation.build((digits, letters, named))
+    assert alternation is not None
+    assert alternation.pattern.pattern == "(?P<_alt0>[0-9]+)|(?P<_alt1>[a-z]+)|(?P<_alt2>(?P<z>b))"
+    captures: list[tuple[str, int, int]] = []
+    assert alternation.search("/12", 1, captures) is digits
+    assert alternation.search("/b", 1, captures) is letters
+    assert alternation.search("/-", 1, captures) is None
+    assert captures == [("id", 1, 3), ("id", 1, 2)]
+
+    # a child whose subtree doesn't match falls through to the following children
+    root = node.RadixNode("")
+    root.insert("/{id:[a-z]+}/letters", "letters")
+    root.insert("/{name:[a-c]+}/plain", "plain")
+    root.insert("/{any}", "any")
+    assert node.build_alternations(root) == 1
+    assert root.search_path("/abc/plain")[0].handler == "plain"  # type: ignore
+    assert root.search_path("/xyz/letters")[0].handler == "letters"  # type: ignore
 
 
 # # # # # # # # # # # # # # # # # # # #
@@ -490,9 +554,8 @@ def test_path_to_tree(path: str, query: str, leaf_path: str, tree_depth: int) ->
         assert len(new_node) == tree_depth
         leaf, _ = new_node.search_path(query)
         assert leaf is not None
-        assert leaf.leaf is not None
         assert leaf.path == leaf_path
-        assert leaf.leaf.handler == "A"
+        assert leaf.handler == "A"
 
 
 @pytest.mark.parametrize(
@@ -527,4 +590,4 @@ def test_merge_nodes(into_path: str, merge_node_path: str, handlers: dict) -> No
         result = node.merge_nodes(into, merge_node)
         assert result is into
         if handlers["result"]:
-            assert result.leaf is not None and result.leaf.handler == handlers["result"]
+            assert result.handler == handlers["result"]
@@ -0,0 +1,238 @@
+from urllib.parse import quote
+
+import pytest
+from tokamak.radix_tree import limits, packed, Tree, tree
+
+LOOKUPS = (
+    "/",
+    "/contact",
+    "/co",
+    "/c",
+    "/cmd/test",
+    "/cmd/test/3",
+    "/dcb/test/3",
+    "/a/b/c/d/e/f",
+    "/a/b/c/d/e/f/g/h",
+    "/a/b/c/d/e",
+    "/src/some/file.png",
+    "/src/data",
+    "/search/someth!ng+in+ünìcodé",
+    "/user_erik/dept",
+    "/files/js/framework.js",
+    "/doc/code_faq.html",
+    "/info/erik/project/tokamak/dept/eng",
+    "/regex/abc/test",
+    "/regex/123/test",
+    "/optional/abc/word/plus/deadbeef-dead-beef-dead-beefdeadbeef",
+    "/γένωνται/name/aaa",
+    "/darüber/schloß/ritter",
+    "/hello/test",
+    "/hello/world",
+    "/hello/world/",
+    "/missing",
+    "",
+)
+
+
+@pytest.mark.parametrize("path", LOOKUPS)
+def test_packed_tree_matches_tree(path: str, large_tree: Tree) -> None:
+    data, handlers = packed.pack_tree(large_tree)
+    packed_tree = packed.PackedTree(data, handlers)
+    assert packed_tree.get_handler(path) == large_tree.get_handler(path)
+
+
+def test_packed_tree_handler_table_and_defaults() -> None:
+    new_tree = Tree(default_handler="default", trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    new_tree.insert("/a/", "A")
+    new_tree.insert("/b/{name}", "B")
+
+    with pytest.raises(packed.PackedTreeError):
+        packed.pack_tree(new_tree, handlers=["A", "B"])
+
+    data, handlers = packed.pack_tree(new_tree, handlers=["B", "A", "default"])
+    assert handlers == ["B", "A", "default"]
+    packed_tree = packed.PackedTree(data, ["b-here", "a-here", "default-here"])
+    assert packed_tree.trailing_slash_match is tree.TrailingSlashMatch.STRICT
+    assert packed_tree.get_handler("/a/") == ("a-here", {})
+    assert packed_tree.get_handler("/a") == ("default-here", {})
+    assert packed_tree.get_handler("/b/x") == ("b-here", {"name": "x"})
+
+    with pytest.raises(TypeError):
+        packed_tree.insert("/c", "C")
+
+
+def test_packed_tree_rejects_bad_buffers() -> None:
+    with pytest.raises(packed.PackedTreeError):
+        packed.PackedTree(b"TK", [])
+    with pytest.raises(packed.PackedTreeError):
+        packed.PackedTree(b"\x00" * packed.HEADER.size, [])
+    data, _ = packed.pack_tree(Tree())
+    bad_version = data[:4] + b"\xff\xff" + data[6:]
+    with pytest.raises(packed.PackedTreeError):
+        packed.PackedTree(bad_version, [])
+
+
+def test_shared_route_table(large_tree: Tree) -> None:
+    table = packed.SharedRouteTable.create(large_tree)
+    try:
+        attached = packed.SharedRouteTable.attach(table.name, table.handlers)
+        for path in LOOKUPS:
+            assert attached.tree.get_handler(path) == large_tree.get_handler(path)
+        attached.close()
+    finally:
+        table.close()
+        table.unlink()
+
+
+def test_packed_raw_bytes_tree(test_routes: list[str], large_tree: Tree) -> None:
+    raw_tree = Tree(raw_bytes=True)
+    for path in test_routes:
+        raw_tree.insert(path, path)
+    data, handlers = packed.pack_tree(raw_tree)
+    packed_tree = packed.PackedTree(data, handlers)
+    assert packed_tree.raw_bytes
+
+    for path in LOOKUPS:
+        raw_path = quote(path).encode("ascii")
+        assert packed_tree.get_handler(raw_path) == large_tree.get_handler(path)
+        assert packed_tree.get_handler(path) == large_tree.get_handler(path)
+
+
+@pytest.mark.parametrize("raw_bytes", (False, True))
+def test_packed_case_insensitive_tree(raw_bytes: bool) -> None:
+    new_tree = Tree(case_insensitive=True, raw_bytes=raw_bytes)
+    new_tree.insert("/Users/{name}/Posts", "posts")
+    new_tree.insert("/users/{id:[A-F]+}", "user")
+    new_tree.insert("/Straße", "street")
+    data, handlers = packed.pack_tree(new_tree)
+    packed_tree = packed.PackedTree(data, handlers)
+    assert packed_tree.case_insensitive
+
+    for path in ("/USERS/JoHn/posts/", "/uSeRs/abc", "/users/xyz", "/STRASSE", "/straße"):
+        assert packed_tree.get_handler(path) == new_tree.get_handler(path)
+
+
+@pytest.mark.parametrize("kwargs", ({}, {"raw_bytes": True}, {"case_insensitive": True}))
+@pytest.mark.parametrize("action", (limits.LimitAction.MISS, limits.LimitAction.RAISE))
+def test_packed_tree_limits_and_prefilter(kwargs, action: limits.LimitAction) -> None:
+    lookup_limits = limits.LookupLimits(
+        max_path_length=24, max_nodes_visited=10, max_regex_calls=1, action=action
+    )
+    new_tree = Tree(default_handler="default", prefilter=True, limits=lookup_limits, **kwargs)
+    new_tree.insert("/Users/{id}", "user")
+    new_tree.insert("/Users/{id}/{kind:pets|toys}", "things")
+    new_tree.insert("/a/b/c/d/e/f", "deep")
+    data, handlers = packed.pack_tree(new_tree)
+    packed_tree = packed.PackedTree(data, handlers)
+    assert repr(packed_tree.limits) == repr(lookup_limits)
+    assert packed_tree.prefilter is not None
+
+    for path in ("/Users/1", "/wp-admin/setup.php", "/a/b/c/d/e/f"):
+        assert packed_tree.get_handler(path) == new_tree.get_handler(path)
+    too_long = "/Users/" + "x" * 20
+    for path, error in ((too_long, limits.PathTooLongError), ("/Users/1/toys", limits.LookupLimitError)):
+        if action is limits.LimitAction.RAISE:
+            with pytest.raises(error):
+                new_tree.get_handler(path)
+            with pytest.raises(error):
+                packed_tree.get_handler(path)
+        else:
+            assert packed_tree.get_handler(path) == new_tree.get_handler(path)
+    assert packed.PackedTree(*packed.pack_tree(Tree())).prefilter is None
+
+
+@pytest.mark.parametrize("kwargs", ({}, {"raw_bytes": True}, {"case_insensitive": True}))
+def test_packed_tree_prefix_apis(kwargs, test_routes: list[str]) -> None:
+    new_tree = Tree(default_handler="default", **kwargs)
+    for path in test_routes:
+        new_tree.insert(path, path)
+    data, handlers = packed.pack_tree(new_tree)
+    packed_tree = packed.PackedTree(data, handlers)
+
+    assert list(packed_tree.items()) == list(new_tree.items())
+    for prefix in ("/a", "/info/{user}", "/src/", "/Search", "/γέ", "/zzz"):
+        assert list(packed_tree.keys(prefix)) == list(new_tree.keys(prefix))
+    assert list(packed_tree.values("/", limit=3)) == list(new_tree.values("/", limit=3))
+    for path in LOOKUPS:
+        assert packed_tree.longest_prefix(path) == new_tree.longest_prefix(path)
+    with pytest.raises(ValueError):
+        list(packed_tree.keys(limit=-1))
+
+
+def test_mapped_tree_matches_tree(tmp_path, large_tree: Tree) -> None:
+    path = tmp_path / "routes.tkrt"
+    packed.write_tree_file(large_tree, path)
+    with packed.MappedTree(path, decode=bytes.decode) as mapped:
+        assert len(mapped) == len(large_tree)
+        for lookup in LOOKUPS:
+            assert mapped.get_handler(lookup) == large_tree.get_handler(lookup)
+            assert mapped.longest_prefix(lookup) == large_tree.longest_prefix(lookup)
+        assert list(mapped.items()) == list(large_tree.items())
+        with pytest.raises(TypeError):
+            mapped.insert("/c", "C")
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_mapped_tree_values(tmp_path) -> None:
+    shards = Tree(default_handler=0)
+    for idx in range(100):
+        shards[f"/tenants/t{idx}"] = idx % 4 + 1
+    path = tmp_path / "shards.tkrt"
+    packed.write_tree_file(shards, path, encode=lambda shard: str(shard).encode())
+
+    with packed.MappedTree(path, decode=int) as mapped:
+        assert mapped.longest_prefix("/tenants/t42/invoices/7") == (3, {})
+        assert mapped.get_handler("/tenants/t43") == (4, {})
+        assert mapped.get_handler("/tenants") == (0, {})
+        assert dict(mapped.items("/tenants/t9")) == {"/tenants/t9": 2, "/tenants/t90": 3, **{
+            f"/tenants/t9{idx}": (90 + idx) % 4 + 1 for idx in range(10)
+        }}
+    # a value that decodes to something falsy is found: compare with None
+    zero_tree = Tree()
+    zero_tree["/tenants/zero"] = 0
+    packed.write_tree_file(zero_tree, tmp_path / "zero.tkrt", encode=lambda shard: str(shard).encode())
+    with packed.MappedTree(tmp_path / "zero.tkrt", decode=int) as mapped:
+        assert mapped.longest_prefix("/tenants/zero/invoices/7") == (0, {})
+        assert mapped.longest_prefix("/accounts/zero")[0] is None
+        assert dict(mapped.items()) == {"/tenants/zero": 0}
+    # equal values are stored once
+    with packed.MappedTree(path) as mapped:
+        assert mapped.handlers[0] == b"0"
+        assert {mapped.handlers[idx] for idx in range(len(mapped.handlers))} == {b"0", b"1", b"2", b"3", b"4"}
+
+    with pytest.raises(packed.PackedTreeError):
+        packed.write_tree_file(shards, tmp_path / "no-encode.tkrt")
+    assert not list(tmp_path.glob("no-encode*"))
+
+
+def test_mapped_tree_rejects_bad_files(tmp_path) -> None:
+    path = tmp_path / "routes.tkrt"
+    packed.write_tree_file(Tree(), path)
+    data = path.read_bytes()
+
+    for bad in (b"", b"TKRF", b"XXXX" + data[4:], data[:4] + b"\xff\xff" + data[6:]):
+        path.write_bytes(bad)
+        with pytest.raises(packed.PackedTreeError):
+            packed.MappedTree(path)
+    # a tree section that doesn't hold a packed tree
+    path.write_bytes(data[: packed.FILE_HEADER.size] + b"\x00" * (len(data) - packed.FILE_HEADER.size))
+    with pytest.raises(packed.PackedTreeError):
+        packed.MappedTree(path)
+
+
+@pytest.mark.parametrize("kwargs", ({}, {"raw_bytes": True}, {"case_insensitive": True}))
+def test_unpack_tree(kwargs, test_routes: list[str]) -> None:
+    new_tree = Tree(default_handler="default", **kwargs)
+    for path in test_routes:
+        new_tree.insert(path, path)
+    data, handlers = packed.pack_tree(new_tree)
+
+    unpacked = Tree(default_handler="other", **kwargs)
+    unpacked._root = packed.PackedTree(data, handlers).unpack()
+    assert unpacked._root.handler == "default"
+    assert list(unpacked.items()) == list(new_tree.items())
+    for path in LOOKUPS:
+        assert unpacked.get_handler(path) == new_tree.get_handler(path)
+    # the unpacked nodes are a tree like any other
+    unpacked.insert("/cmd/{tool}/extra", "extra")
+    assert unpacked.get_handler("/cmd/test/extra")[0] == "extra"
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from tokamak.radix_tree import Tree, tree
+from tokamak.radix_tree.parallel import build_tree
+
+
+def serial_tree(routes: list[str], **kwargs) -> Tree:
+    new_tree = Tree(**kwargs)
+    for path in routes:
+        new_tree.insert(path, path)
+    return new_tree
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    (
+        {},
+        {"raw_bytes": True},
+        {"case_insensitive": True},
+        {"trailing_slash_match": tree.TrailingSlashMatch.STRICT, "default_handler": "default"},
+    ),
+)
+def test_build_tree_matches_serial_inserts(kwargs, test_routes: list[str]) -> None:
+    expected = serial_tree(test_routes, **kwargs)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        built = build_tree([(path, path) for path in test_routes], workers=3, executor=executor, **kwargs)
+
+    assert len(built) == len(expected)
+    assert list(built.items()) == list(expected.items())
+    for path in (*test_routes, "/missing", "/hello/world/", "/"):
+        assert built.get_handler(path) == expected.get_handler(path)
+
+
+def test_build_tree_processes(test_routes: list[str]) -> None:
+    expected = serial_tree(test_routes)
+    built = build_tree({path: path for path in test_routes}, workers=2, prefilter=True)
+    assert list(built.items()) == list(expected.items())
+    assert built.prefilter is not None
+    for path in (*test_routes, "/wp-admin/setup.php"):
+        assert built.get_handler(path) == expected.get_handler(path)
+
+    # a single worker inserts in this process
+    assert list(build_tree({path: path for path in test_routes}, workers=1).items()) == list(expected.items())
+    assert len(build_tree({}, workers=2)) == 0
+
+
+def test_build_tree_errors() -> None:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError):
+            build_tree([("/a", 1), ("b", 2)], workers=2, executor=executor)
+        # the same route, with different handlers, in two partitions
+        with pytest.raises(ValueError):
+            build_tree([("/a", 1), ("/A", 2)], workers=2, executor=executor, case_insensitive=True)
+
+
+def test_build_tree_repeated_routes(test_routes: list[str]) -> None:
+    # as with serial inserts, a route repeated with the same handler is one route
+    repeated = [*test_routes, *test_routes[:5]]
+    expected = serial_tree(repeated)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        built = build_tree([(path, path) for path in repeated], workers=2, executor=executor)
+        assert list(built.items()) == list(expected.items())
+        assert len(built) == len(test_routes)
+        with pytest.raises(ValueError):
+            build_tree([("/a", 1), ("/a", 1), ("/a", 2)], workers=2, executor=executor)
+
+
+@pytest.mark.parametrize(
+    "kwargs,spellings",
+    (({}, ("/a", "/a/")), ({"case_insensitive": True}, ("/a", "/A/")), ({"raw_bytes": True}, ("/é", "/é/"))),
+)
+def test_build_tree_equivalent_spellings(kwargs, spellings: tuple[str, ...]) -> None:
+    # spellings of one route, with the same handler, are one route (wherever they sort)
+    routes = [(f"/r{idx:03}", idx) for idx in range(100)]
+    routes += [(path, "a") for path in spellings]
+    expected = Tree(**kwargs)
+    for path, handler in routes:
+        expected.insert(path, handler)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        built = build_tree(routes, workers=2, executor=executor, **kwargs)
+    assert len(built) == len(expected) == 101
+    assert list(built.items()) == list(expected.items())
@@ -0,0 +1,93 @@
+import pytest
+from tokamak.radix_tree import prefilter, Tree
+
+
+def test_bloom_filter_grows_and_keeps_its_rate() -> None:
+    bloom = prefilter.BloomFilter(capacity=100, false_positive_rate=0.01)
+    keys = [f"/key/{idx}" for idx in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    bloom.add(keys[0])
+
+    # keys that are already (or falsely appear to be) in the filter aren't counted
+    assert 980 <= len(bloom) <= 1000
+    assert len(bloom._filters) > 1
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"/other/{idx}" in bloom for idx in range(10_000))
+    # the overall false-positive rate stays below the one requested (with some slack)
+    assert false_positives < 10_000 * 0.02
+    assert bloom.size_bytes > 0
+
+
+@pytest.mark.parametrize("kwargs", ({"capacity": 0}, {"false_positive_rate": 0}, {"false_positive_rate": 1}))
+def test_bloom_filter_rejects_bad_arguments(kwargs: dict) -> None:
+    with pytest.raises(ValueError):
+        prefilter.BloomFilter(**kwargs)
+
+
+def test_prefilter_keys() -> None:
+    pre = prefilter.Prefilter()
+    for path in ("/", "/contact", "/repos/{owner}/{repo}", "/static/css/{file}", "/a/b"):
+        pre.add(path)
+
+    assert pre.first_segments == {"", "contact", "repos", "static", "a"}
+    assert pre.open_segments == {"repos"}
+    assert not pre.all_open
+
+    for path in ("/", "/contact", "/repos/anything/at/all", "/static/css/site.css", "/a/b", "/a/b/c"):
+        assert pre.may_match(path), path
+    for path in ("", "contact", "/wp-admin/setup.php", "/.env", "/static/js/app.js", "/a", "/a/c"):
+        assert not pre.may_match(path), path
+    assert pre.lookups == 13
+    assert pre.rejected == 7
+
+    pre.reset_counters()
+    assert pre.lookups == pre.rejected == 0
+
+    # a dynamic first segment means any path might match
+    pre.add("/user_{name}")
+    assert pre.may_match("/.env")
+
+
+def test_tree_prefilter(test_routes: list[str]) -> None:
+    plain_tree = Tree(default_handler="default")
+    filtered_tree = Tree(default_handler="default", prefilter=True, prefilter_false_positive_rate=0.001)
+    for path in test_routes:
+        if "{" in path.split("/")[1]:
+            continue
+        plain_tree.insert(path, path)
+        filtered_tree.insert(path, path)
+
+    assert filtered_tree.prefilter is not None
+    assert plain_tree.prefilter is None
+    for path in (*test_routes, "/wp-admin/setup.php", "/.env", "/hello/world", "/doc/missing"):
+        assert filtered_tree.get_handler(path) == plain_tree.get_handler(path)
+    assert filtered_tree.prefilter.rejected >= 2
+
+
+@pytest.mark.parametrize("kwargs", ({"raw_bytes": True}, {"case_insensitive": True}))
+def test_tree_prefilter_modes(kwargs: dict) -> None:
+    new_tree = Tree(prefilter=True, **kwargs)
+    new_tree.insert("/Café/Menu", "menu")
+    new_tree.insert("/Files/{name}", "files")
+
+    assert new_tree.get_handler("/Café/Menu")[0] == "menu"
+    assert new_tree.get_handler("/Files/x")[0] == "files"
+    assert new_tree.get_handler("/Café/Drinks")[0] is None
+    assert new_tree.prefilter is not None
+    assert new_tree.prefilter.rejected == 1
+
+
+@pytest.mark.parametrize("raw_bytes", (False, True))
+def test_tree_prefilter_long_separator(raw_bytes: bool) -> None:
+    new_tree = Tree(separator="--", prefilter=True, raw_bytes=raw_bytes)
+    new_tree.insert("--a--b", "ab")
+    new_tree.insert("--a--{name}--c", "c")
+
+    assert new_tree.prefilter is not None
+    assert new_tree.prefilter.first_segments == ({b"a"} if raw_bytes else {"a"})
+    assert new_tree.get_handler("--a--b") == ("ab", {})
+    assert new_tree.get_handler("--a--x--c")[0] == "c"
+    assert new_tree.get_handler("-a--b")[0] is None
+    assert new_tree.get_handler("--b--a")[0] is None
+    assert new_tree.prefilter.rejected == 2
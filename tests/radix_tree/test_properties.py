@@ -1,8 +1,8 @@
 """
    Property-based tests are isolated to here
 """
-from hypothesis import given, strategies
-from tokamak.radix_tree import utils
+from hypothesis import example, given, strategies
+from tokamak.radix_tree import explain, prefilter, Tree, tree, utils
 
 
 @given(strategies.text(), strategies.text())
@@ -13,3 +13,261 @@ def test_nonequal_indices(left, right):  # type: ignore
         assert result == len(left) == len(right)
     else:
         assert result <= min((len(left), len(right)))
+
+
+@given(strategies.sets(strategies.text(max_size=8)))
+def test_bloom_filter_has_no_false_negatives(keys):  # type: ignore
+    bloom = prefilter.BloomFilter(capacity=4, false_positive_rate=0.05)
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+SEGMENTS = strategies.sampled_from(["a", "ab", "b", "{x}", "c{y}", ""])
+
+
+@given(
+    strategies.lists(strategies.lists(SEGMENTS, min_size=1, max_size=3), min_size=1, max_size=8),
+    strategies.lists(strategies.lists(strategies.sampled_from(["a", "ab", "b", "c", "cz", ""]), max_size=4)),
+    strategies.sampled_from(["/", "--"]),
+)
+@example(routes=[["a", "a"], ["a", "a", ""]], lookups=[], separator="/")
+def test_prefilter_never_rejects_a_match(routes, lookups, separator):  # type: ignore
+    # strict trailing slashes: "/a" and "/a/" are different routes
+    plain_tree = Tree(separator=separator, trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    filtered_tree = Tree(
+        separator=separator, trailing_slash_match=tree.TrailingSlashMatch.STRICT, prefilter=True
+    )
+    for path in dict.fromkeys(separator + separator.join(segments) for segments in routes):
+        plain_tree.insert(path, path)
+        filtered_tree.insert(path, path)
+
+    for segments in routes + lookups:
+        path = separator + separator.join(segments)
+        assert filtered_tree.get_handler(path) == plain_tree.get_handler(path)
+
+
+# enough distinct first characters for the generated code to dispatch on them
+MANY_SEGMENTS = strategies.sampled_from(["a", "ab", "b", "d", "e", "ef", "{x}", "c{y}", ""])
+
+
+@given(
+    strategies.lists(strategies.lists(MANY_SEGMENTS, min_size=1, max_size=4), min_size=1, max_size=12),
+    strategies.lists(
+        strategies.lists(strategies.sampled_from(["a", "ab", "b", "cz", "e", "ef", ""]), max_size=5)
+    ),
+)
+def test_compiled_matcher_matches_search_path(routes, lookups):  # type: ignore
+    new_tree = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    for path in dict.fromkeys("/" + "/".join(segments) for segments in routes):
+        new_tree.insert(path, path)
+    matcher = new_tree.compile_to_python()
+
+    for segments in lookups:
+        path = "/" + "/".join(segments)
+        found, context = matcher.search_path(path)
+        expected, expected_context = new_tree._root.search_path(path)
+        assert found is expected
+        assert list(context.items()) == list(expected_context.items())
+
+
+REGEX_SEGMENTS = strategies.sampled_from(
+    ["a", "ab", "{x}", "{x:[0-9]+}", "{y:[a-b]+}", "{z:a[0-9]}", "c{w:[ab]}"]
+)
+
+
+@given(
+    strategies.lists(strategies.lists(REGEX_SEGMENTS, min_size=1, max_size=3), min_size=1, max_size=10),
+    strategies.lists(
+        strategies.lists(strategies.sampled_from(["a", "ab", "a1", "12", "ca", "b"]), max_size=4)
+    ),
+)
+def test_frozen_tree_matches_unfrozen_tree(routes, lookups):  # type: ignore
+    plain_tree = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    frozen_tree = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    for path in dict.fromkeys("/" + "/".join(segments) for segments in routes):
+        plain_tree.insert(path, path)
+        frozen_tree.insert(path, path)
+    frozen_tree.freeze()
+
+    for segments in lookups:
+        path = "/" + "/".join(segments)
+        found, context = frozen_tree._root.search_path(path)
+        expected, expected_context = plain_tree._root.search_path(path)
+        assert (found and found.handler) == (expected and expected.handler)
+        assert list(context.items()) == list(expected_context.items())
+
+
+@given(
+    strategies.lists(strategies.lists(REGEX_SEGMENTS, min_size=1, max_size=3), min_size=1, max_size=10),
+    strategies.lists(
+        strategies.lists(strategies.sampled_from(["a", "ab", "a1", "12", "ca", "b"]), max_size=4)
+    ),
+)
+def test_iter_matches_finds_every_matching_route(routes, lookups):  # type: ignore
+    paths = list(dict.fromkeys("/" + "/".join(segments) for segments in routes))
+    new_tree = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    single_trees = {}
+    for path in paths:
+        new_tree.insert(path, path)
+        single_trees[path] = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+        single_trees[path].insert(path, path)
+
+    for segments in lookups:
+        path = "/" + "/".join(segments)
+        matches = list(new_tree.iter_matches(path))
+        expected = {route for route, single in single_trees.items() if single.get_handler(path)[0]}
+        assert {handler for handler, _ in matches} == expected
+        assert len(matches) == len(expected)
+        for handler, context in matches:
+            assert dict(context) == dict(single_trees[handler].get_handler(path)[1])
+
+        handler, _ = new_tree.get_handler(path)
+        if handler is not None:
+            assert matches[0][0] == handler
+
+
+@given(
+    strategies.lists(strategies.lists(REGEX_SEGMENTS, min_size=1, max_size=3), min_size=1, max_size=10),
+    strategies.lists(
+        strategies.lists(strategies.sampled_from(["a", "ab", "a1", "12", "ca", "b"]), max_size=5)
+    ),
+)
+def test_longest_prefix_is_the_longest_covering_route(routes, lookups):  # type: ignore
+    paths = list(dict.fromkeys("/" + "/".join(segments) for segments in routes))
+    new_tree = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    single_trees = {}
+    for path in paths:
+        new_tree.insert(path, path)
+        single_trees[path] = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+        single_trees[path].insert(path, path)
+
+    for segments in lookups:
+        path = "/" + "/".join(segments)
+        # every prefix of the path ending at a segment boundary
+        prefixes = [path[:idx] for idx in range(1, len(path) + 1) if idx == len(path) or path[idx] == "/"]
+        prefixes += [path[: idx + 1] for idx in range(len(path)) if path[idx] == "/"]
+        covering = {
+            route: max(len(prefix) for prefix in prefixes if single.get_handler(prefix)[0])
+            for route, single in single_trees.items()
+            if any(single.get_handler(prefix)[0] for prefix in prefixes)
+        }
+        handler, _ = new_tree.longest_prefix(path)
+        if not covering:
+            assert handler is None
+        else:
+            assert covering.get(handler) == max(covering.values())
+
+
+@given(
+    strategies.lists(
+        strategies.tuples(
+            strategies.booleans(), strategies.lists(MANY_SEGMENTS, min_size=1, max_size=3)
+        ),
+        max_size=30,
+    ),
+    strategies.booleans(),
+)
+def test_tree_mapping_matches_dict(operations, thread_safe):  # type: ignore
+    new_tree = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT, thread_safe=thread_safe)
+    expected: dict[str, str] = {}
+    for delete, segments in operations:
+        path = "/" + "/".join(segments)
+        if delete and path in expected:
+            del new_tree[path]
+            del expected[path]
+        else:
+            new_tree[path] = path
+            expected[path] = path
+        assert len(new_tree) == len(expected)
+
+    assert dict(new_tree) == expected
+    # deleting leaves the same tree as never inserting
+    rebuilt = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    for path in expected:
+        rebuilt[path] = path
+    assert len(new_tree._root) == len(rebuilt._root)
+    for path in expected:
+        assert new_tree.get_handler(path) == rebuilt.get_handler(path)
+
+
+@given(
+    strategies.lists(strategies.lists(MANY_SEGMENTS, min_size=1, max_size=3), max_size=20),
+    strategies.lists(strategies.lists(MANY_SEGMENTS, min_size=1, max_size=3), max_size=20),
+    strategies.booleans(),
+)
+def test_tree_merge_matches_inserts(left, right, consume):  # type: ignore
+    left_paths = list(dict.fromkeys("/" + "/".join(segments) for segments in left))
+    right_paths = list(dict.fromkeys("/" + "/".join(segments) for segments in right))
+    merged = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    other = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    expected = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    for path in left_paths:
+        merged[path] = path
+        expected[path] = path
+    for path in right_paths:
+        other[path] = path.upper()
+        if path not in expected:
+            expected[path] = path.upper()
+
+    conflicts = merged.merge(other, consume=consume)
+    assert conflicts == sorted(path for path in right_paths if path in left_paths and path != path.upper())
+    assert dict(merged) == dict(expected)
+    assert len(merged) == len(expected)
+    assert len(merged._root) == len(expected._root)
+    for path in left_paths + right_paths:
+        assert merged.get_handler(path) == expected.get_handler(path)
+
+
+ROUTES = strategies.dictionaries(
+    strategies.lists(MANY_SEGMENTS, min_size=1, max_size=3).map(lambda segments: "/" + "/".join(segments)),
+    strategies.sampled_from(("a", "b")),
+    max_size=20,
+)
+
+
+@given(ROUTES, ROUTES, strategies.booleans())
+def test_tree_diff_apply_reaches_target(old_routes, new_routes, frozen):  # type: ignore
+    current = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    for path, handler in old_routes.items():
+        current[path] = handler
+    if frozen:
+        current.freeze()
+
+    diff = current.diff(new_routes)
+    assert set(diff.added) == new_routes.keys() - old_routes.keys()
+    assert set(diff.removed) == old_routes.keys() - new_routes.keys()
+    current.apply(diff)
+    assert dict(current) == new_routes
+    assert not current.diff(new_routes)
+
+    expected = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    for path, handler in new_routes.items():
+        expected[path] = handler
+    if frozen:
+        expected.freeze()
+    for path in {**old_routes, **new_routes}:
+        assert current.get_handler(path) == expected.get_handler(path)
+
+
+@given(
+    strategies.lists(strategies.lists(REGEX_SEGMENTS, min_size=1, max_size=3), min_size=1, max_size=10),
+    strategies.lists(
+        strategies.lists(strategies.sampled_from(["a", "ab", "a1", "12", "ca", "b", ""]), max_size=4)
+    ),
+    strategies.booleans(),
+)
+def test_explain_agrees_with_get_handler(routes, lookups, frozen):  # type: ignore
+    new_tree = Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT, default_handler="default")
+    for path in dict.fromkeys("/" + "/".join(segments) for segments in routes):
+        new_tree.insert(path, path)
+    if frozen:
+        new_tree.freeze()
+
+    for segments in lookups:
+        path = "/" + "/".join(segments)
+        explanation = explain.explain(new_tree, path)
+        handler, context = new_tree.get_handler(path)
+        assert explanation.handler == handler
+        assert explanation.route == (None if handler == "default" else handler)
+        assert list(explanation.context.items()) == list(context.items())
@@ -0,0 +1,174 @@
+import pytest
+from tokamak.radix_tree import Tree
+from tokamak.radix_tree.topic import split_topic, TopicTree
+
+TOPICS = [
+    "orders.eu.created",
+    "orders.*.shipped",
+    "orders.{region}.cancelled",
+    "payments.#",
+    "users.*.sessions.#",
+]
+
+
+@pytest.fixture()
+def topic_tree() -> TopicTree:
+    topics = TopicTree(default_handler="default")
+    for topic in TOPICS:
+        topics.insert(topic, topic)
+    return topics
+
+
+@pytest.mark.parametrize(
+    "topic,separator,expected",
+    (
+        ("orders.eu.created", ".", ["orders", "eu", "created"]),
+        ("orders.{v:[0-9]+.[0-9]+}.#", ".", ["orders", "{v:[0-9]+.[0-9]+}", "#"]),
+        ("orders::eu", "::", ["orders", "eu"]),
+        ("orders", ".", ["orders"]),
+    ),
+)
+def test_split_topic(topic, separator, expected):
+    assert split_topic(topic, separator) == expected
+
+
+@pytest.mark.parametrize(
+    "topic,expected,context",
+    (
+        ("orders.eu.created", "orders.eu.created", {}),
+        ("orders.us.shipped", "orders.*.shipped", {"_1": "us"}),
+        ("orders.us.cancelled", "orders.{region}.cancelled", {"region": "us"}),
+        ("payments", "payments.#", {}),
+        ("payments.card", "payments.#", {"_1": "card"}),
+        ("payments.card.refunded.partial", "payments.#", {"_1": "card.refunded.partial"}),
+        ("users.42.sessions", "users.*.sessions.#", {"_1": "42"}),
+        ("users.42.sessions.opened", "users.*.sessions.#", {"_1": "42", "_3": "opened"}),
+        # `*` matches exactly one segment
+        ("orders.us.west.shipped", "default", None),
+        ("orders.shipped", "default", None),
+        ("users.42", "default", None),
+        ("paymentsx", "default", None),
+        ("", "default", None),
+    ),
+)
+def test_topic_tree_get_handler(topic_tree, topic, expected, context):
+    handler, captured = topic_tree.get_handler(topic)
+    assert handler == expected
+    if context is not None:
+        # values captured while trying other topics may be left over
+        assert context.items() <= dict(captured).items()
+
+
+def test_topic_tree_iter_matches(topic_tree):
+    topic_tree.insert("orders.#", "any order")
+    matches = {handler: dict(context) for handler, context in topic_tree.iter_matches("orders.eu.shipped")}
+    assert matches == {"orders.*.shipped": {"_1": "eu"}, "any order": {"_1": "eu.shipped"}}
+
+
+def test_topic_tree_longest_prefix(topic_tree):
+    topic_tree.insert("orders.{region}", "region")
+    handler, context = topic_tree.longest_prefix("orders.eu.refunded.partial")
+    assert handler == "region"
+    assert context == {"region": "eu"}
+    assert topic_tree.longest_prefix("payments.card")[0] == "payments.#"
+    assert topic_tree.longest_prefix("paymentsx")[0] == "default"
+
+
+def test_topic_tree_multi_level_parent():
+    topics = TopicTree()
+    topics.insert("payments", "explicit")
+    topics.insert("payments.#", "any")
+    assert topics.get_handler("payments")[0] == "explicit"
+    assert topics.get_handler("payments.card")[0] == "any"
+
+    # an explicit handler inserted afterwards replaces the one from `#`
+    topics.insert("orders.#", "any order")
+    topics.insert("orders", "orders")
+    assert topics.get_handler("orders")[0] == "orders"
+    assert topics.get_handler("orders.eu")[0] == "any order"
+    with pytest.raises(ValueError):
+        topics.insert("orders", "again")
+
+    topics.insert("#", "everything")
+    assert topics.get_handler("audit.log")[0] == "everything"
+
+
+def test_topic_tree_mapping(topic_tree):
+    # keys are topics as inserted: the parent `payments` that `payments.#` matches isn't one
+    assert list(topic_tree) == sorted(TOPICS, key=topic_tree.topic_path)
+    assert len(topic_tree) == len(TOPICS)
+    assert topic_tree["orders.*.shipped"] == "orders.*.shipped"
+    assert topic_tree["payments.#"] == "payments.#"
+    assert "payments" not in topic_tree
+    assert "orders.#.created" not in topic_tree
+    assert list(topic_tree.keys(prefix="users.*")) == ["users.*.sessions.#"]
+    assert list(topic_tree.items(limit=1)) == [("orders.eu.created", "orders.eu.created")]
+
+    topic_tree["payments.#"] = "payments"
+    assert topic_tree.get_handler("payments")[0] == "payments"
+    assert topic_tree.get_handler("payments.card")[0] == "payments"
+    topic_tree["audit.*"] = "audit"
+    assert topic_tree["audit.*"] == "audit"
+    assert len(topic_tree) == len(TOPICS) + 1
+
+    del topic_tree["payments.#"]
+    assert topic_tree.get_handler("payments")[0] == "default"
+    assert len(topic_tree) == len(TOPICS)
+    with pytest.raises(KeyError):
+        del topic_tree["payments.#"]
+    with pytest.raises(KeyError):
+        topic_tree["payments"]
+
+    # an explicit parent stays when its `#` topic goes
+    topic_tree.insert("users.*.sessions", "sessions")
+    del topic_tree["users.*.sessions.#"]
+    assert topic_tree.get_handler("users.42.sessions")[0] == "sessions"
+    assert "users.*.sessions" in topic_tree
+    assert len(topic_tree) == len(TOPICS)
+
+
+@pytest.mark.parametrize("topic", ("orders.#.created", "#.created"))
+def test_topic_tree_multi_level_must_be_last(topic):
+    with pytest.raises(ValueError):
+        TopicTree().insert(topic, "handler")
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    (
+        {"separator": "/"},
+        {"separator": "->"},
+        {"thread_safe": True},
+        {"case_insensitive": True},
+        {"prefilter": True},
+    ),
+)
+def test_topic_tree_options(kwargs):
+    topics = TopicTree(**kwargs)
+    separator = topics.separator
+    topics.insert(separator.join(("orders", "*", "created")), "created")
+    topics.insert(separator.join(("audit", "#")), "audit")
+    topics.insert(separator.join(("Users", "{name}")), "user")
+
+    assert topics.get_handler(separator.join(("orders", "eu", "created")))[0] == "created"
+    assert topics.get_handler("audit")[0] == "audit"
+    assert topics.get_handler(separator.join(("audit", "a", "b")))[0] == "audit"
+    handler, context = topics.get_handler(separator.join(("Users", "Ada")))
+    assert handler == "user"
+    assert context == {"name": "Ada"}
+    assert topics.get_handler(separator.join(("missing", "topic")))[0] is None
+
+    topics.freeze()
+    topics.compile_to_python()
+    assert topics.get_handler(separator.join(("orders", "eu", "created")))[0] == "created"
+    assert topics.get_handler("audit")[0] == "audit"
+
+
+def test_tree_separator_params():
+    new_tree = Tree(separator=".")
+    new_tree.insert(".orders.{region}.created", "created")
+    new_tree.insert(".orders.{region}", "region")
+    handler, context = new_tree.get_handler(".orders.eu.created")
+    assert handler == "created"
+    assert context == {"region": "eu"}
+    assert new_tree.get_handler(".orders.eu")[0] == "region"
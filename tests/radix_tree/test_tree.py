@@ -1,6 +1,13 @@
 
+import os
+import random
+import subprocess
+import sys
+import threading
+from urllib.parse import quote
+
 import pytest
-from tokamak.radix_tree import tree
+from tokamak.radix_tree import limits, node, tree
 
 
 @pytest.mark.parametrize("default_handler", (None, "A"))
@@ -12,10 +19,9 @@ def test_tree_ctor(
 ) -> None:
     new_tree = tree.Tree(default_handler=default_handler, trailing_slash_match=tsm)
     if default_handler:
-        assert new_tree._root.leaf is not None
-        assert new_tree._root.leaf.handler == default_handler
+        assert new_tree._root.handler == default_handler
     else:
-        assert new_tree._root.leaf is None
+        assert new_tree._root.handler is None
 
 
 @pytest.mark.parametrize("default_handler", (None, "A"))
@@ -84,3 +90,749 @@ def test_get_handler(
     result, ctx = new_tree.get_handler("/claw/")
     assert ctx == {}
     assert result == "B"
+
+
+def test_thread_safe_insert_leaves_old_versions_untouched(test_routes: list[str]) -> None:
+    new_tree = tree.Tree(thread_safe=True)
+    for path in test_routes:
+        new_tree.insert(path, path)
+    old_root = new_tree._root
+    old_str = old_root.tree_as_str()
+
+    # these split existing nodes and merge into existing dynamic nodes
+    for path in ("/cont", "/contacts", "/cmd/{tool}/{sub}/x", "/info/{user}/other"):
+        new_tree.insert(path, path)
+
+    assert new_tree._root is not old_root
+    assert old_root.tree_as_str() == old_str
+    node_found, _ = old_root.search_path("/contacts")
+    assert node_found is None
+    assert new_tree.get_handler("/contacts")[0] == "/contacts"
+    assert new_tree.get_handler("/cmd/a/b/x") == ("/cmd/{tool}/{sub}/x", {"tool": "a", "sub": "b"})
+    for path in test_routes:
+        if "{" not in path:
+            assert new_tree.get_handler(path)[0] == path
+
+
+def test_thread_safe_concurrent_inserts_and_lookups() -> None:
+    new_tree = tree.Tree(thread_safe=True)
+    stable = [f"/stable/{idx}/item" for idx in range(50)] + ["/stable/{name}/dynamic"]
+    for path in stable:
+        new_tree.insert(path, path)
+
+    writer_count, reader_count, inserts_per_writer = 4, 4, 200
+    errors: list[str] = []
+    done = threading.Event()
+
+    def writer(writer_id: int) -> None:
+        for idx in range(inserts_per_writer):
+            # shares prefixes with the stable routes so that nodes get split
+            path = f"/stable/{idx}/item{writer_id}/{idx}"
+            new_tree.insert(path, path)
+
+    def reader() -> None:
+        while not done.is_set():
+            for path in stable[:-1]:
+                handler, _ = new_tree.get_handler(path)
+                if handler != path:
+                    errors.append(f"{path} -> {handler}")
+            handler, ctx = new_tree.get_handler("/stable/abc/dynamic")
+            if handler != stable[-1] or ctx != {"name": "abc"}:
+                errors.append(f"dynamic -> {handler} {ctx}")
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        readers = [threading.Thread(target=reader) for _ in range(reader_count)]
+        writers = [threading.Thread(target=writer, args=(idx,)) for idx in range(writer_count)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert not errors
+    for writer_id in range(writer_count):
+        for idx in range(inserts_per_writer):
+            path = f"/stable/{idx}/item{writer_id}/{idx}"
+            assert new_tree.get_handler(path)[0] == path
+
+
+@pytest.mark.parametrize("thread_safe", (False, True))
+def test_raw_bytes_tree_matches_decoded_tree(test_routes: list[str], thread_safe: bool) -> None:
+    decoded_tree = tree.Tree()
+    raw_tree = tree.Tree(raw_bytes=True, thread_safe=thread_safe)
+    for path in test_routes:
+        decoded_tree.insert(path, path)
+        raw_tree.insert(path, path)
+
+    for path in (
+        "/search/someth!ng+in+ünìcodé",
+        "/γένωνται/name/aaa",
+        "/darüber/schloß/ritter",
+        "/info/erik/project/tokamak/dept/eng",
+        "/regex/123/test",
+        "/contact/",
+        "/missing",
+    ):
+        raw_path = quote(path).encode("ascii")
+        handler, context = raw_tree.get_handler(raw_path)
+        assert (handler, context) == decoded_tree.get_handler(path)
+        # decoded strings are percent-encoded before searching
+        assert raw_tree.get_handler(path) == (handler, context)
+
+
+def test_raw_bytes_tree_decodes_captures_on_access() -> None:
+    raw_tree = tree.Tree(raw_bytes=True)
+    raw_tree.insert("/a b/{name}", "A")
+    handler, context = raw_tree.get_handler(b"/a%20b/J%C3%BCrgen%2F")
+    assert handler == "A"
+    assert context._path == b"/a%20b/J%C3%BCrgen%2F"
+    assert context["name"] == "Jürgen/"
+    # matching is on the encoded form: this is not the same path
+    assert raw_tree.get_handler(b"/a+b/name") == (None, {})
+
+
+@pytest.mark.parametrize("thread_safe", (False, True))
+def test_case_insensitive_tree(thread_safe: bool) -> None:
+    new_tree = tree.Tree(case_insensitive=True, thread_safe=thread_safe)
+    new_tree.insert("/Users/{name}/Posts", "posts")
+    new_tree.insert("/Accounts/{id:[0-9]+}", "user")
+    new_tree.insert("/Straße/{code:[A-Z]+}", "street")
+    new_tree.insert("/Café", "cafe")
+
+    handler, context = new_tree.get_handler("/USERS/JoHn/posts/")
+    assert handler == "posts"
+    # captures keep the case of the path that was looked up
+    assert context == {"name": "JoHn"}
+    assert new_tree.get_handler("/aCCounts/12") == ("user", {"id": "12"})
+    assert new_tree.get_handler("/CAFÉ") == ("cafe", {})
+    # folding "ß" changes the path's length: captures come from the folded path
+    assert new_tree.get_handler("/STRASSE/AbC") == ("street", {"code": "AbC"})
+    assert new_tree.get_handler("/STRAßE/AbC") == ("street", {"code": "abc"})
+    assert new_tree.get_handler("/strasse/12") == (None, {})
+
+
+def test_case_insensitive_raw_bytes_tree() -> None:
+    new_tree = tree.Tree(case_insensitive=True, raw_bytes=True)
+    new_tree.insert("/Users/{name}/Posts", "posts")
+    new_tree.insert("/Café", "cafe")
+
+    assert new_tree.get_handler(b"/USERS/J%C3%BCrgen/posts") == ("posts", {"name": "Jürgen"})
+    # percent-encoding is matched regardless of the case of its hex digits
+    assert new_tree.get_handler(b"/cAf%c3%a9") == ("cafe", {})
+    # ...but only ASCII letters are folded in raw paths
+    assert new_tree.get_handler(b"/caf%C3%89") == (None, {})
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_children_of_dynamic_nodes_share_prefixes(seed: int) -> None:
+    routes = [
+        "/repos/{owner}/{repo}/issues",
+        "/repos/{owner}/{repo}/issues/events",
+        "/repos/{owner}/{repo}/issues/{number}",
+        "/repos/{owner}/{repo}/issues/{number}/events",
+        "/repos/{owner}/{repo}/pulls",
+        "/repos/{owner}/{repo}/pulls/comments",
+        "/repos/{owner}/{repo}/pages/builds/latest",
+        "/repos/{owner}/{repo}/pages",
+    ]
+    random.Random(seed).shuffle(routes)
+    new_tree = tree.Tree()
+    for path in routes:
+        new_tree.insert(path, path)
+
+    # radix property: static siblings never start with the same character
+    stack = [new_tree._root]
+    while stack:
+        current = stack.pop()
+        firsts = [child.path[:1] for child in current.children.static_nodes]
+        assert len(firsts) == len(set(firsts)), current.path
+        stack.extend(current.children)
+
+    for path in routes:
+        handler, _ = new_tree.get_handler(path.replace("{", "").replace("}", "").replace("number", "1"))
+        assert handler == path
+
+
+def test_stats(test_routes: list[str]) -> None:
+    empty = tree.Tree().stats()
+    assert empty.node_count == 1
+    assert empty.handler_count == 0
+    assert empty.mean_depth == 0.0
+    assert empty.fanout == {0: 1}
+
+    new_tree = tree.Tree(default_handler="default")
+    for path in test_routes:
+        new_tree.insert(path, path)
+    stats = new_tree.stats()
+
+    assert stats.node_count == len(new_tree._root)
+    assert stats.static_count + stats.dynamic_count == stats.node_count - 1
+    assert stats.handler_count == len(test_routes)
+    assert stats.leaf_count == stats.fanout[0]
+    assert sum(stats.fanout.values()) == stats.node_count
+    # "{filepath:*}" uses the default regex, like every parameter without one
+    assert stats.regex_count == 3
+    assert stats.max_depth >= stats.mean_depth > 1
+    assert stats.estimated_bytes > 0
+    assert stats.as_dict()["node_count"] == stats.node_count
+    assert "TreeStats(node_count=" in repr(stats)
+
+
+@pytest.mark.parametrize(
+    "kwargs", ({}, {"raw_bytes": True}, {"case_insensitive": True}, {"thread_safe": True})
+)
+def test_compile_to_python(test_routes: list[str], kwargs: dict, tmp_path) -> None:
+    plain_tree = tree.Tree(default_handler="default", **kwargs)
+    compiled_tree = tree.Tree(default_handler="default", **kwargs)
+    # deep enough to split the generated code into several functions
+    deep_route = "/deep" + "/{x}/a" * 12
+    for path in (*test_routes, deep_route):
+        plain_tree.insert(path, path)
+        compiled_tree.insert(path, path)
+
+    cache_path = tmp_path / "matcher.py"
+    matcher = compiled_tree.compile_to_python(cache_path=cache_path)
+    assert "def match(path, pos, captures):" in matcher.source
+    assert "def _s0(path, pos, captures):" in matcher.source
+    assert matcher.cache_file is not None and matcher.cache_file.parent == tmp_path
+    assert matcher.cache_file.name.startswith("matcher_")
+    assert matcher.cache_file.read_text(encoding="utf-8") == matcher.source
+
+    lookups = [*test_routes, "/deep" + "/1/a" * 12, "/hello/world", "/doc/missing", "/info/x/project/y"]
+    for path in lookups:
+        handler, context = compiled_tree.get_handler(path)
+        plain_handler, plain_context = plain_tree.get_handler(path)
+        assert handler == plain_handler
+        assert dict(context) == dict(plain_context)
+    assert matcher.search_path(b"/cmd/ls/la" if kwargs.get("raw_bytes") else "/cmd/ls/la")[0] is not None
+
+    # a second compile reuses the cached source
+    again = compiled_tree.compile_to_python(cache_path=cache_path)
+    assert again.source == matcher.source
+    assert again.cache_file == matcher.cache_file
+    # inserting stops using the compiled matcher
+    compiled_tree.insert("/brand/new", "new")
+    assert compiled_tree.get_handler("/brand/new")[0] == "new"
+
+
+COMPILE_SCRIPT = """
+from tokamak.radix_tree import tree
+new_tree = tree.Tree()
+for path in ("/users/{id:[0-9]+}", "/users/{name}", "/users/{id:[0-9]+}/pets", "/about", "/api", "/b", "/c"):
+    new_tree.insert(path, path)
+print(new_tree.compile_to_python().source)
+"""
+
+
+def test_compile_to_python_is_reproducible() -> None:
+    # the same routes generate the same source (and cache file) whatever the hash seed
+    sources = {
+        subprocess.run(
+            [sys.executable, "-c", COMPILE_SCRIPT],
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        for seed in ("1", "2", "3")
+    }
+    assert len(sources) == 1
+
+
+def test_compile_to_python_cache_per_source(tmp_path) -> None:
+    cache_path = tmp_path / "matcher.py"
+    first_tree, second_tree = tree.Tree(), tree.Tree()
+    first_tree.insert("/first/{id}", "first")
+    second_tree.insert("/second/{id}", "second")
+
+    first = first_tree.compile_to_python(cache_path=cache_path)
+    second = second_tree.compile_to_python(cache_path=cache_path)
+    assert first.cache_file != second.cache_file
+    # compiling the first routes again loads their own source, not the latest file's
+    assert first_tree.compile_to_python(cache_path=cache_path).source == first.source
+    assert first_tree.get_handler("/first/1")[0] == "first"
+    assert first_tree.get_handler("/second/1")[0] is None
+
+
+@pytest.mark.parametrize("kwargs", ({}, {"raw_bytes": True}, {"case_insensitive": True}))
+def test_freeze(test_routes: list[str], kwargs: dict) -> None:
+    plain_tree = tree.Tree(default_handler="default", **kwargs)
+    frozen_tree = tree.Tree(default_handler="default", **kwargs)
+    routes = [
+        *test_routes,
+        "/items/{id:[0-9]+}",
+        "/items/{id:[0-9]+}/detail",
+        "/items/{slug:[a-z-]+}",
+        "/items/{slug:[a-z-]+}/detail",
+        "/items/{version:v[0-9]+}/notes",
+    ]
+    for path in routes:
+        plain_tree.insert(path, path)
+        frozen_tree.insert(path, path)
+    frozen_tree.freeze()
+
+    assert frozen_tree.frozen
+    with pytest.raises(ValueError):
+        frozen_tree.insert("/too/late", "late")
+    lookups = [
+        *test_routes,
+        "/items/12/detail",
+        "/items/a-b",
+        "/items/v2/notes",
+        "/items/V2/NOTES",
+        "/items/_",
+    ]
+    for path in lookups:
+        handler, context = frozen_tree.get_handler(path)
+        plain_handler, plain_context = plain_tree.get_handler(path)
+        assert handler == plain_handler
+        assert list(context.items()) == list(plain_context.items())
+
+
+def test_iter_matches():
+    new_tree = tree.Tree(default_handler="default")
+    for path in (
+        "/events/orders/created",
+        "/events/{kind}/created",
+        "/events/{kind}/{action}",
+        "/events/{path:.+}",
+        "/events/orders",
+    ):
+        new_tree.insert(path, path)
+
+    matches = new_tree.iter_matches("/events/orders/created")
+    handler, context = next(matches)
+    assert handler == "/events/orders/created"
+    assert not context
+    rest = {handler: dict(context) for handler, context in matches}
+    assert rest == {
+        "/events/{kind}/created": {"kind": "orders"},
+        "/events/{kind}/{action}": {"kind": "orders", "action": "created"},
+        "/events/{path:.+}": {"path": "orders/created"},
+    }
+    assert list(new_tree.iter_matches("/nothing")) == []
+    # the default handler is never yielded, and trailing slashes are relaxed as usual
+    assert [handler for handler, _ in new_tree.iter_matches("/events/orders/")] == [
+        "/events/orders",
+        "/events/{path:.+}",
+    ]
+
+
+@pytest.mark.parametrize(
+    "kwargs,path",
+    (
+        ({"raw_bytes": True}, b"/Caf%C3%A9/Soupe%20du%20jour"),
+        ({"case_insensitive": True}, "/CAFÉ/Soupe du jour"),
+        ({"prefilter": True}, "/Café/Soupe du jour"),
+        ({"limits": limits.LookupLimits(max_nodes_visited=100)}, "/Café/Soupe du jour"),
+    ),
+)
+def test_iter_matches_modes(kwargs, path):
+    new_tree = tree.Tree(**kwargs)
+    new_tree.insert("/Café/{name}", "menu")
+    new_tree.insert("/{place}/{name}", "any")
+    matches = [(handler, dict(context)) for handler, context in new_tree.iter_matches(path)]
+    assert matches[0] == ("menu", {"name": "Soupe du jour"})
+    assert matches[1][0] == "any"
+    assert list(new_tree.iter_matches("/scanner.php")) == []
+
+
+def test_iter_matches_limits():
+    raising_tree = tree.Tree(
+        limits=limits.LookupLimits(max_nodes_visited=2, action=limits.LimitAction.RAISE)
+    )
+    missing_tree = tree.Tree(limits=limits.LookupLimits(max_path_length=10))
+    for new_tree in (raising_tree, missing_tree):
+        new_tree.insert("/users/{id}", "user")
+        new_tree.insert("/users/{id}/{kind}", "things")
+    with pytest.raises(limits.LookupLimitError):
+        list(raising_tree.iter_matches("/users/1/pets"))
+    assert list(missing_tree.iter_matches("/users/12345678/pets")) == []
+
+
+@pytest.mark.parametrize(
+    "path,expected,context",
+    (
+        ("/api", "api", {}),
+        ("/api/users", "api", {}),
+        ("/api/v2/users/42/keys", "user", {"id": "42"}),
+        ("/api/v2/users/42", "user", {"id": "42"}),
+        ("/api/v2/users", "v2", {}),
+        ("/api/v2/usersx", "v2", {}),
+        ("/static/css/site.css", "static", {}),
+        ("/apis", "default", {}),
+        ("/", "default", {}),
+        ("/other/api", "default", {}),
+    ),
+)
+def test_longest_prefix(path, expected, context):
+    new_tree = tree.Tree(default_handler="default", trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    for route, handler in (
+        ("/api", "api"),
+        ("/api/v2", "v2"),
+        ("/api/v2/users/{id}", "user"),
+        ("/api/v2/users/{id}/keys/{key}", "key"),
+        ("/static/", "static"),
+    ):
+        new_tree.insert(route, handler)
+    handler, captured = new_tree.longest_prefix(path)
+    assert handler == expected
+    assert dict(captured) == context
+
+
+@pytest.mark.parametrize(
+    "kwargs,path",
+    (
+        ({"raw_bytes": True}, b"/Caf%C3%A9/Soupe%20du%20jour/prix"),
+        ({"case_insensitive": True}, "/CAFÉ/Soupe du jour/prix"),
+        ({"limits": limits.LookupLimits(max_nodes_visited=10)}, "/Café/Soupe du jour/prix"),
+    ),
+)
+def test_longest_prefix_modes(kwargs, path):
+    new_tree = tree.Tree(**kwargs)
+    new_tree.insert("/Café/{name}", "menu")
+    handler, context = new_tree.longest_prefix(path)
+    assert handler == "menu"
+    assert context == {"name": "Soupe du jour"}
+
+    limited = tree.Tree(**{**kwargs, "limits": limits.LookupLimits(max_nodes_visited=1)})
+    limited.insert("/Café/{name}", "menu")
+    assert limited.longest_prefix(path)[0] is None
+
+
+def test_keys_and_items(test_routes):
+    new_tree = tree.Tree(default_handler="default", trailing_slash_match=tree.TrailingSlashMatch.STRICT)
+    for path in test_routes:
+        new_tree.insert(path, path)
+
+    assert list(new_tree.keys()) == sorted(test_routes)
+    assert list(new_tree.items()) == [(path, path) for path in sorted(test_routes)]
+    assert list(new_tree.keys(prefix="/info/")) == sorted(
+        path for path in test_routes if path.startswith("/info/")
+    )
+    assert list(new_tree.keys(prefix="/info/{user}/pro", limit=1)) == ["/info/{user}/project"]
+    assert list(new_tree.keys(prefix="/nothing")) == []
+    assert list(new_tree.keys(limit=0)) == []
+    with pytest.raises(ValueError):
+        list(new_tree.keys(limit=-1))
+
+
+@pytest.mark.parametrize(
+    "kwargs,prefix,expected",
+    (
+        ({"raw_bytes": True}, "/Café/", ["/Café/{name}", "/Café/menu"]),
+        ({"case_insensitive": True}, "/CAFÉ/", ["/café/{name}", "/café/menu"]),
+        ({"thread_safe": True}, "/Café/", ["/Café/menu", "/Café/{name}"]),
+    ),
+)
+def test_keys_modes(kwargs, prefix, expected):
+    new_tree = tree.Tree(**kwargs)
+    new_tree.insert("/Café/{name}", "name")
+    new_tree.insert("/Café/menu", "menu")
+    new_tree.insert("/Bar", "bar")
+    assert sorted(new_tree.keys(prefix=prefix)) == sorted(expected)
+    assert list(new_tree.keys(prefix=prefix)) == sorted(expected)
+
+
+@pytest.mark.parametrize(
+    "kwargs", ({}, {"thread_safe": True}, {"raw_bytes": True}, {"case_insensitive": True})
+)
+def test_tree_mapping(kwargs):
+    new_tree = tree.Tree(default_handler="default", **kwargs)
+    # a tree without routes is still truthy, but trees compare by their routes
+    # (as mappings), so they can't be hashed
+    assert len(new_tree) == 0
+    assert new_tree
+    with pytest.raises(TypeError):
+        hash(new_tree)
+    new_tree.insert("/users/{id}", "user")
+    new_tree["/users/{id}/pets"] = "pets"
+    new_tree["/users/me"] = "me"
+    new_tree["/Café/"] = "café"
+
+    assert len(new_tree) == 4
+    assert new_tree["/users/{id}"] == "user"
+    assert new_tree["/users/{id:*}"] == "user"
+    assert new_tree["/Café"] == "café"
+    assert "/users/{id}/pets" in new_tree
+    # exact routes only: no parameter matching, and no partial routes
+    assert "/users/42" not in new_tree
+    assert "/users" not in new_tree
+    assert "users" not in new_tree
+    assert new_tree.get("/nothing") is None
+
+    new_tree["/users/me"] = "myself"
+    assert len(new_tree) == 4
+    assert new_tree.get_handler("/users/me")[0] == "myself"
+    # inserting the same handler again doesn't add a route
+    new_tree.insert("/users/me", "myself")
+    assert len(new_tree) == 4
+
+    del new_tree["/users/{id}"]
+    assert len(new_tree) == 3
+    assert new_tree.get_handler("/users/42")[0] == "default"
+    assert new_tree.get_handler("/users/42/pets")[0] == "pets"
+    with pytest.raises(KeyError):
+        del new_tree["/users/{id}"]
+    with pytest.raises(KeyError):
+        del new_tree["users"]
+    with pytest.raises(ValueError):
+        new_tree["/users/{id}"] = None
+
+    cafe = "/café" if kwargs.get("case_insensitive") else "/Café"
+    assert dict(new_tree) == {"/users/{id}/pets": "pets", "/users/me": "myself", cafe: "café"}
+    assert sorted(new_tree.values()) == ["café", "myself", "pets"]
+    new_tree.clear()
+    assert len(new_tree) == 0
+    assert new_tree.get_handler("/users/me")[0] == "default"
+
+
+def test_tree_delete_prunes_nodes():
+    expected = tree.Tree()
+    expected.insert("/users/{id}", "user")
+    expected.insert("/users/{id}/pets", "pets")
+
+    new_tree = tree.Tree()
+    for path in ("/users/{id}", "/users/{id}/pets", "/users/me", "/users/mentions/{id}", "/teams"):
+        new_tree[path] = path
+    for path in ("/users/mentions/{id}", "/teams", "/users/me"):
+        del new_tree[path]
+    new_tree["/users/{id}"] = "user"
+    new_tree["/users/{id}/pets"] = "pets"
+
+    assert len(new_tree._root) == len(expected._root)
+    assert list(new_tree.items()) == list(expected.items())
+    assert sorted(child.path for child in new_tree._root.children) == ["/users/"]
+
+    # a static node left with a single static child is merged with it
+    merged = tree.Tree()
+    merged["/abc"] = "abc"
+    merged["/abd"] = "abd"
+    merged["/ab"] = "ab"
+    del merged["/abd"]
+    del merged["/ab"]
+    assert [child.path for child in merged._root.children] == ["/abc"]
+    assert merged.get_handler("/abc")[0] == "abc"
+
+
+def test_frozen_tree_mapping():
+    new_tree = tree.Tree()
+    new_tree["/a"] = "a"
+    new_tree.freeze()
+    assert new_tree["/a"] == "a"
+    with pytest.raises(ValueError):
+        new_tree["/a"] = "b"
+    with pytest.raises(ValueError):
+        del new_tree["/a"]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    ({}, {"thread_safe": True}, {"raw_bytes": True}, {"case_insensitive": True}, {"prefilter": True}),
+)
+def test_tree_merge(kwargs, test_routes):
+    expected = tree.Tree(default_handler="default", **kwargs)
+    plugins = [tree.Tree(**kwargs) for _ in range(3)]
+    for idx, path in enumerate(test_routes):
+        expected.insert(path, path)
+        plugins[idx % 3].insert(path, path)
+
+    merged = tree.Tree(default_handler="default", **kwargs)
+    merged.insert("/contact", "mine")
+    copied = [list(plugin.items()) for plugin in plugins]
+    for plugin in plugins:
+        conflicts = merged.merge(plugin)
+        assert conflicts == (["/contact"] if "/contact" in plugin else [])
+    # merging copies: the plugins are untouched, and independent of the result
+    assert [list(plugin.items()) for plugin in plugins] == copied
+    merged.insert("/cmd/{tool}/extra", "extra")
+    assert all(plugin.get_handler("/cmd/test/extra")[0] != "extra" for plugin in plugins)
+    del merged["/cmd/{tool}/extra"]
+
+    assert len(merged) == len(expected)
+    assert merged.get_handler("/contact")[0] == "mine"
+    merged["/contact"] = expected["/contact"]
+    assert list(merged.items()) == list(expected.items())
+    for path in (*test_routes, "/missing", "/hello/world/"):
+        assert merged.get_handler(path) == expected.get_handler(path)
+
+
+def test_thread_safe_merge_copies_only_touched_nodes(test_routes: list[str]) -> None:
+    base = tree.Tree(thread_safe=True)
+    for path in test_routes:
+        base.insert(path, path)
+    old_root = base._root
+    old_routes = [(route, found.handler) for route, found in node.iter_routes(old_root)]
+
+    plugin = tree.Tree()
+    plugin.insert("/cmd/{tool}/{sub}/extra", "extra")
+    plugin.insert("/users/{id}", "user")
+    plugin.insert("/search", "mine")
+    assert base.merge(plugin) == ["/search"]
+    assert base.get_handler("/cmd/ls/la/extra") == ("extra", {"tool": "ls", "sub": "la"})
+    assert base.get_handler("/users/7")[0] == "user"
+
+    # the old version is left as readers saw it
+    assert [(route, found.handler) for route, found in node.iter_routes(old_root)] == old_routes
+    assert old_root.search_path("/cmd/ls/la/extra")[0] is None
+    # and subtrees the merge didn't reach are shared with the new one
+    (old_slash,) = old_root.children
+    (new_slash,) = base._root.children
+    assert new_slash is not old_slash
+    old_children = {child.path[:1]: child for child in old_slash.children}
+    for child in new_slash.children:
+        assert (child is old_children[child.path[:1]]) == (child.path[:1] not in "cus")
+
+
+def test_tree_merge_consume():
+    base = tree.Tree()
+    base.insert("/api/users/{id}", "user")
+    plugin = tree.Tree(default_handler="plugin default")
+    plugin.insert("/api/users/{id}/pets", "pets")
+    plugin.insert("/api/user", "user root")
+    plugin.insert("/api/users/{id}", "user")
+    plugin.insert("/static/{path:.*}", "static")
+
+    assert base.merge(plugin, consume=True) == []
+    assert len(base) == 4
+    assert len(plugin) == 0
+    assert list(plugin.items()) == []
+    assert plugin.get_handler("/static/app.js")[0] == "plugin default"
+    assert dict(base.items()) == {
+        "/api/user": "user root",
+        "/api/users/{id}": "user",
+        "/api/users/{id}/pets": "pets",
+        "/static/{path:.*}": "static",
+    }
+    assert base.get_handler("/api/users/7/pets") == ("pets", {"id": "7"})
+    assert base.get_handler("/api/user")[0] == "user root"
+
+
+def test_tree_merge_errors():
+    new_tree = tree.Tree()
+    with pytest.raises(ValueError):
+        new_tree.merge(new_tree)
+    with pytest.raises(ValueError):
+        new_tree.merge(tree.Tree(case_insensitive=True))
+    with pytest.raises(ValueError):
+        new_tree.merge(tree.Tree(trailing_slash_match=tree.TrailingSlashMatch.STRICT))
+
+    frozen = tree.Tree()
+    frozen.insert("/a", "a")
+    frozen.freeze()
+    with pytest.raises(ValueError):
+        frozen.merge(tree.Tree())
+    with pytest.raises(ValueError):
+        new_tree.merge(frozen, consume=True)
+    # a frozen tree can still be copied from
+    assert new_tree.merge(frozen) == []
+    assert new_tree.get_handler("/a")[0] == "a"
+
+
+@pytest.mark.parametrize(
+    "kwargs", ({}, {"thread_safe": True}, {"raw_bytes": True}, {"case_insensitive": True})
+)
+def test_tree_diff_apply(kwargs):
+    old_routes = {"/users/{id}": "user", "/users/me": "me", "/Café/menu": "menu", "/teams": "teams"}
+    new_routes = {"/users/{id}": "user", "/users/me": "myself", "/Café/menu": "menu", "/orgs/{org}": "org"}
+    current = tree.Tree(**kwargs)
+    target = tree.Tree(**kwargs)
+    for path, handler in old_routes.items():
+        current[path] = handler
+    for path, handler in new_routes.items():
+        target[path] = handler
+
+    diff = current.diff(target)
+    assert diff.added == {"/orgs/{org}": "org"}
+    assert diff.removed == {"/teams": "teams"}
+    assert diff.changed == {"/users/me": ("me", "myself")}
+    assert len(diff) == 3
+    # a mapping of routes, written as for `insert`, gives the same diff
+    assert repr(current.diff(new_routes)) == repr(diff)
+
+    current.apply(diff)
+    assert not current.diff(target)
+    assert len(current) == len(target)
+    assert list(current.items()) == list(target.items())
+    for path in ("/users/42", "/users/me", "/orgs/acme", "/teams", "/Café/menu"):
+        assert current.get_handler(path) == target.get_handler(path)
+
+    # a stale diff changes nothing
+    with pytest.raises(KeyError):
+        current.apply(diff)
+    assert list(current.items()) == list(target.items())
+    with pytest.raises(ValueError):
+        current.apply(tree.RouteDiff(added={"/none": None}))
+    with pytest.raises(ValueError):
+        current.diff(tree.Tree(separator="."))
+
+
+def test_frozen_tree_apply():
+    current = tree.Tree()
+    current.insert("/items/{id:[0-9]+}", "by id")
+    current.insert("/items/{slug:[a-z]+}", "by slug")
+    current.insert("/items/new", "new")
+    current.freeze()
+    compiled = current.compile_to_python()
+    assert current.get_handler("/items/ABC")[0] is None
+
+    # only handlers change: the nodes, and the compiled matcher, are kept
+    current.apply(tree.RouteDiff(changed={"/items/new": ("new", "create")}))
+    assert current._compiled is compiled
+    assert current.get_handler("/items/new")[0] == "create"
+
+    current.apply(
+        tree.RouteDiff(added={"/items/{code:[A-Z]+}": "by code"}, removed={"/items/{id:[0-9]+}": "by id"})
+    )
+    assert current.frozen
+    assert current._compiled is None
+    alternation = next(iter(current._root.children)).children.alternation
+    assert alternation is not None
+    assert {child.parser.name for child in alternation.children} == {"slug", "code"}
+    assert current.get_handler("/items/ABC") == ("by code", {"code": "ABC"})
+    assert current.get_handler("/items/abc")[0] == "by slug"
+    assert current.get_handler("/items/42")[0] is None
+    with pytest.raises(ValueError):
+        current.insert("/items/other", "other")
+
+
+def test_thread_safe_frozen_tree_apply_keeps_alternations():
+    current = tree.Tree(thread_safe=True)
+    for path in ("/items/{id:[0-9]+}", "/items/{slug:[a-z]+}", "/items/{id:[0-9]+}/{part:[0-9]+}"):
+        current.insert(path, path)
+    current.insert("/items/{id:[0-9]+}/{tag:[a-z]+}", "tag")
+    current.insert("/items/{slug:[a-z]+}/{page:[0-9]+}", "page")
+    current.insert("/items/{slug:[a-z]+}/{section:[a-z]+}", "section")
+    current.freeze()
+
+    def alternations() -> list:
+        found = []
+        stack = [current._root]
+        while stack:
+            parent = stack.pop()
+            if parent.children.alternation is not None:
+                found.append(parent.children.alternation)
+            stack.extend(parent.children)
+        return found
+
+    assert len(alternations()) == 3
+    # `{slug}` is copied along with `{id}`, and keeps the alternation of its children
+    current.apply(tree.RouteDiff(added={"/items/{id:[0-9]+}/7/extra": "extra"}))
+    assert len(alternations()) == 3
+    assert current.get_handler("/items/42/7/extra")[0] == "extra"
+    assert current.get_handler("/items/42/abc") == ("tag", {"id": "42", "tag": "abc"})
+    assert current.get_handler("/items/abc/12") == ("page", {"slug": "abc", "page": "12"})
+    # the alternation tries the copies, not the nodes of the old version
+    id_node = next(
+        child
+        for alternation in alternations()
+        for child in alternation.children
+        if child.path == "{id:[0-9]+}"
+    )
+    assert current._find_route(current._root, "/items/{id:[0-9]+}")[-1] is id_node
@@ -141,3 +141,50 @@ def test_parse_dyn_bad(bad_data):
 )
 def test_parse_dyn(test_val, parts):
     assert list(utils.parse_dynamic(test_val)) == parts
+
+
+@pytest.mark.parametrize(
+    "separator,value,end",
+    (
+        ("/", "eu.west/created", 7),
+        (".", "eu.west/created", 2),
+        ("::", "eu:west::created", 7),
+    ),
+)
+def test_parse_dyn_separator(separator, value, end):
+    (param,) = utils.parse_dynamic("{region}", separator)
+    assert param.match(value)[0] == end
+    (param,) = utils.parse_dynamic("{region:*}", separator)
+    assert param.match(value)[0] == end
+
+
+def test_capture_map():
+    path = "/a/one/b/two/c/three"
+    captures = [("x", 3, 6), ("y", 9, 12), ("x", 15, 20)]
+    context = utils.CaptureMap(path, captures)
+    # last capture for a name wins
+    assert context["x"] == "three"
+    assert context["y"] == "two"
+    assert list(context) == ["x", "y"]
+    assert len(context) == 2
+    assert context == {"x": "three", "y": "two"}
+    assert context.get("z") is None
+    with pytest.raises(KeyError):
+        context["z"]
+
+    assert not utils.CaptureMap(path, [])
+    assert utils.CaptureMap(path, []) == {}
+
+
+def test_capture_map_decodes_on_access():
+    decoded = []
+
+    def decode(value):
+        decoded.append(value)
+        return value.decode("utf-8")
+
+    context = utils.CaptureMap(b"/user/caf\xc3\xa9", [("name", 6, 11)], decode=decode)
+    assert not decoded
+    assert context["name"] == "café"
+    assert decoded == [b"caf\xc3\xa9"]
+    assert repr(context) == "CaptureMap({'name': 'café'})"
@@ -2,7 +2,9 @@ from string import Formatter
 
 import pytest
 from hypothesis import given, strategies
-from tokamak.router import AsgiRouter, Route
+from tokamak.radix_tree import limits
+from tokamak.radix_tree.packed import SharedRouteTable
+from tokamak.router import AsgiRouter, Route, RouterError, UnknownEndpointError
 
 LARGE_PATH_LIST = [
     "/",
@@ -170,3 +172,168 @@ def test_router(route_path, replace_text):
     router.add_route(Route(route_path, handler=lambda x: x, methods=["GET"]))
     real_path = large_path_to_fake_path(route_path, replace_text)
     assert router.get_route(real_path)
+
+
+def test_router_share_route_table():
+    routes = [Route(path, handler=lambda x: x, methods=["GET"]) for path in LARGE_PATH_LIST]
+    router = AsgiRouter(routes=routes)
+    assert router.routes == routes
+
+    table = router.share()
+    try:
+        worker_table = SharedRouteTable.attach(table.name, handlers=routes)
+        worker_router = AsgiRouter.from_route_table(worker_table)
+        for route_path in LARGE_PATH_LIST:
+            real_path = large_path_to_fake_path(route_path, "abc")
+            assert worker_router.tree.get_handler(real_path) == router.tree.get_handler(real_path)
+        assert worker_router.get_route("/repos/abc/def/pulls/1/merge") == (
+            router.get_route("/repos/abc/def/pulls/1/merge")
+        )
+        with pytest.raises(UnknownEndpointError):
+            worker_router.get_route("/not/a/real/path")
+        with pytest.raises(RouterError):
+            worker_router.share()
+        worker_table.close()
+    finally:
+        table.close()
+        table.unlink()
+
+
+def test_router_share_keeps_limits_and_prefilter():
+    routes = [Route(path, handler=lambda x: x, methods=["GET"]) for path in LARGE_PATH_LIST]
+    lookup_limits = limits.LookupLimits(max_path_length=64, action=limits.LimitAction.RAISE)
+    table = AsgiRouter(routes=routes, prefilter=True, lookup_limits=lookup_limits).share()
+    try:
+        worker_table = SharedRouteTable.attach(table.name, handlers=routes)
+        worker_router = AsgiRouter.from_route_table(worker_table)
+        assert repr(worker_router.tree.limits) == repr(lookup_limits)
+        assert worker_router.tree.prefilter is not None
+        with pytest.raises(limits.PathTooLongError):
+            worker_router.get_route("/feeds/" + "x" * 100)
+        with pytest.raises(UnknownEndpointError):
+            worker_router.get_route("/wp-admin/setup.php")
+        tenant = worker_router.overlay()
+        assert repr(tenant.tree.limits) == repr(lookup_limits)
+        assert tenant.tree.prefilter is not None
+        worker_table.close()
+    finally:
+        table.close()
+        table.unlink()
+
+
+def test_router_match_raw_path():
+    routes = [Route(path, handler=lambda x: x, methods=["GET"]) for path in LARGE_PATH_LIST]
+    router = AsgiRouter(routes=routes, match_raw_path=True)
+    route, context = router.get_route(b"/repos/ab%20c/d%C3%A9f/pulls/1/merge")
+    assert route.path == "/repos/{owner}/{repo}/pulls/{number}/merge"
+    assert context == {"owner": "ab c", "repo": "déf", "number": "1"}
+    with pytest.raises(UnknownEndpointError):
+        router.get_route(b"/not/a/real/path")
+
+    table = router.share()
+    try:
+        worker_table = SharedRouteTable.attach(table.name, handlers=routes)
+        worker_router = AsgiRouter.from_route_table(worker_table)
+        assert worker_router.match_raw_path
+        assert worker_router.get_route(b"/repos/ab%20c/d%C3%A9f/pulls/1/merge") == (route, context)
+        worker_table.close()
+    finally:
+        table.close()
+        table.unlink()
+
+
+def test_router_overlay():
+    routes = [Route(path, handler=lambda x: x, methods=["GET"]) for path in LARGE_PATH_LIST]
+    base = AsgiRouter(routes=routes, case_insensitive=True)
+    tenant_routes = [
+        Route("/tenant/{name}", handler=lambda x: x),
+        Route("/feeds", handler=lambda x: x, methods=["POST"]),
+    ]
+    tenant = base.overlay(tenant_routes)
+    other = base.overlay()
+
+    assert base.tree.frozen
+    assert tenant.base is base
+    assert tenant.routes == tenant_routes
+    assert tenant.tree.case_insensitive
+    assert len(tenant.tree) == 2
+
+    # overlay routes first, then the base's
+    route, context = tenant.get_route("/Tenant/Acme")
+    assert route is tenant_routes[0]
+    assert context == {"name": "Acme"}
+    assert tenant.get_route("/feeds")[0] is tenant_routes[1]
+    assert other.get_route("/feeds") == base.get_route("/feeds")
+    assert tenant.get_route("/repos/abc/def/pulls/1/merge") == (
+        base.get_route("/repos/abc/def/pulls/1/merge")
+    )
+    with pytest.raises(UnknownEndpointError):
+        tenant.get_route("/not/a/real/path")
+    with pytest.raises(UnknownEndpointError):
+        other.get_route("/tenant/acme")
+
+    # overlays of overlays, and routes added later
+    nested = tenant.overlay([Route("/feeds", handler=lambda x: x)])
+    assert nested.get_route("/tenant/acme")[0] is tenant_routes[0]
+    with pytest.raises(ValueError):
+        base.add_route(Route("/late", handler=lambda x: x))
+    with pytest.raises(RouterError):
+        tenant.share()
+
+
+def test_router_overlay_prefilter():
+    routes = [Route(path, handler=lambda x: x) for path in LARGE_PATH_LIST]
+    base = AsgiRouter(routes=routes, prefilter=True)
+    tenant = base.overlay([Route("/tenant/{name}", handler=lambda x: x)])
+    assert tenant.tree.prefilter is not None
+    assert AsgiRouter(routes=routes).overlay().tree.prefilter is None
+
+    # paths the overlay's prefilter rejects are still looked up in the base
+    assert tenant.get_route("/feeds") == base.get_route("/feeds")
+    assert tenant.get_route("/tenant/acme")[1] == {"name": "acme"}
+    with pytest.raises(UnknownEndpointError):
+        tenant.get_route("/wp-admin/setup.php")
+
+
+def test_router_overlay_route_table():
+    routes = [Route(path, handler=lambda x: x, methods=["GET"]) for path in LARGE_PATH_LIST]
+    table = AsgiRouter(routes=routes, match_raw_path=True).share()
+    try:
+        worker_table = SharedRouteTable.attach(table.name, handlers=routes)
+        tenant_route = Route("/tenant/{name}", handler=lambda x: x)
+        tenant = AsgiRouter.from_route_table(worker_table).overlay([tenant_route])
+        assert tenant.match_raw_path
+        assert tenant.get_route(b"/tenant/caf%C3%A9") == (tenant_route, {"name": "café"})
+        route, context = tenant.get_route(b"/repos/a/b/pulls/1/merge")
+        assert route.path == "/repos/{owner}/{repo}/pulls/{number}/merge"
+        worker_table.close()
+    finally:
+        table.close()
+        table.unlink()
+
+
+def test_router_explain():
+    routes = [Route(path, handler=lambda x: x, methods=["GET"]) for path in LARGE_PATH_LIST]
+    base = AsgiRouter(routes=routes)
+    explanation = base.explain("/repos/abc/def/pulls/1/merge")
+    assert explanation.handler.path == explanation.route == "/repos/{owner}/{repo}/pulls/{number}/merge"
+    assert explanation.handler is base.get_route("/repos/abc/def/pulls/1/merge")[0]
+    assert dict(explanation.context) == {"owner": "abc", "repo": "def", "number": "1"}
+    assert explanation.steps[-1].matched
+    assert base.explain("/not/a/real/path").route is None
+
+    tenant = base.overlay([Route("/tenant/{name}", handler=lambda x: x)])
+    assert tenant.explain("/tenant/acme").route == "/tenant/{name}"
+    explanation = tenant.explain("/feeds")
+    assert explanation.route == "/feeds"
+    assert "base" in [step.action for step in explanation.steps]
+
+    table = base.share()
+    try:
+        worker_table = SharedRouteTable.attach(table.name, handlers=routes)
+        with pytest.raises(RouterError):
+            AsgiRouter.from_route_table(worker_table).explain("/feeds")
+        worker_table.close()
+    finally:
+        table.close()
+        table.unlink()
@@ -0,0 +1,261 @@
+"""
+Compiles a route tree into a Python function.
+
+For a fixed set of routes, a generated function made of nested `startswith` checks
+and calls to each parameter's compiled regex is much faster than walking node objects:
+there are no method calls or child-set iterations left, only comparisons.
+
+The generated source is plain Python that can be read (`CompiledMatcher.source`) and
+stored on disk (see `Tree.compile_to_python`). Parameter patterns are not written into
+the source: they are bound as globals (`_m<node index>`) when the source is loaded.
+
+The function searches exactly as `RadixNode.search` does: parameters are tried in the
+same order (after static children), the first node that consumes the whole path is
+returned, and `(name, start, end)` captures are appended in the same order. Static
+children are written in order of their labels (at most one of them can match), so the
+same routes, inserted in the same order, always generate the same source.
+"""
+import hashlib
+import importlib.util
+import os
+import py_compile
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from . import node, utils
+
+HEADER = "# Generated by tokamak.radix_tree.codegen: do not edit.\n"
+MATCH_FUNCTION = "match"
+# Nodes nested inside a single function: deeper subtrees get their own functions,
+# because Python limits how deeply blocks can be nested
+MAX_INLINE_DEPTH = 8
+# Nodes with at least this many static children first dispatch on the next character
+DISPATCH_THRESHOLD = 4
+INDENT = "    "
+
+
+class _Generator:
+    """Walks a tree once, numbering its nodes and writing the source of each function"""
+
+    def __init__(self, root: node.RadixNode):
+        self.nodes: list[node.RadixNode] = []
+        self.functions: list[list[str]] = []
+        self.pending: list[tuple[str, node.RadixNode]] = [(MATCH_FUNCTION, root)]
+        self.subtree_count = 0
+
+    def generate(self) -> str:
+        while self.pending:
+            name, subtree_root = self.pending.pop(0)
+            lines = [f"def {name}(path, pos, captures):", f"{INDENT}end = len(path)"]
+            self.emit_node(subtree_root, lines, "pos", 0, 1)
+            lines.append(f"{INDENT}return -1")
+            self.functions.append(lines)
+        return HEADER + "".join("\n\n" + "\n".join(lines) + "\n" for lines in self.functions)
+
+    def emit_node(
+        self,
+        current: node.RadixNode,
+        lines: list[str],
+        pos: str,
+        depth: int,
+        level: int,
+        first_checked: bool = False,
+    ) -> None:
+        """
+        Writes the checks for `current`, which starts at offset `pos` of the path.
+        With `first_checked`, the first character of its label is known to match.
+        """
+        idx = len(self.nodes)
+        self.nodes.append(current)
+        indent = INDENT * level
+        new_pos = f"p{depth + 1}"
+        if isinstance(current, node.DynamicNode):
+            lines.append(f"{indent}m = _m{idx}(path, {pos})")
+            lines.append(f"{indent}if m is not None:")
+            lines.append(f"{indent}{INDENT}{new_pos} = m.end()")
+            lines.append(f"{indent}{INDENT}captures.append(({current.parser.name!r}, {pos}, {new_pos}))")
+            level += 1
+        elif len(current.path) == 1 and first_checked:
+            lines.append(f"{indent}{new_pos} = {pos} + 1")
+        elif current.path:
+            lines.append(f"{indent}if path.startswith({current.path!r}, {pos}):")
+            lines.append(f"{indent}{INDENT}{new_pos} = {pos} + {len(current.path)}")
+            level += 1
+        else:
+            lines.append(f"{indent}{new_pos} = {pos}")
+
+        indent = INDENT * level
+        lines.append(f"{indent}if {new_pos} == end:")
+        lines.append(f"{indent}{INDENT}return {idx}")
+        self.emit_children(current, lines, new_pos, depth + 1, level)
+
+    def emit_child(
+        self,
+        child: node.RadixNode,
+        lines: list[str],
+        pos: str,
+        depth: int,
+        level: int,
+        first_checked: bool = False,
+    ) -> None:
+        if depth < MAX_INLINE_DEPTH:
+            self.emit_node(child, lines, pos, depth, level, first_checked=first_checked)
+            return None
+        # Continue in a new function: its nodes are numbered when it is generated
+        name = f"_s{self.subtree_count}"
+        self.subtree_count += 1
+        self.pending.append((name, child))
+        indent = INDENT * level
+        lines.append(f"{indent}found = {name}(path, {pos}, captures)")
+        lines.append(f"{indent}if found >= 0:")
+        lines.append(f"{indent}{INDENT}return found")
+        return None
+
+    def emit_children(
+        self, current: node.RadixNode, lines: list[str], pos: str, depth: int, level: int
+    ) -> None:
+        children = current.children
+        static_nodes = sorted(children.static_nodes, key=lambda child: child.path)
+        if len(static_nodes) >= DISPATCH_THRESHOLD and all(child.path for child in static_nodes):
+            # Only children starting with the next character can match
+            by_first: dict[Any, list[node.RadixNode]] = {}
+            for child in static_nodes:
+                by_first.setdefault(child.path[:1], []).append(child)
+            indent = INDENT * level
+            char = f"c{depth}"
+            lines.append(f"{indent}{char} = path[{pos}:{pos} + 1]")
+            for number, (first, group) in enumerate(by_first.items()):
+                keyword = "if" if number == 0 else "elif"
+                lines.append(f"{indent}{keyword} {char} == {first!r}:")
+                for child in group:
+                    self.emit_child(child, lines, pos, depth, level + 1, first_checked=True)
+        else:
+            for child in static_nodes:
+                self.emit_child(child, lines, pos, depth, level)
+        for child in children.dynamic_nodes:
+            self.emit_child(child, lines, pos, depth, level)
+
+
+class CompiledMatcher:
+    """
+    A generated matching function for one tree, with the nodes it returns.
+
+    It is only valid for the root it was generated from: a `Tree` stops using it
+    as soon as a route is inserted.
+
+    Args:
+        root (RadixNode): The root the function was generated from.
+        nodes (list): Nodes in the order the generated function numbers them.
+        source (str): The generated source.
+        namespace (dict): Globals the function was loaded with.
+        cache_file (Path): The file the source was loaded from, if it was cached.
+    """
+
+    __slots__ = ["root", "nodes", "source", "cache_file", "_match"]
+
+    def __init__(
+        self,
+        root: node.RadixNode,
+        nodes: list[node.RadixNode],
+        source: str,
+        namespace: dict,
+        cache_file: Path | None = None,
+    ):
+        self.root = root
+        self.nodes = nodes
+        self.source = source
+        self.cache_file = cache_file
+        self._match = namespace[MATCH_FUNCTION]
+
+    def search(
+        self, path: Any, pos: int, captures: list[tuple[str, int, int]]
+    ) -> node.RadixNode | None:
+        """The same as `RadixNode.search` on the root"""
+        idx = self._match(path, pos, captures)
+        return self.nodes[idx] if idx >= 0 else None
+
+    def search_path(self, path: str | bytes) -> tuple[node.RadixNode | None, utils.CaptureMap]:
+        """The same as `RadixNode.search_path` on the root"""
+        captures: list[tuple[str, int, int]] = []
+        decode = utils.unquote_capture if isinstance(path, bytes) else None
+        return self.search(path, 0, captures), utils.CaptureMap(path, captures, decode=decode)
+
+
+def generate_source(root: node.RadixNode) -> tuple[str, list[node.RadixNode]]:
+    """Returns the source of a matching function for the tree under `root`, and its nodes"""
+    generator = _Generator(root)
+    source = generator.generate()
+    return source, generator.nodes
+
+
+def _globals(nodes: list[node.RadixNode]) -> dict[str, Any]:
+    return {
+        f"_m{idx}": current.pattern.match
+        for idx, current in enumerate(nodes)
+        if isinstance(current, node.DynamicNode)
+    }
+
+
+def _write_cache(cache_path: Path, source: str) -> None:
+    """Writes the source (atomically) and byte-compiles it, checked against the source's hash"""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=cache_path.parent, prefix=cache_path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fl:
+            fl.write(source)
+        os.replace(tmp_name, cache_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    py_compile.compile(
+        str(cache_path),
+        doraise=True,
+        invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH,
+    )
+
+
+def cache_file_for(cache_path: str | os.PathLike, source: str) -> Path:
+    """
+    Where the source is cached for `cache_path`: a file next to it, named after the
+    hash of the source (`matcher.py` -> `matcher_<hash>.py`).
+    """
+    path = Path(cache_path)
+    digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+    return path.with_name(f"{path.stem}_{digest}{path.suffix or '.py'}")
+
+
+def compile_tree(
+    root: node.RadixNode, cache_path: str | os.PathLike | None = None
+) -> CompiledMatcher:
+    """
+    Generates and loads a matching function for the tree under `root`.
+
+    With a `cache_path`, the source is written next to it, to a file named after the
+    hash of the source (see `cache_file_for`), and loaded from there, so that Python
+    can reuse its byte-compiled form (in `__pycache__`) across processes instead of
+    compiling it again. Files are only ever written with the source their name was
+    computed from, so processes sharing a `cache_path` can't load each other's routes.
+    Files for earlier routes are left in place.
+    """
+    source, nodes = generate_source(root)
+    namespace = _globals(nodes)
+    if cache_path is None:
+        exec(compile(source, "<tokamak.radix_tree.codegen>", "exec"), namespace)
+        return CompiledMatcher(root, nodes, source, namespace)
+
+    path = cache_file_for(cache_path, source)
+    try:
+        cached = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        cached = None
+    if cached != source:
+        _write_cache(path, source)
+
+    spec = importlib.util.spec_from_file_location(f"_tokamak_matcher_{path.stem}", path)
+    if spec is None or spec.loader is None:  # pragma: no cover
+        raise ImportError(f"Cannot load a compiled matcher from {path}")
+    module = importlib.util.module_from_spec(spec)
+    module.__dict__.update(namespace)
+    spec.loader.exec_module(module)
+    return CompiledMatcher(root, nodes, source, module.__dict__, cache_file=path)
@@ -0,0 +1,279 @@
+"""
+Explaining lookups, for debugging slow or surprising matches.
+
+`explain` repeats the search a lookup makes, step by step, and records each label
+compared, each regex tried, and each branch given up on, along with the route it
+found in the end. It's a separate copy of the search: lookups themselves aren't
+instrumented and pay nothing for it.
+
+For instance, with the route `/files/{archive}_format`, the parameter matches up to
+the next separator, so it takes `_format` with it, and the lookup stops at a node
+that holds no route:
+
+    >>> print(explain(tree, "/files/backup_format"))
+    explain '/files/backup_format'
+      compare '/files/' at 0: matched '/files/'
+      regex '/files/{archive}' at 7: captured archive='backup_format'
+      stop '/files/{archive}' at 20: the path ends at this node, which has no handler
+      no match: default handler
+
+A narrower regex, as in `/files/{archive:[^/_]+}_format`, leaves `_format` to match.
+"""
+from typing import Any
+
+from . import utils
+from .node import DynamicAlternation, DynamicNode, fold_label, label_str, NodeChildSet, RadixNode
+from .tree import TrailingSlashMatch, Tree
+
+# What a step did
+COMPARE = "compare"  # compared a static label with the path
+REGEX = "regex"  # ran a parameter's regex
+ALTERNATION = "alternation"  # ran the alternation of sibling parameters (see `Tree.freeze`)
+BACKTRACK = "backtrack"  # gave up on a node: nothing below it matches the rest of the path
+STOP = "stop"  # the path ended at a node without a handler: the lookup stops there
+PREFILTER = "prefilter"  # the prefilter rejected the path
+LIMIT = "limit"  # the path exceeded the tree's `max_path_length`
+BASE = "base"  # no route matched: the lookup goes on in a base router (see `AsgiRouter.overlay`)
+
+# Tasks of the search below
+_NODE = 0
+_CHILDREN = 1
+_ALTERNATION = 2
+_LEAVE = 3
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode("ascii", "backslashreplace")
+    return value
+
+
+class SearchStep:
+    """
+    One step of a lookup.
+
+    Args:
+        action (str): What the step did: `compare`, `regex`, `alternation`, `backtrack`,
+            `stop`, `prefilter`, `limit` or `base`.
+        route (str): The labels from the root down to the node the step is about.
+        pos (int): Where in the searched path the step started.
+        end (int): Where the text it matched ends, or None if it didn't match.
+        reason (str): What happened, in words.
+    """
+
+    __slots__ = ["action", "route", "pos", "end", "reason"]
+
+    def __init__(self, action: str, route: str, pos: int, end: int | None, reason: str):
+        self.action = action
+        self.route = route
+        self.pos = pos
+        self.end = end
+        self.reason = reason
+
+    @property
+    def matched(self) -> bool:
+        return self.end is not None
+
+    def __str__(self) -> str:
+        return f"{self.action} {self.route!r} at {self.pos}: {self.reason}"
+
+    def __repr__(self) -> str:
+        return f"<SearchStep {self}>"
+
+
+class Explanation:
+    """
+    What a lookup did, and what it found.
+
+    Args:
+        path (str): The path as it was searched: percent-encoded in `raw_bytes` trees,
+            case-folded in `case_insensitive` ones, and without a trailing separator
+            when trailing slashes are relaxed. Step offsets are offsets into it.
+        steps (list[SearchStep]): Every step, in the order they were taken.
+        route (str): The route that matched (as stored), or None.
+        handler (Any): The handler the lookup returns (the default handler on a miss).
+        context (CaptureMap): The values captured, as the lookup returns them.
+        visited (int): How many nodes were visited (as counted by `max_nodes_visited`).
+        regex_calls (int): How many regexes were run.
+    """
+
+    __slots__ = ["path", "steps", "route", "handler", "context", "visited", "regex_calls"]
+
+    def __init__(
+        self,
+        path: str,
+        steps: list[SearchStep],
+        route: str | None,
+        handler: Any,
+        context: utils.CaptureMap,
+        visited: int,
+        regex_calls: int,
+    ):
+        self.path = path
+        self.steps = steps
+        self.route = route
+        self.handler = handler
+        self.context = context
+        self.visited = visited
+        self.regex_calls = regex_calls
+
+    def __str__(self) -> str:
+        lines = [f"explain {self.path!r}"]
+        lines.extend(f"  {step}" for step in self.steps)
+        if self.route is not None:
+            lines.append(f"  matched {self.route!r} with {dict(self.context)!r}")
+        else:
+            lines.append("  no match: default handler")
+        return "\n".join(lines)
+
+    def __repr__(self) -> str:
+        return (
+            f"<Explanation {self.path!r}: route={self.route!r}, steps={len(self.steps)}, "
+            f"visited={self.visited}, regex_calls={self.regex_calls}>"
+        )
+
+
+def explain(route_tree: Tree, path: str | bytes) -> Explanation:
+    """
+    Looks `path` up in `route_tree` the way `Tree.get_handler` does, and returns
+    every step it took along with the result (see `Explanation`).
+
+    The tree's `max_nodes_visited` and `max_regex_calls` limits aren't applied:
+    compare them with the explanation's `visited` and `regex_calls`. Prefilter
+    counters aren't updated.
+    """
+    if route_tree.raw_bytes and isinstance(path, str):
+        path = utils.quote_label(path)
+    separator = route_tree._match_separator
+    if (
+        route_tree.trailing_slash_match is TrailingSlashMatch.RELAXED
+        and len(path) > 1
+        and path.endswith(separator)  # type: ignore
+    ):
+        path = path[:-1]
+
+    root = route_tree._root
+    steps: list[SearchStep] = []
+    folded = fold_label(path) if route_tree.case_insensitive else path
+    limits = route_tree.limits
+    if limits is not None and limits.max_path_length is not None and len(path) > limits.max_path_length:
+        reason = f"the path is longer than `max_path_length` ({limits.max_path_length})"
+        steps.append(SearchStep(LIMIT, "", 0, None, reason))
+        return Explanation(_text(folded), steps, None, root.handler, utils.CaptureMap(path, []), 0, 0)
+
+    prefilter = route_tree.prefilter
+    if prefilter is not None:
+        counters = prefilter.lookups, prefilter.rejected
+        may_match = prefilter.may_match(folded)
+        prefilter.lookups, prefilter.rejected = counters
+        if not may_match:
+            steps.append(SearchStep(PREFILTER, "", 0, None, "no route can match this path"))
+            return Explanation(_text(folded), steps, None, root.handler, utils.CaptureMap(path, []), 0, 0)
+
+    captures: list[tuple[str, int, int]] = []
+    found, route, visited, regex_calls = _search(root, folded, captures, steps)
+    context = route_tree._capture_map(path, folded, captures)
+    if found is not None and found.handler:
+        return Explanation(_text(folded), steps, route, found.handler, context, visited, regex_calls)
+    if found is not None:
+        reason = "the path ends at this node, which has no handler"
+        steps.append(SearchStep(STOP, route, len(folded), None, reason))
+    return Explanation(_text(folded), steps, None, root.handler, context, visited, regex_calls)
+
+
+def _search(
+    root: RadixNode, path: Any, captures: list[tuple[str, int, int]], steps: list[SearchStep]
+) -> tuple[RadixNode | None, str, int, int]:
+    """
+    `RadixNode.search` from the root, without recursion, recording its steps. Returns
+    the node found, its route, and how many nodes and regexes it took.
+    """
+    end = len(path)
+    visited = regex_calls = 0
+    if not end:
+        return root, "", visited, regex_calls
+
+    # Each entry is a task, its target, the offset it starts at, and the route leading
+    # to it. Searching a node's children pushes them above a `_LEAVE` task for the
+    # node: that task is only reached once none of them matched.
+    stack: list[tuple[int, Any, int, str]] = [(_CHILDREN, root.children, 0, "")]
+    while stack:
+        task, target, pos, route = stack.pop()
+        if task == _LEAVE:
+            steps.append(SearchStep(BACKTRACK, route, pos, None, f"no child matches {_text(path[pos:])!r}"))
+            continue
+
+        if task == _CHILDREN:
+            children: NodeChildSet = target
+            # static children first, then the alternation or each parameter in turn
+            pending: list[tuple[int, Any, int, str]] = [
+                (_NODE, child, pos, route) for child in children.static_nodes
+            ]
+            if children.alternation is not None:
+                pending.append((_ALTERNATION, children.alternation, pos, route))
+            else:
+                pending.extend((_NODE, child, pos, route) for child in children.dynamic_nodes)
+            stack.extend(reversed(pending))
+            continue
+
+        if task == _ALTERNATION:
+            alternation: DynamicAlternation = target
+            names = ", ".join(child.path for child in alternation.children)
+            regex_calls += 1
+            match = alternation.pattern.match(path, pos)
+            if match is None:
+                reason = f"none of {names} matches {_text(path[pos:])!r}"
+                steps.append(SearchStep(ALTERNATION, route, pos, None, reason))
+                continue
+            idx = alternation._by_group[match.lastindex]  # type: ignore
+            child = alternation.children[idx]
+            new_pos = match.end()
+            captures.append((child.parser.name, pos, new_pos))
+            child_route = route + child.path
+            reason = (
+                f"{child.path} is the first of {names} to match, "
+                f"captured {child.parser.name}={_text(path[pos:new_pos])!r}"
+            )
+            steps.append(SearchStep(ALTERNATION, child_route, pos, new_pos, reason))
+            if new_pos == end:
+                return child, child_route, visited, regex_calls
+            # if nothing below the child matches, the following siblings are tried one by one
+            siblings = alternation.children[idx + 1 :]
+            stack.extend((_NODE, sibling, pos, route) for sibling in reversed(siblings))
+            stack.append((_LEAVE, child, new_pos, child_route))
+            stack.append((_CHILDREN, child.children, new_pos, child_route))
+            continue
+
+        current: RadixNode = target
+        visited += 1
+        node_route = route + label_str(current.path)
+        if isinstance(current, DynamicNode):
+            regex_calls += 1
+            match = current.pattern.match(path, pos)
+            if match is None:
+                reason = f"{current.pattern.pattern!r} doesn't match {_text(path[pos:])!r}"
+                steps.append(SearchStep(REGEX, node_route, pos, None, reason))
+                continue
+            new_pos = match.end()
+            captures.append((current.parser.name, pos, new_pos))
+            reason = f"captured {current.parser.name}={_text(path[pos:new_pos])!r}"
+            steps.append(SearchStep(REGEX, node_route, pos, new_pos, reason))
+        elif path.startswith(current.path, pos):
+            new_pos = pos + len(current.path)
+            reason = f"matched {label_str(current.path)!r}"
+            steps.append(SearchStep(COMPARE, node_route, pos, new_pos, reason))
+        else:
+            found = _text(path[pos : pos + len(current.path)])
+            reason = f"expected {label_str(current.path)!r}, found {found!r}"
+            steps.append(SearchStep(COMPARE, node_route, pos, None, reason))
+            continue
+
+        if new_pos == end:
+            return current, node_route, visited, regex_calls
+        if current.children:
+            stack.append((_LEAVE, current, new_pos, node_route))
+            stack.append((_CHILDREN, current.children, new_pos, node_route))
+        else:
+            reason = f"{_text(path[new_pos:])!r} is left over, and nothing follows this node"
+            steps.append(SearchStep(BACKTRACK, node_route, new_pos, None, reason))
+    return None, "", visited, regex_calls
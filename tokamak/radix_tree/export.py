@@ -0,0 +1,197 @@
+"""
+Streaming exports of a tree's nodes, for inspecting large production trees.
+
+Both formats are written node by node to any file-like object with a `write`
+method, while walking the tree depth-first without recursion: memory use depends
+on the depth and fan-out of the tree, not on its size. Children are written in
+order of their labels, so exporting the same tree twice gives the same output.
+
+  - `write_dot` writes a Graphviz graph (`dot -Tsvg tree.dot > tree.svg`).
+  - `write_jsonl` writes one JSON object per line and node, for `jq` and friends.
+
+Either can stop at a depth (the root is at depth 0), or export only the nodes
+under a prefix, along with the nodes leading to it. Labels are written as they
+are stored (see `node.tree_path`): percent-encoded in `raw_bytes` trees, and
+case-folded in `case_insensitive` ones.
+"""
+import json
+from collections.abc import Iterator
+from typing import Any, IO
+
+from . import node
+from .tree import Tree
+
+ROOT = "root"
+STATIC = "static"
+DYNAMIC = "dynamic"
+
+
+class ExportedNode:
+    """
+    A node as it is exported.
+
+    Args:
+        id (int): Position of the node in the export (the root is 0).
+        parent (int): `id` of its parent, or None for the root.
+        depth (int): How many nodes lead to it from the root.
+        kind (str): `root`, `static` or `dynamic`.
+        label (str): The node's label.
+        route (str): The labels from the root down to this node.
+        handler (Any): The node's handler (for the root: the default handler).
+        child_count (int): How many children the node has, whether exported or not.
+    """
+
+    __slots__ = ["id", "parent", "depth", "kind", "label", "route", "handler", "child_count"]
+
+    def __init__(
+        self,
+        id: int,
+        parent: int | None,
+        depth: int,
+        kind: str,
+        label: str,
+        route: str,
+        handler: Any,
+        child_count: int,
+    ):
+        self.id = id
+        self.parent = parent
+        self.depth = depth
+        self.kind = kind
+        self.label = label
+        self.route = route
+        self.handler = handler
+        self.child_count = child_count
+
+
+def iter_nodes(tree: Tree, max_depth: int | None = None, prefix: str = "") -> Iterator[ExportedNode]:
+    """
+    Yields the nodes of `tree` depth-first (parents before their children), without
+    recursion.
+
+    Args:
+        tree (Tree): The tree to walk.
+        max_depth (int): Don't go below this depth.
+        prefix (str): Only yield the nodes whose route starts with this text, and the
+            nodes leading to them. It's compared with the routes as they are stored.
+    """
+    if max_depth is not None and max_depth < 0:
+        raise ValueError("`max_depth` must not be negative")
+    if tree.raw_bytes or tree.case_insensitive:
+        prefix = node.label_str(node.static_label(prefix, tree.raw_bytes, tree.case_insensitive))
+
+    root = tree._root
+    next_id = 0
+    # Each entry is a node, its parent's id, its depth, the route leading to it, and
+    # the part of `prefix` its label (and the labels below it) must still match
+    stack: list[tuple[node.RadixNode, int | None, int, str, str]] = [(root, None, 0, "", prefix)]
+    while stack:
+        current, parent, depth, route, remaining = stack.pop()
+        label = node.label_str(current.path)
+        if remaining:
+            if label.startswith(remaining):
+                remaining = ""
+            elif remaining.startswith(label):
+                remaining = remaining[len(label) :]
+            else:
+                continue
+
+        if current is root:
+            kind = ROOT
+        elif isinstance(current, node.DynamicNode):
+            kind = DYNAMIC
+        else:
+            kind = STATIC
+        route += label
+        exported = ExportedNode(
+            next_id, parent, depth, kind, label, route, current.handler, len(current.children)
+        )
+        next_id += 1
+        yield exported
+
+        if current.children and (max_depth is None or depth < max_depth):
+            # pushed in reverse, so that the smallest label is visited first
+            stack.extend(
+                (child, exported.id, depth + 1, route, remaining)
+                for child in sorted(
+                    current.children, key=lambda child: node.label_str(child.path), reverse=True
+                )
+            )
+
+
+def _dot_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def write_dot(
+    tree: Tree, out: IO[str], max_depth: int | None = None, prefix: str = "", name: str = "tree"
+) -> int:
+    """
+    Writes `tree` as a Graphviz digraph, and returns how many nodes were written.
+
+    Routes (nodes holding a handler) are drawn with a double outline and parameters
+    in dashed boxes. A node whose children were left out (by `max_depth` or `prefix`)
+    is followed by a note saying how many there are.
+
+    Args:
+        tree (Tree): The tree to export.
+        out (IO[str]): Where to write the graph.
+        max_depth (int): Don't export nodes below this depth.
+        prefix (str): Only export the nodes under this prefix (see `iter_nodes`).
+        name (str): The name of the graph.
+    """
+    out.write(f"digraph {_dot_string(name)} {{\n")
+    out.write("  node [shape=ellipse];\n")
+    count = 0
+    # [id, depth, children not written (yet)] for the nodes leading to the last one written
+    ancestors: list[list[int]] = []
+    for exported in iter_nodes(tree, max_depth=max_depth, prefix=prefix):
+        while ancestors and ancestors[-1][1] >= exported.depth:
+            _write_missing(out, *ancestors.pop())
+        count += 1
+        attributes = [f"label={_dot_string(exported.label or '<root>')}"]
+        if exported.kind == DYNAMIC:
+            attributes.append("shape=box, style=dashed")
+        if exported.handler is not None and exported.kind != ROOT:
+            attributes.append("peripheries=2")
+        out.write(f"  n{exported.id} [{', '.join(attributes)}];\n")
+        if exported.parent is not None:
+            out.write(f"  n{exported.parent} -> n{exported.id};\n")
+            ancestors[-1][2] -= 1
+        ancestors.append([exported.id, exported.depth, exported.child_count])
+    while ancestors:
+        _write_missing(out, *ancestors.pop())
+    out.write("}\n")
+    return count
+
+
+def _write_missing(out: IO[str], node_id: int, depth: int, missing: int) -> None:
+    if missing:
+        out.write(f'  n{node_id}_more [label="{missing} more", shape=plaintext];\n')
+        out.write(f"  n{node_id} -> n{node_id}_more [style=dotted];\n")
+
+
+def write_jsonl(
+    tree: Tree, out: IO[str], max_depth: int | None = None, prefix: str = "", handler_repr: Any = repr
+) -> int:
+    """
+    Writes one JSON object per node of `tree`, one per line, and returns how many
+    nodes were written. Each object has the fields of `ExportedNode`, with the
+    handler (or null) converted by `handler_repr`.
+
+    Args:
+        tree (Tree): The tree to export.
+        out (IO[str]): Where to write the lines.
+        max_depth (int): Don't export nodes below this depth.
+        prefix (str): Only export the nodes under this prefix (see `iter_nodes`).
+        handler_repr (Callable): Converts a handler to something JSON can encode.
+    """
+    count = 0
+    for exported in iter_nodes(tree, max_depth=max_depth, prefix=prefix):
+        count += 1
+        record = {name: getattr(exported, name) for name in ExportedNode.__slots__}
+        if exported.handler is not None:
+            record["handler"] = handler_repr(exported.handler)
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+    return count
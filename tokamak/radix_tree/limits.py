@@ -0,0 +1,137 @@
+"""
+Bounding the cost of a lookup.
+
+Custom parameters (`{name:regex}`) run on paths chosen by clients. This module offers:
+
+  - `LookupLimits`, which a `Tree` enforces on every lookup: a maximum path length,
+    a maximum number of nodes visited and a maximum number of regex calls, and
+  - `harden_regex`, which finds nested quantifiers (as in `(a+)+b`, the classic cause
+    of catastrophic backtracking) in parameter regexes and, where that cannot change
+    what the regex matches, wraps them in an atomic group so they never backtrack.
+"""
+import enum
+import functools
+import logging
+import re
+
+logger = logging.getLogger("tokamak")
+
+
+class LookupLimitError(ValueError):
+    pass
+
+
+class PathTooLongError(LookupLimitError):
+    """A path longer than `max_path_length`: it was rejected without being searched"""
+
+
+@enum.unique
+class LimitAction(enum.Enum):
+    """What a lookup does when it exceeds one of its limits"""
+
+    MISS = 1  # return the tree's default handler, as if nothing matched
+    RAISE = 2  # raise `LookupLimitError`
+
+
+class LookupLimits:
+    """
+    Limits on the work a single lookup may do. `None` means no limit.
+
+    Args:
+        max_path_length (int): Longest path (in characters, or bytes for raw paths) to search.
+        max_nodes_visited (int): Most nodes a lookup may visit, including nodes whose
+            label or regex didn't match.
+        max_regex_calls (int): Most regex matches a lookup may attempt.
+        action (LimitAction): Return a miss (the default) or raise `LookupLimitError`
+            when a limit is exceeded.
+    """
+
+    __slots__ = ["max_path_length", "max_nodes_visited", "max_regex_calls", "action"]
+
+    def __init__(
+        self,
+        max_path_length: int | None = None,
+        max_nodes_visited: int | None = None,
+        max_regex_calls: int | None = None,
+        action: LimitAction = LimitAction.MISS,
+    ):
+        for name, value in (
+            ("max_path_length", max_path_length),
+            ("max_nodes_visited", max_nodes_visited),
+            ("max_regex_calls", max_regex_calls),
+        ):
+            if value is not None and value < 1:
+                raise ValueError(f"`{name}` must be positive")
+        self.max_path_length = max_path_length
+        self.max_nodes_visited = max_nodes_visited
+        self.max_regex_calls = max_regex_calls
+        self.action = action
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class SearchBudget:
+    """The nodes and regex calls one lookup has left; a new budget is made for each lookup"""
+
+    __slots__ = ["nodes", "regex_calls"]
+
+    def __init__(self, limits: LookupLimits):
+        self.nodes = limits.max_nodes_visited
+        self.regex_calls = limits.max_regex_calls
+
+    def visit(self) -> None:
+        if self.nodes is not None:
+            if self.nodes == 0:
+                raise LookupLimitError("Lookup exceeded `max_nodes_visited`")
+            self.nodes -= 1
+
+    def regex_call(self) -> None:
+        if self.regex_calls is not None:
+            if self.regex_calls == 0:
+                raise LookupLimitError("Lookup exceeded `max_regex_calls`")
+            self.regex_calls -= 1
+
+
+@functools.cache
+def harden_regex(regex: str) -> str:
+    """
+    Returns `regex` with each top-level repeat containing nested quantifiers wrapped in
+    an atomic group (`(a+)+/` becomes `(?>(a+)+)/`), where that provably doesn't change
+    what the regex matches. Other regexes with nested quantifiers are returned unchanged,
+    and logged once: only `LookupLimits` can bound their cost.
+
+    Regexes are returned unchanged where the analysis isn't available (it relies on
+    CPython's private regex parser, see `regex_analysis`).
+    """
+    try:
+        from . import regex_analysis
+    except ImportError:
+        return regex
+    try:
+        result = regex_analysis.harden(regex)
+    except re.error:
+        # invalid regexes are reported when compiled; pieces of valid ones may refer to other groups
+        return regex
+
+    if regex_analysis.has_nested_quantifiers(result):
+        logger.warning(
+            "Parameter regex %r has nested quantifiers and may backtrack heavily: "
+            "consider setting `LookupLimits` on the tree",
+            regex,
+        )
+    return result
+
+
+def has_nested_quantifiers(regex: str) -> bool:
+    """
+    Whether `regex` repeats something that itself contains a repeat, such as
+    `(a+)+` (see `regex_analysis.has_nested_quantifiers`). False when the regex
+    parser isn't available.
+    """
+    try:
+        from . import regex_analysis
+    except ImportError:
+        return False
+    return regex_analysis.has_nested_quantifiers(regex)
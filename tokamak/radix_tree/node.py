@@ -1,14 +1,44 @@
 import copy
+import re
+import sys
+import zlib
 from collections.abc import Iterable, Iterator, MutableSet
 from itertools import chain
-from typing import Any, Generic, Optional, TypeVar
+from typing import Any, cast, Generic, Optional, TypeVar
 
-from . import utils
+from . import limits, utils
 
 LAST_CHILD = "└──"
 MIDDLE_CHILD = "├──"
 BAR = "│  "
 V = TypeVar("V")  # handler value
+# Shared by every child set that has no static or no dynamic nodes
+NO_NODES: frozenset = frozenset()
+
+
+def intern_label(label: str | bytes) -> str | bytes:
+    """Interns `str` labels; `bytes` labels (raw-path trees) cannot be interned"""
+    if isinstance(label, str):
+        return sys.intern(label)
+    return label
+
+
+def fold_label(label: str | bytes) -> str | bytes:
+    """
+    Case-folds a label (or a path) for case-insensitive trees.
+
+    Raw path bytes are percent-encoded, so only their ASCII letters can be folded.
+    """
+    if isinstance(label, bytes):
+        return label.lower()
+    return label.casefold()
+
+
+def label_str(label: str | bytes) -> str:
+    """Labels as text: the labels of raw-path trees are percent-encoded ASCII bytes"""
+    if isinstance(label, bytes):
+        return label.decode("ascii")
+    return label
 
 
 class PrefixSearchResult:
@@ -46,15 +76,6 @@ class PrefixSearchResult:
         )
 
 
-class LeafNode(Generic[V]):
-    """The LeafNode represents a pointer to a handler."""
-
-    __slots__ = ["handler"]
-
-    def __init__(self, handler: V):
-        self.handler = handler
-
-
 class NodeChildSet(MutableSet):
     """
     The children of a node are two Sets:
@@ -66,53 +87,84 @@ class NodeChildSet(MutableSet):
 
     We keep two Sets below the surface: one for StaticNodes and one for DynamicNodes.
     Then, when iterating, we iterate StaticNodes first.
+
+    Most nodes have only one kind of child, so each Set starts out as the shared,
+    empty `NO_NODES` and is only allocated on the first `add`.
+
+    In a frozen tree (`Tree.freeze`), several dynamic children may also be compiled
+    into a single `alternation`. Adding or removing a dynamic child drops it (until
+    `update_alternations`); copies and `replace` keep it.
     """
 
-    __slots__ = ["static_nodes", "dynamic_nodes"]
+    __slots__ = ["static_nodes", "dynamic_nodes", "alternation"]
 
     def __init__(self, data: Iterable["RadixNode"] | None = None):
-        self.static_nodes: set[RadixNode] = set()
-        self.dynamic_nodes: set[RadixNode] = set()
+        self.static_nodes: set[RadixNode] | frozenset[RadixNode] = NO_NODES
+        self.dynamic_nodes: set[RadixNode] | frozenset[RadixNode] = NO_NODES
+        self.alternation: DynamicAlternation | None = None
 
         if data is not None:
             for node in data:
-                if isinstance(node, DynamicNode):
-                    self.dynamic_nodes.add(node)
-                else:
-                    self.static_nodes.add(node)
+                self.add(node)
+
+    @classmethod
+    def _from_iterable(cls, it: Iterable[Any]) -> "NodeChildSet":
+        # Set operations (`|`, `&`, `-`) always produce a new, modifiable child set
+        return NodeChildSet(it)
 
     def __bool__(self) -> bool:
         return bool(self.static_nodes) or bool(self.dynamic_nodes)
 
     def add(self, node: "RadixNode") -> None:
         """
-        Puts item into appropriate set. If key already
-        exists in the _other_ set, we delete it from there
-        afterward.
+        Puts item into appropriate set.
+
+        Static and dynamic nodes never compare equal, so a node
+        can only ever be found in its own set.
 
         Args:
 
             node: RadixNode to add as a child
         """
         if isinstance(node, DynamicNode):
-            self.dynamic_nodes.add(node)
-            if node in self.static_nodes:
-                self.static_nodes.discard(node)
+            # the alternation no longer covers every dynamic child
+            self.alternation = None
+            if self.dynamic_nodes:
+                self.dynamic_nodes.add(node)  # type: ignore
+            else:
+                self.dynamic_nodes = {node}
         else:
-            self.static_nodes.add(node)
-            if node in self.dynamic_nodes:
-                self.dynamic_nodes.discard(node)
+            if self.static_nodes:
+                self.static_nodes.add(node)  # type: ignore
+            else:
+                self.static_nodes = {node}
 
     def discard(self, node: "RadixNode") -> None:
         """Remove a child node"""
-        if node in self.dynamic_nodes:
-            return self.dynamic_nodes.discard(node)
-        return self.static_nodes.discard(node)
+        if isinstance(node, DynamicNode):
+            if node in self.dynamic_nodes:
+                self.alternation = None
+                self.dynamic_nodes.discard(node)  # type: ignore
+        elif node in self.static_nodes:
+            self.static_nodes.discard(node)  # type: ignore
+        return None
+
+    def replace(self, node: "RadixNode", new_node: "RadixNode") -> None:
+        """Swaps a child for `new_node`, an equal node (such as its copy), keeping the alternation"""
+        alternation = self.alternation
+        self.discard(node)
+        self.add(new_node)
+        if alternation is not None and isinstance(new_node, DynamicNode):
+            alternation = alternation.replace(node, new_node)
+        self.alternation = alternation
+        return None
 
     # We are interested in specializing this data structure: only RadixNode things are allowed
     def __contains__(self, node: "RadixNode") -> bool:  # type: ignore
         """Check if a node exists in children"""
-        return node in self.dynamic_nodes or node in self.static_nodes
+        if isinstance(node, DynamicNode):
+            return node in self.dynamic_nodes
+        return node in self.static_nodes
 
     def __iter__(self) -> Iterator["RadixNode"]:
         """Iterate child nodes (static first!)"""
@@ -128,23 +180,79 @@ class NodeChildSet(MutableSet):
             f"({repr(self.static_nodes)}) ({repr(self.dynamic_nodes)})>>"
         )
 
+    def search(
+        self, path: Any, pos: int, captures: list[tuple[str, int, int]]
+    ) -> Optional["RadixNode"]:
+        """Searches each child in turn (static children first) from offset `pos`"""
+        for child in self.static_nodes:
+            matched_node = child.search(path, pos, captures)
+            if matched_node is not None:
+                return matched_node
+        if self.alternation is not None:
+            return self.alternation.search(path, pos, captures)
+        for child in self.dynamic_nodes:
+            matched_node = child.search(path, pos, captures)
+            if matched_node is not None:
+                return matched_node
+        return None
+
+    def copy(self) -> "NodeChildSet":
+        """A new child set holding the same child nodes (and the same alternation)"""
+        if not self:
+            return NO_CHILDREN
+        copied = NodeChildSet(self)
+        copied.alternation = self.alternation
+        return copied
+
+
+class EmptyChildSet(NodeChildSet):
+    """
+    The children of a node without any children.
+
+    A single instance of this class, `NO_CHILDREN`, is shared by every leaf
+    in every tree, so it may never be modified: use `RadixNode.add_child`,
+    which swaps in a new `NodeChildSet` on the first child.
+    """
+
+    __slots__ = ()
+
+    def add(self, node: "RadixNode") -> None:
+        raise TypeError("The shared empty child set cannot be modified")
+
+    def __reduce__(self) -> str:
+        # copies and pickles of the sentinel are the sentinel itself
+        return "NO_CHILDREN"
+
+
+NO_CHILDREN = EmptyChildSet()
+
 
 class RadixNode(Generic[V]):
-    """A base class for a node in our radix tree."""
+    """
+    A base class for a node in our radix tree.
 
-    __slots__ = ["path", "children", "leaf", "separator"]
+    Nodes are kept as small as possible because large trees hold hundreds of thousands of them:
+
+      - the handler is stored directly on the node (`None` means "no handler here"),
+      - nodes without children share the `NO_CHILDREN` sentinel, and
+      - labels are interned, so repeated labels across a tree are stored once.
+
+    The separator is a property of the `Tree`, not of each node.
+    """
+
+    __slots__ = ["path", "children", "handler"]
 
     def __init__(
         self,
-        path: str,
+        path: str | bytes,
         children: NodeChildSet | None = None,
-        leaf: Optional["LeafNode[V]"] = None,
-        separator: str = "/",
+        handler: V | None = None,
     ):
-        self.path = path
-        self.children: NodeChildSet = children or NodeChildSet()
-        self.leaf = leaf
-        self.separator = separator
+        # `str`, or percent-encoded `bytes` for the static labels of trees matching raw
+        # paths (see `Tree.raw_bytes`), whose parameter labels are still `str`
+        self.path: Any = path
+        self.children: NodeChildSet = children or NO_CHILDREN
+        self.handler = handler
 
     def __bool__(self) -> bool:
         """
@@ -155,20 +263,26 @@ class RadixNode(Generic[V]):
         """
         return True
 
-    # needs structural typing?
-    def __eq__(self, other_node) -> bool:  # type: ignore
+    @property
+    def key(self) -> Any:
+        """What identifies this node among its siblings: its label"""
+        return self.path
+
+    def __eq__(self, other_node: object) -> bool:
         """
-        Note: this equality checks _only_ the nodes. It does not recurse
+        Note: this equality checks _only_ the nodes' keys. It does not recurse
         into child nodes, so the sub-trees may be different for nodes that are
         equal.
         """
-        index = utils.first_nonequal_idx(self.path, other_node.path)
-        if index == len(self.path) == len(other_node.path):
-            return True
-        return False
+        if not isinstance(other_node, RadixNode):
+            return NotImplemented
+        return type(self) is type(other_node) and self.path == other_node.path
 
     def __hash__(self) -> int:
-        return hash(self.path)
+        # Nodes live in their parent's child set while `split` shortens their label,
+        # so we hash only the first character: splitting never changes it, and
+        # static siblings always differ in it. (`str` hashes are cached by Python.)
+        return hash(self.path[:1])
 
     def __str__(self) -> str:
         self_string = (
@@ -187,7 +301,27 @@ class RadixNode(Generic[V]):
 
     def __len__(self) -> int:
         """Returns count of all nodes in the tree"""
-        return 1 + sum(len(ch) for ch in self.children)
+        count = 0
+        stack: list[RadixNode] = [self]
+        while stack:
+            current = stack.pop()
+            count += 1
+            stack.extend(current.children)
+        return count
+
+    def add_child(self, node: "RadixNode") -> None:
+        """Adds a child node, allocating a child set if this node had none"""
+        if self.children is NO_CHILDREN:
+            self.children = NodeChildSet((node,))
+        else:
+            self.children.add(node)
+
+    def copy(self) -> "RadixNode":
+        """
+        Returns a shallow copy of this node: a new node object with its own child set
+        that holds the _same_ child nodes.
+        """
+        return RadixNode(self.path, children=self.children.copy(), handler=self.handler)
 
     def clone(self, path: str | None = None) -> "RadixNode":  # type: ignore # pragma: no cover
         raise NotImplementedError("`clone` must be implemented in the child classes")
@@ -210,31 +344,31 @@ class RadixNode(Generic[V]):
         elif psr.left_side_remaining:
             psr.node.split(psr.index)
             if psr.right_side_remaining:
-                node.path = psr.right_side_remaining
-                psr.node.children.add(node)
+                node.path = intern_label(psr.right_side_remaining)
+                psr.node.add_child(node)
                 return node
             else:
                 return merge_nodes(psr.node, node)
         else:
-            node.path = psr.right_side_remaining
-            psr.node.children.add(node)
+            node.path = intern_label(psr.right_side_remaining)
+            psr.node.add_child(node)
             return node
 
     def insert_node(self, node: "RadixNode") -> "RadixNode":
         if not self.children and len(self.path) == 0:
-            self.children.add(node)
+            self.add_child(node)
             return node
         # we compare paths directly here because no children (instead of prefix search)
         elif not self.children and self.path == node.path:
-            if self.leaf and node.leaf:
+            if self.handler is not None and node.handler is not None:
                 msg = "Merge conflict: duplicate nodes both have handler for path '{}'"
                 raise ValueError(msg.format(self.path))
-            elif not self.leaf and node.leaf:
-                self.leaf = node.leaf
+            elif self.handler is None and node.handler is not None:
+                self.handler = node.handler
             self.children = node.children
             return self
         elif not self.children:
-            self.children.add(node)
+            self.add_child(node)
             return node
 
         try:
@@ -251,14 +385,30 @@ class RadixNode(Generic[V]):
 
         return result
 
-    def insert(self, path: str, handler: V | None = None) -> Optional["RadixNode"]:
+    def insert(
+        self,
+        path: str,
+        handler: V | None = None,
+        raw_bytes: bool = False,
+        case_insensitive: bool = False,
+        separator: str = "/",
+    ) -> Optional["RadixNode"]:
         """
         Inserts a path somewhere in this tree as a new subtree
 
-        May include dynamic path parts.
+        May include dynamic path parts. With `raw_bytes`, the new nodes match raw
+        (percent-encoded) path bytes instead of strings. With `case_insensitive`,
+        they match case-folded paths. Parameters without a regex match up to the
+        next `separator`.
         """
         # create a new tree out of this path and insert the node
-        new_path_root = path_to_tree(path, handler)
+        new_path_root = path_to_tree(
+            path,
+            handler,
+            raw_bytes=raw_bytes,
+            case_insensitive=case_insensitive,
+            separator=separator,
+        )
         return self.insert_node(new_path_root)
 
     def prefix_search(
@@ -290,28 +440,60 @@ class RadixNode(Generic[V]):
         return None
 
     def search_path(
-        self,
-        path: str,
-        context: dict[str, str] | None = None,
-    ) -> tuple[Optional["RadixNode"], dict[str, str]]:
+        self, path: str | bytes
+    ) -> tuple[Optional["RadixNode"], utils.CaptureMap]:
         """
-        Searches for a prefix and returns only a node that is a _complete_ match.
+        Searches for a prefix and returns only a node that is a _complete_ match,
+        along with a (lazy) mapping of the values captured by dynamic nodes.
+
+        Raw `bytes` paths are searched in trees built with `raw_bytes=True`;
+        their captured values are percent-decoded on access.
         """
-        matched_vars: dict[str, str] = context or {}
+        captures: list[tuple[str, int, int]] = []
+        decode = utils.unquote_capture if isinstance(path, bytes) else None
+        return self.search(path, 0, captures), utils.CaptureMap(path, captures, decode=decode)
 
-        index = utils.first_nonequal_idx(path, self.path)
-        if index == len(self.path) == len(path):
-            return self, matched_vars
+    def search(
+        self, path: Any, pos: int, captures: list[tuple[str, int, int]]
+    ) -> Optional["RadixNode"]:
+        """
+        Searches `path` from offset `pos` and returns only a node that is a _complete_ match.
 
-        if len(self.path) == 0 or (index == len(self.path) and index < len(path)):
+        Dynamic nodes append `(name, start, end)` offsets for their matches to `captures`:
+        no strings are sliced while searching.
+        """
+        if path.startswith(self.path, pos):
+            end = pos + len(self.path)
+            if end == len(path):
+                return self
+            children = self.children
+            if children.alternation is not None:
+                return children.search(path, end, captures)
+            for child in children:
+                matched_node = child.search(path, end, captures)
+                if matched_node is not None:
+                    return matched_node
+
+        return None
+
+    def search_limited(
+        self, path: Any, pos: int, captures: list[tuple[str, int, int]], budget: "limits.SearchBudget"
+    ) -> Optional["RadixNode"]:
+        """
+        The same search as `search`, charging each node visited to `budget`, which
+        raises `LookupLimitError` once it's spent.
+        """
+        budget.visit()
+        if path.startswith(self.path, pos):
+            end = pos + len(self.path)
+            if end == len(path):
+                return self
             for child in self.children:
-                matched_node, matched_vars = child.search_path(
-                    path[index:], context=matched_vars
-                )
+                matched_node = child.search_limited(path, end, captures, budget)
                 if matched_node is not None:
-                    return matched_node, matched_vars
+                    return matched_node
 
-        return None, matched_vars
+        return None
 
     def tree_as_str(
         self, mult: int = 1, indent: str = "", is_leaf: bool = False
@@ -321,68 +503,68 @@ class RadixNode(Generic[V]):
 
         This can help with debugging and documentation.
         """
-        visual = "{indent}{branch} {path}\n"
-        path = self.path
-        if not path:
-            path = "* <-root->"
-        elif self.leaf is not None:
-            path += " <*>"
-
-        result = ""
-        if is_leaf or not path:  # "not indent" means top-level
-            result += visual.format(indent=indent, branch=LAST_CHILD, path=path)
-        else:
-            result += visual.format(indent=indent, branch=MIDDLE_CHILD, path=path)
-        mult += 1
-        indent += " " * mult
-        for idx, ch in enumerate(self.children):
-            is_leaf = idx == len(self.children) - 1
-            result += ch.tree_as_str(indent=indent, mult=mult, is_leaf=is_leaf)
-        return result
+        lines = []
+        # Children are pushed in reverse, so that they are popped in order
+        stack: list[tuple[RadixNode, int, str, bool]] = [(self, mult, indent, is_leaf)]
+        while stack:
+            current, mult, indent, is_leaf = stack.pop()
+            path = label_str(current.path)
+            if not path:
+                path = "* <-root->"
+            elif current.handler is not None:
+                path += " <*>"
+            branch = LAST_CHILD if is_leaf else MIDDLE_CHILD
+            lines.append(f"{indent}{branch} {path}\n")
+            mult += 1
+            indent += " " * mult
+            children = list(current.children)
+            for idx in range(len(children) - 1, -1, -1):
+                stack.append((children[idx], mult, indent, idx == len(children) - 1))
+        return "".join(lines)
 
 
 class StaticNode(RadixNode):
     """A StaticNode has _no_ dynamic elements."""
 
-    __slots__ = ["path", "children", "leaf", "separator"]
+    __slots__ = ()
 
     def __init__(
         self,
-        path: str,
+        path: str | bytes,
         children: NodeChildSet | None = None,
-        leaf: LeafNode | None = None,
-        separator: str = "/",
+        handler: Any = None,
     ):
         if not path:
             raise ValueError("StaticNode constructor called with an empty `path`")
 
-        self.path = path
-        self.children: NodeChildSet = children or NodeChildSet()
-        self.leaf = leaf
-        self.separator = separator
+        self.path = intern_label(path)
+        self.children: NodeChildSet = children or NO_CHILDREN
+        self.handler = handler
+
+    def copy(self) -> "RadixNode":
+        return StaticNode(self.path, children=self.children.copy(), handler=self.handler)
 
     def clone(self, path: str | None = None) -> "RadixNode":
         if path is None:
             path = self.path
 
-        children = copy.deepcopy(self.children)
-        new_node = StaticNode(
-            path,
-            children=children,
-            leaf=self.leaf,
-            separator=self.separator,
-        )
+        children = copy.deepcopy(self.children) if self.children else None
+        new_node = StaticNode(path, children=children, handler=self.handler)
         return new_node
 
     def split(self, idx: int) -> "RadixNode":
-        path_split_prefix = self.path[:idx]
-        path_split_suffix = self.path[idx:]
-        new_node = self.clone(path=path_split_suffix)
+        """
+        Splits this node at `idx`: this node keeps the prefix and a new
+        child takes over the suffix, along with our children and handler.
 
-        self.path = path_split_prefix
+        The children are _moved_ to the new node, not copied.
+        """
+        new_node = StaticNode(
+            self.path[idx:], children=self.children, handler=self.handler
+        )
+        self.path = intern_label(self.path[:idx])
         self.children = NodeChildSet((new_node,))
-        if self.leaf is not None:
-            self.leaf = None
+        self.handler = None
         return self
 
     def prefix_search(
@@ -416,36 +598,6 @@ class StaticNode(RadixNode):
             remaining = prefix[index:]
             yield PrefixSearchResult(self, index, unmatched, remaining)
 
-    def search_path(
-        self,
-        path: str,
-        context: dict[str, str] | None = None,
-    ) -> tuple[Optional["RadixNode"], dict[str, str]]:
-        """
-        Searches for a prefix and returns only a node that is a _complete_ match.
-
-        For dynamic nodes, it will use the regex parser to match the input `path`.
-
-        We yield inside-out, so the deepest matching node should appear first in results.
-
-        Note: this method doesn't guarantee a full match. It means only that
-        there are _some_ matching characters for this prefix.
-        """
-        matched_vars: dict[str, str] = context or {}
-
-        index = utils.first_nonequal_idx(path, self.path)
-        if index == len(self.path) == len(path):
-            return self, matched_vars
-
-        if index == len(self.path) and index < len(path):
-            for child in self.children:
-                matched_node, matched_vars = child.search_path(
-                    path[index:], context=matched_vars
-                )
-                if matched_node is not None:
-                    return matched_node, matched_vars
-
-        return None, matched_vars
 
 
 class DynamicNode(RadixNode):
@@ -453,27 +605,61 @@ class DynamicNode(RadixNode):
     A DynamicNode is a single elements.
 
     This class wraps a named-regex pattern which is later used to match strings.
+
+    The compiled `pattern` depends on the tree: trees matching raw path bytes
+    need a `bytes` pattern and case-insensitive trees ignore case
+    (see `utils.DynamicParseNode.compile`). By default it is the parser's own pattern.
     """
 
-    __slots__ = ["parser", "children", "leaf", "separator"]
+    __slots__ = ["parser", "pattern", "_hash"]
 
     def __init__(
         self,
         parser: utils.DynamicParseNode,
         children: NodeChildSet | None = None,
-        leaf: LeafNode | None = None,
-        separator: str = "/",
+        handler: Any = None,
+        pattern: re.Pattern | None = None,
     ):
-        self.path = parser.raw
+        self.path = sys.intern(parser.raw)
         self.parser = parser
-        self.children = children or NodeChildSet()
-        self.leaf = leaf
-        self.separator = separator
+        self.pattern: re.Pattern = pattern or parser.pattern
+        self.children = children or NO_CHILDREN
+        self.handler = handler
+        # Not `hash()`, which changes with each process (PYTHONHASHSEED): the order sibling
+        # parameters are tried in follows the hash, and generated matchers follow that order
+        self._hash = zlib.crc32(f"{parser.name}\0{parser.regex}".encode())
+
+    @property
+    def key(self) -> tuple[str, str]:
+        """
+        What identifies this node among its siblings: its parameter name and regex.
+
+        `{id}` and `{id:*}` are the same parameter; `{id:[0-9]+}` and `{id:[a-z]+}` are not.
+        """
+        return self.parser.name, self.parser.regex
+
+    def __eq__(self, other_node: object) -> bool:
+        if not isinstance(other_node, RadixNode):
+            return NotImplemented
+        return (
+            type(other_node) is DynamicNode
+            and self._hash == other_node._hash
+            and self.parser.name == other_node.parser.name
+            and self.parser.regex == other_node.parser.regex
+        )
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def copy(self) -> "RadixNode":
+        return DynamicNode(
+            self.parser, children=self.children.copy(), handler=self.handler, pattern=self.pattern
+        )
 
     def clone(self, **kwargs) -> "RadixNode":  # type: ignore
-        children = copy.deepcopy(self.children)
+        children = copy.deepcopy(self.children) if self.children else None
         new_node = DynamicNode(
-            self.parser, children=children, leaf=self.leaf, separator=self.separator
+            self.parser, children=children, handler=self.handler, pattern=self.pattern
         )
         return new_node
 
@@ -505,31 +691,395 @@ class DynamicNode(RadixNode):
 
             yield PrefixSearchResult(self, index, unmatched, remaining)
 
-    def search_path(
-        self, path: str, context: dict[str, str] | None = None
-    ) -> tuple[Optional["RadixNode"], dict[str, str]]:
+    def search(
+        self, path: Any, pos: int, captures: list[tuple[str, int, int]]
+    ) -> Optional["RadixNode"]:
         """
-        This method runs a regex `match` function and
-        updates the `context` dict with any matched values.
+        This method runs a regex `match` function at `pos` and
+        records the offsets of any matched value in `captures`.
         """
-        matched_vars: dict[str, str] = context or {}
+        match = self.pattern.match(path, pos)
+        if match is None:
+            return None
 
-        end_idx, matched = self.parser.match(path)
-        if matched:
-            matched_vars.update(matched)
+        end = match.end()
+        captures.append((self.parser.name, pos, end))
+        if end == len(path):
+            return self
 
-        if matched and end_idx == len(path):
-            return self, matched_vars
+        children = self.children
+        if children.alternation is not None:
+            return children.search(path, end, captures)
+        for child in children:
+            matched_node = child.search(path, end, captures)
+            if matched_node is not None:
+                return matched_node
 
-        if matched and end_idx < len(path):
-            for child in self.children:
-                matched_node, matched_vars = child.search_path(
-                    path[end_idx:], context=matched_vars
-                )
-                if matched_node is not None:
-                    return matched_node, matched_vars
+        return None
+
+    def search_limited(
+        self, path: Any, pos: int, captures: list[tuple[str, int, int]], budget: "limits.SearchBudget"
+    ) -> Optional["RadixNode"]:
+        budget.visit()
+        budget.regex_call()
+        match = self.pattern.match(path, pos)
+        if match is None:
+            return None
+
+        end = match.end()
+        captures.append((self.parser.name, pos, end))
+        if end == len(path):
+            return self
+
+        for child in self.children:
+            matched_node = child.search_limited(path, end, captures, budget)
+            if matched_node is not None:
+                return matched_node
+
+        return None
+
+
+class DynamicAlternation:
+    """
+    The dynamic children of one node, compiled into a single alternation of their
+    regexes (`(?P<_alt0>[0-9]+)|(?P<_alt1>[a-z-]+)|...`).
+
+    One `match` finds the first child (in the order children are searched) whose
+    pattern matches, and `lastindex` tells which one it was, so a miss costs one regex
+    call instead of one per child. If that child's subtree doesn't match the rest of
+    the path, the following children are tried one by one, as usual.
+
+    Build one with `DynamicAlternation.build`, which returns None for children whose
+    regexes can't be combined.
+
+    Args:
+        children (tuple): Dynamic child nodes, in the order they are searched.
+        pattern (re.Pattern): The compiled alternation.
+    """
+
+    __slots__ = ["children", "pattern", "_by_group"]
+    # Backreferences and conditionals would refer to other groups once combined
+    GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+    def __init__(self, children: tuple["DynamicNode", ...], pattern: re.Pattern):
+        self.children = children
+        self.pattern = pattern
+        # match.lastindex -> index of the child that matched
+        self._by_group: list[int] = [-1] * (pattern.groups + 1)
+        for idx in range(len(children)):
+            self._by_group[pattern.groupindex[f"_alt{idx}"]] = idx
+
+    def replace(self, node: RadixNode, new_node: "DynamicNode") -> "DynamicAlternation":
+        """The same alternation, with `new_node` (a copy of `node`) tried in its place"""
+        children = tuple(new_node if child is node else child for child in self.children)
+        return DynamicAlternation(children, self.pattern)
+
+    @classmethod
+    def build(cls, children: tuple["DynamicNode", ...]) -> Optional["DynamicAlternation"]:
+        if len(children) < 2:
+            return None
+        regexes = [child.parser.regex for child in children]
+        if any(cls.GROUP_REFERENCE.search(regex) for regex in regexes):
+            return None
+        source = "|".join(f"(?P<_alt{idx}>{regex})" for idx, regex in enumerate(regexes))
+        sample = children[0].pattern
+        try:
+            pattern = re.compile(
+                source.encode("utf-8") if isinstance(sample.pattern, bytes) else source,
+                sample.flags,
+            )
+        except re.error:
+            # for instance, the same group name used in two regexes
+            return None
+        return cls(children, pattern)
+
+    def search(
+        self, path: Any, pos: int, captures: list[tuple[str, int, int]]
+    ) -> RadixNode | None:
+        match = self.pattern.match(path, pos)
+        if match is None:
+            return None
+
+        idx = self._by_group[match.lastindex]  # type: ignore
+        child = self.children[idx]
+        end = match.end()
+        captures.append((child.parser.name, pos, end))
+        if end == len(path):
+            return child
+        matched_node = child.children.search(path, end, captures)
+        if matched_node is not None:
+            return matched_node
+
+        for sibling in self.children[idx + 1 :]:
+            matched_node = sibling.search(path, pos, captures)
+            if matched_node is not None:
+                return matched_node
+        return None
+
+
+def build_alternations(root: RadixNode) -> int:
+    """
+    Compiles the dynamic children of every node under `root` into alternations,
+    and returns how many nodes got one. The tree must not change afterwards.
+    """
+    count = 0
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        children = current.children
+        if len(children.dynamic_nodes) > 1:
+            # dynamic children are all `DynamicNode`s
+            dynamic_nodes = cast(Iterable[DynamicNode], children.dynamic_nodes)
+            children.alternation = DynamicAlternation.build(tuple(dynamic_nodes))
+            count += children.alternation is not None
+        stack.extend(children)
+    return count
+
+
+def update_alternations(nodes: Iterable[RadixNode]) -> None:
+    """
+    Rebuilds the alternations (see `build_alternations`) of `nodes`, whose dynamic
+    children may have changed since the tree was frozen.
+    """
+    for current in nodes:
+        children = current.children
+        if len(children.dynamic_nodes) > 1:
+            dynamic_nodes = cast(Iterable[DynamicNode], children.dynamic_nodes)
+            children.alternation = DynamicAlternation.build(tuple(dynamic_nodes))
+        elif children.alternation is not None:
+            children.alternation = None
+
+
+def iter_matches(
+    root: RadixNode, path: Any, budget: Optional["limits.SearchBudget"] = None
+) -> Iterator[tuple[RadixNode, list[tuple[str, int, int]]]]:
+    """
+    Yields every node under `root` (but not `root` itself) that holds a handler and
+    matches the whole of `path`, with the captures made on the way to it.
+
+    Nodes are yielded in the order `RadixNode.search` tries them, so the first one is
+    the node `search` would find (if it holds a handler). The tree is walked once,
+    depth-first and without recursion: a prefix shared by several matches is only
+    matched once. Captures only come from the nodes leading to each match.
+
+    With a `budget`, each node visited and regex call is charged to it, and
+    `LookupLimitError` is raised once it's spent.
+    """
+    if not path.startswith(root.path):
+        return
+    end = len(path)
+    captures: list[tuple[str, int, int]] = []
+    # Each entry is a node, the offset it starts at, and how many captures lead to it
+    stack: list[tuple[RadixNode, int, int]] = [
+        (child, len(root.path), 0) for child in reversed(tuple(root.children))
+    ]
+    while stack:
+        current, pos, depth = stack.pop()
+        del captures[depth:]
+        if budget is not None:
+            budget.visit()
+        if isinstance(current, DynamicNode):
+            if budget is not None:
+                budget.regex_call()
+            match = current.pattern.match(path, pos)
+            if match is None:
+                continue
+            new_pos = match.end()
+            captures.append((current.parser.name, pos, new_pos))
+        elif path.startswith(current.path, pos):
+            new_pos = pos + len(current.path)
+        else:
+            continue
+
+        if new_pos == end and current.handler is not None:
+            # the caller may hold on to these while we keep walking
+            yield current, list(captures)
+        if current.children:
+            depth = len(captures)
+            stack.extend(
+                (child, new_pos, depth) for child in reversed(tuple(current.children))
+            )
+
+
+def longest_prefix(
+    root: RadixNode,
+    path: Any,
+    separator: str | bytes,
+    captures: list[tuple[str, int, int]],
+    budget: Optional["limits.SearchBudget"] = None,
+) -> RadixNode | None:
+    """
+    Returns the node under `root` holding a handler whose route is the longest prefix
+    of `path` ending at a segment boundary: `/api` covers `/api` and `/api/users`, but
+    not `/apis`. `captures` is left holding the values captured on the way to it.
+
+    Only the branches that match the path are walked, each once. Static children
+    match at most one way, so in a tree without parameters this is a single walk
+    down; sibling parameters may each lead to a match. Between routes of the same
+    length, the first one in the order `RadixNode.search` tries them wins.
+    """
+    end = len(path)
+    found: RadixNode | None = None
+    found_pos = -1
+    found_captures: list[tuple[str, int, int]] = []
+    # Each entry is a node, the offset it starts at, and how many captures lead to it
+    stack: list[tuple[RadixNode, int, int]] = [
+        (child, len(root.path), 0) for child in reversed(tuple(root.children))
+    ]
+    while stack:
+        current, pos, depth = stack.pop()
+        del captures[depth:]
+        if budget is not None:
+            budget.visit()
+        if isinstance(current, DynamicNode):
+            if budget is not None:
+                budget.regex_call()
+            match = current.pattern.match(path, pos)
+            if match is None:
+                continue
+            new_pos = match.end()
+            captures.append((current.parser.name, pos, new_pos))
+        elif path.startswith(current.path, pos):
+            new_pos = pos + len(current.path)
+        else:
+            continue
+
+        if (
+            new_pos > found_pos
+            and current.handler is not None
+            and (
+                new_pos == end
+                or path.startswith(separator, new_pos)
+                or path.endswith(separator, 0, new_pos)
+            )
+        ):
+            found, found_pos, found_captures = current, new_pos, list(captures)
+        if current.children and new_pos < end:
+            depth = len(captures)
+            stack.extend(
+                (child, new_pos, depth) for child in reversed(tuple(current.children))
+            )
+
+    captures[:] = found_captures
+    return found
+
+
+def find_route(
+    root: RadixNode,
+    path: str,
+    raw_bytes: bool = False,
+    case_insensitive: bool = False,
+    separator: str = "/",
+    partial: bool = False,
+) -> list[RadixNode] | None:
+    """
+    Finds the node that the route `path` (not a request path: `/users/{id}` is only
+    found by `/users/{id}`) is stored at, and returns the nodes leading to it, from
+    `root` down to that node. Returns None if the tree has no such node, or with
+    `partial`, the nodes leading as far towards it as the tree goes.
+
+    Parameters are found by name and regex, as when inserting, so `{id}` and `{id:*}`
+    are the same parameter. The node found may not hold a handler.
+    """
+    chain = [root]
+    current = root
+    missing = chain if partial else None
+    parts = utils.parse_dynamic(path, separator) if "{" in path else (path,)
+    for part in parts:
+        if isinstance(part, utils.DynamicParseNode):
+            for child in current.children.dynamic_nodes:
+                if child.key == (part.name, part.regex):
+                    break
+            else:
+                return missing
+            current = child
+            chain.append(current)
+            continue
+
+        label = static_label(part, raw_bytes, case_insensitive)
+        while label:
+            first = label[:1]
+            for child in current.children.static_nodes:
+                if child.path[:1] == first:
+                    break
+            else:
+                return missing
+            if not label.startswith(child.path):
+                return missing
+            label = label[len(child.path) :]
+            current = child
+            chain.append(current)
+    return chain
+
+
+def remove_route(chain: list[RadixNode]) -> None:
+    """
+    Removes the handler of the last node in `chain` (as returned by `find_route`) and
+    prunes the tree: nodes left without a handler or children are removed, and a
+    static node left without a handler and with a single static child is merged with
+    it, so that the tree stays as compact as if the route had never been inserted.
+    """
+    chain[-1].handler = None
+    idx = len(chain) - 1
+    while idx > 0:
+        current, parent = chain[idx], chain[idx - 1]
+        if current.handler is not None or current.children:
+            break
+        parent.children.discard(current)
+        if not parent.children:
+            parent.children = NO_CHILDREN
+        idx -= 1
+
+    current = chain[idx]
+    if idx == 0 or type(current) is not StaticNode or current.handler is not None:
+        return None
+    if len(current.children) != 1 or current.children.dynamic_nodes:
+        return None
+    (child,) = current.children.static_nodes
+    # The label keeps its first character, so `current` stays hashed correctly
+    current.path = intern_label(current.path + child.path)
+    current.handler = child.handler
+    current.children = child.children
+    return None
 
-        return None, matched_vars
+
+def iter_routes(root: RadixNode, prefix: str = "") -> Iterator[tuple[str, RadixNode]]:
+    """
+    Yields `(route, node)` for every node under `root` that holds a handler and whose
+    route starts with `prefix`, in lexicographic order of the routes.
+
+    Routes are rebuilt from the labels on the way down (as they are stored: see
+    `tree_path`). Parameters are part of a route, as in `/users/{id}`, and `prefix`
+    is compared with them as text. The walk is depth-first and without recursion,
+    so memory use grows with the depth and fan-out of the tree, not with its size.
+    """
+    labels: list[str] = []
+    # Each entry is a node, how many labels lead to it, and the part of `prefix`
+    # its label (and the labels below it) must still match
+    stack: list[tuple[RadixNode, int, str]] = [(root, 0, prefix)]
+    while stack:
+        current, depth, remaining = stack.pop()
+        del labels[depth:]
+        label = label_str(current.path)
+        if remaining:
+            if label.startswith(remaining):
+                remaining = ""
+            elif remaining.startswith(label):
+                remaining = remaining[len(label) :]
+            else:
+                continue
+        labels.append(label)
+
+        if not remaining and current.handler is not None and current is not root:
+            yield "".join(labels), current
+        children = current.children
+        if children:
+            depth = len(labels)
+            # pushed in reverse, so that the smallest label is visited first
+            stack.extend(
+                (child, depth, remaining)
+                for child in sorted(children, key=lambda child: label_str(child.path), reverse=True)
+            )
 
 
 # # # # # # # # # # # # # # # # # # # #
@@ -537,18 +1087,49 @@ class DynamicNode(RadixNode):
 # Helpers
 # #
 # # # # # # # # # # # # # # # # # # # #
-def node_map(element: utils.DynamicParseNode | str) -> DynamicNode | StaticNode:
+def static_label(
+    element: str, raw_bytes: bool = False, case_insensitive: bool = False
+) -> str | bytes:
+    """
+    Returns the label stored for a static part of a path.
+
+    With `raw_bytes`, labels are stored percent-encoded as `bytes`. With
+    `case_insensitive`, they are case-folded.
+    """
+    label: str | bytes = utils.quote_label(element) if raw_bytes else element
+    if case_insensitive:
+        return fold_label(label)
+    return label
+
+
+def node_map(
+    element: utils.DynamicParseNode | str,
+    raw_bytes: bool = False,
+    case_insensitive: bool = False,
+) -> DynamicNode | StaticNode:
     """
     Returns a `DynamicNode` or a `StaticNode` for any `str` or parser passed in.
+
+    With `raw_bytes`, static labels are stored percent-encoded as `bytes` and
+    parameters are matched with `bytes` regexes. With `case_insensitive`, static
+    labels are case-folded and parameters are matched ignoring case.
     """
     if isinstance(element, utils.DynamicParseNode):
+        if raw_bytes or case_insensitive:
+            return DynamicNode(element, pattern=element.compile(raw_bytes, case_insensitive))
         return DynamicNode(element)
     elif isinstance(element, str):
-        return StaticNode(element)
+        return StaticNode(static_label(element, raw_bytes, case_insensitive))
     raise ValueError("Uknown type for node mapping")
 
 
-def path_to_tree(path: str, handler: Any) -> RadixNode:
+def path_to_tree(
+    path: str,
+    handler: Any,
+    raw_bytes: bool = False,
+    case_insensitive: bool = False,
+    separator: str = "/",
+) -> RadixNode:
     """
     Create a _new_ tree out of this path. Because this is a new node, it
     should contain only simple `parent.children = {child-node}` relationships.
@@ -557,63 +1138,275 @@ def path_to_tree(path: str, handler: Any) -> RadixNode:
 
         path: The path to construct a tree out of
         handler: Any associated function that we want this path to point to.
+        raw_bytes: Build nodes that match raw (percent-encoded) path bytes.
+        case_insensitive: Build nodes that match case-folded paths.
+        separator: What parameters without a regex match up to.
 
     Returns:
 
         RadixNode: the root node of the tree
     """
-    path_nodes = list(enumerate(map(node_map, utils.parse_dynamic(path))))
+    path_nodes = list(
+        enumerate(
+            node_map(element, raw_bytes, case_insensitive)
+            for element in utils.parse_dynamic(path, separator)
+        )
+    )
     if len(path_nodes) == 0:
         raise ValueError("`path_to_tree` called with inscrutable path")
 
     new_path_root = path_nodes[0][1]
-    if len(path_nodes) == 1 and handler is not None:
-        new_path_root.leaf = LeafNode(handler=handler)
+    if len(path_nodes) == 1:
+        new_path_root.handler = handler
     else:
         last_node_idx = len(path_nodes) - 1
         latest_root: RadixNode = new_path_root
         for idx, node in path_nodes[1:]:
-            if handler is not None and idx == last_node_idx:
-                node.leaf = LeafNode(handler=handler)
+            if idx == last_node_idx:
+                node.handler = handler
             latest_root = latest_root.insert_node(node)
 
     return new_path_root
 
 
+def tree_path(path: str, raw_bytes: bool = False, case_insensitive: bool = False) -> str:
+    """
+    Returns `path` with its static parts as they are stored in a tree
+    (see `static_label`), as text. Dynamic parameters are left as they are.
+    """
+    if not (raw_bytes or case_insensitive):
+        return path
+    return "".join(
+        part.raw
+        if isinstance(part, utils.DynamicParseNode)
+        else label_str(static_label(part, raw_bytes, case_insensitive))
+        for part in utils.parse_dynamic(path)
+    )
+
+
+def copy_insert_path(root: RadixNode, path: str) -> RadixNode:
+    """
+    Copy-on-write support for inserting `path` under `root`.
+
+    Returns a shallow copy of `root` in which every node that inserting `path` may
+    modify (split, add children to, or merge into) has also been replaced with a copy.
+    All other subtrees are shared with the original tree, which is left untouched.
+
+    For trees that match raw path bytes or case-folded paths, pass the path with
+    its static parts as they are stored in the tree (see `tree_path`).
+
+    Inserting into the returned root and then publishing it with a single reference
+    assignment means readers of the original tree never see a partial update.
+    """
+    new_root = root.copy()
+    # Each entry is a (copied) node and the part of `path` remaining below it
+    stack: list[tuple[RadixNode, str]] = [(new_root, path)]
+    while stack:
+        parent, remaining = stack.pop()
+        label = label_str(parent.path)
+        if not remaining.startswith(label):
+            # partial match: this node may be split, which only changes the node itself
+            continue
+        remaining = remaining[len(label) :]
+        if not remaining or not parent.children:
+            continue
+        for child in tuple(parent.children):
+            # Static siblings differ in their first character and dynamic nodes
+            # all start with a brace, so only children sharing the first
+            # character can be touched by this insert.
+            if label_str(child.path)[:1] != remaining[:1]:
+                continue
+            child_copy = child.copy()
+            parent.children.replace(child, child_copy)
+            if isinstance(child, DynamicNode):
+                param = next(utils.parse_dynamic(remaining))
+                if isinstance(param, utils.DynamicParseNode):
+                    stack.append((child_copy, child.path + remaining[len(param.raw) :]))
+            else:
+                stack.append((child_copy, remaining))
+    return new_root
+
+
+def merge_child(parent: RadixNode, child: RadixNode) -> None:
+    """
+    Adds `child` (and its subtree) under `parent`, keeping the radix property:
+    no two static children of a node may start with the same character.
+
+    `child` must be a new node (not part of any tree): its label may be shortened.
+    """
+    if isinstance(child, DynamicNode):
+        for existing in parent.children.dynamic_nodes:
+            if existing == child:
+                merge_nodes(existing, child)
+                return
+        parent.add_child(child)
+        return
+
+    first = child.path[:1]
+    for existing in parent.children.static_nodes:
+        if existing.path[:1] == first:
+            break
+    else:
+        parent.add_child(child)
+        return
+
+    idx = utils.first_nonequal_idx(existing.path, child.path)
+    if idx < len(existing.path):
+        # `split` keeps the first character, so `existing` stays hashed correctly
+        existing.split(idx)
+    if idx == len(child.path):
+        merge_nodes(existing, child)
+    else:
+        child.path = intern_label(child.path[idx:])
+        merge_child(existing, child)
+
+
 def merge_nodes(into: RadixNode, merge_node: RadixNode) -> RadixNode:
     """This operation is useful when we discover overlapping paths in our radix tree"""
     if (
-        into.leaf is not None
-        and merge_node.leaf is not None
-        and into.leaf != merge_node.leaf
+        into.handler is not None
+        and merge_node.handler is not None
+        and into.handler != merge_node.handler
     ):
         msg = "Merge conflict: duplicate nodes both have handler for path '{}'"
         raise ValueError(msg.format(into.path))
 
-    if into.leaf is None and merge_node.leaf is not None:
-        into.leaf = merge_node.leaf
+    if into.handler is None and merge_node.handler is not None:
+        into.handler = merge_node.handler
 
-    if not merge_node.children:
-        return into
+    for child in tuple(merge_node.children):
+        merge_child(into, child)
 
-    if into.children.isdisjoint(merge_node.children):
-        new_children = into.children | merge_node.children
-        into.children = NodeChildSet(new_children)
-        return into
+    return into
 
-    # Poor performance: look for algo for merging radix trees
-    # On the plus: if `prefix_search` is accurate, then our insertion point
-    # is lowest possible point on the tree.
-    shared = into.children & merge_node.children
-    into_child_shared = {nd.path: nd for nd in into.children if nd in shared}
-    merge_child_shared = {nd.path: nd for nd in merge_node.children if nd in shared}
 
-    different_children = (into.children | merge_node.children) - shared
-    into.children = NodeChildSet(different_children)
+def copy_subtree(root: RadixNode, path: str | bytes | None = None) -> RadixNode:
+    """
+    Returns a copy of `root` and of every node under it, sharing only labels,
+    handlers and compiled patterns with the original. With `path`, the copy of a
+    static `root` gets that label instead of its own.
+    """
+
+    def copy_node(original: RadixNode, label: str | bytes | None = None) -> RadixNode:
+        if isinstance(original, DynamicNode):
+            return DynamicNode(original.parser, handler=original.handler, pattern=original.pattern)
+        return type(original)(original.path if label is None else label, handler=original.handler)
+
+    new_root = copy_node(root, path)
+    stack = [(root, new_root)]
+    while stack:
+        original, copied = stack.pop()
+        if not original.children:
+            continue
+        children = []
+        for child in original.children:
+            child_copy = copy_node(child)
+            children.append(child_copy)
+            stack.append((child, child_copy))
+        copied.children = NodeChildSet(children)
+    return new_root
+
+
+def merge_tree(
+    into: RadixNode, incoming: RadixNode, consume: bool = False, copy_on_write: bool = False
+) -> tuple[list[str], int]:
+    """
+    Adds the routes under `incoming` to the tree under `into`. Handlers of the two
+    roots (default handlers) are left alone.
 
-    for nd in shared:
-        new_into = into_child_shared[nd.path]
-        new_merge = merge_child_shared[nd.path]
-        into.children.add(merge_nodes(new_into, new_merge))
+    Each node of `incoming` is visited once: a subtree that `into` doesn't have is
+    attached with a single `add_child`, and where both trees have a node, the
+    children of the node in `into` are indexed once by their first character. The
+    cost is linear in the size of `incoming` and of the nodes the trees share.
 
-    return into
+    With `consume`, nodes of `incoming` are moved into `into` (and relabelled where
+    needed), which leaves `incoming` unusable. Otherwise `incoming` is left untouched
+    and the subtrees added to `into` are copies.
+
+    With `copy_on_write`, `into` must be a shallow copy (`RadixNode.copy`) of a root
+    that readers may be walking: every node below it that the merge changes, or
+    descends into, is replaced with a copy first, as `copy_insert_path` does for one
+    route. The rest of the tree is shared with the original, which stays untouched.
+
+    Returns:
+        Tuple[list, int]: the routes (as stored: see `tree_path`) that have a
+            different handler in each tree, which keep the one from `into`, and how
+            many routes both trees have.
+    """
+    conflicts: list[str] = []
+    shared = 0
+    # Static children of the nodes of `into` we add to, by first character
+    indexes: dict[int, dict[Any, RadixNode]] = {}
+
+    def static_index(parent: RadixNode) -> dict[Any, RadixNode]:
+        index = indexes.get(id(parent))
+        if index is None:
+            index = indexes[id(parent)] = {
+                child.path[:1]: child for child in parent.children.static_nodes
+            }
+        return index
+
+    # With `copy_on_write`, the nodes of `into` that are already copies
+    owned = {id(into)}
+
+    def own(parent: RadixNode, existing: RadixNode) -> RadixNode:
+        """Replaces `existing`, a child of `parent` (a copy), with a copy of its own"""
+        if not copy_on_write or id(existing) in owned:
+            return existing
+        existing_copy = existing.copy()
+        parent.children.replace(existing, existing_copy)
+        owned.add(id(existing_copy))
+        return existing_copy
+
+    def attach(parent: RadixNode, child: RadixNode, label: Any) -> RadixNode:
+        if not consume:
+            child = copy_subtree(child, label if isinstance(child, StaticNode) else None)
+        elif isinstance(child, StaticNode) and label != child.path:
+            # `child` is never looked up in the child set it came from again
+            child.path = intern_label(label)
+        parent.add_child(child)
+        return child
+
+    # Each entry is a node of `into`, the route leading to it, a node of `incoming`
+    # to place under it, and the part of that node's label still to place
+    stack: list[tuple[RadixNode, str, RadixNode, Any]] = [
+        (into, label_str(into.path), child, child.path) for child in incoming.children
+    ]
+    while stack:
+        parent, route, child, label = stack.pop()
+        if isinstance(child, DynamicNode):
+            for existing in parent.children.dynamic_nodes:
+                if existing == child:
+                    break
+            else:
+                attach(parent, child, label)
+                continue
+            existing = own(parent, existing)
+            route += existing.path
+        else:
+            index = static_index(parent)
+            found = index.get(label[:1])
+            if found is None:
+                index[label[:1]] = attach(parent, child, label)
+                continue
+            existing = index[label[:1]] = own(parent, found)
+            idx = utils.first_nonequal_idx(existing.path, label)
+            if idx < len(existing.path):
+                # `split` keeps the first character, so `index` stays correct
+                existing.split(idx)
+                indexes.pop(id(existing), None)
+            if idx < len(label):
+                stack.append((existing, route + label_str(label[:idx]), child, label[idx:]))
+                continue
+            route += label_str(label)
+
+        if child.handler is not None:
+            if existing.handler is None:
+                existing.handler = child.handler
+            else:
+                shared += 1
+                if existing.handler != child.handler:
+                    conflicts.append(route)
+        stack.extend((existing, route, grandchild, grandchild.path) for grandchild in child.children)
+
+    return sorted(conflicts), shared
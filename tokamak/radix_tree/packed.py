@@ -0,0 +1,931 @@
+"""
+A compact, read-only binary encoding of a route tree.
+
+A packed tree is built once (for instance, in the parent process of a pre-fork
+server) and then searched directly from its buffer: nothing is deserialized into
+Python node objects. Because the buffer holds no Python objects, it can be placed
+in shared memory (see `SharedRouteTable`) and used by every worker process, so
+all workers share a single copy of the structure.
+
+Handlers cannot live in a buffer, so leaves store a handler _index_. Each process
+resolves indexes through its own, small handler table (typically the list of
+routes in the order they were added to the router).
+
+Layout (all integers little-endian):
+
+    header   | magic, version, flags, counts and section offsets, lookup limits and
+             | the prefilter's false positive rate
+    nodes    | one fixed-size record per node, in depth-first order (root first)
+    children | u32 node indexes: each node's static children (sorted by label), then
+             | its dynamic children
+    strings  | UTF-8 labels, parameter names and regexes (deduplicated)
+
+Sorting static children lets a lookup find the one to follow by bisection
+instead of trying each in turn.
+
+A packed tree can also be written to a file, with its handlers stored as byte
+strings (see `write_tree_file`), and searched through `mmap` (see `MappedTree`):
+large, static key sets can then be shipped as artifacts and opened instantly.
+
+Dynamic parameters are matched with `bytes` regexes compiled from the stored
+pattern, so patterns should be written in terms of ASCII (as URL paths are).
+Trees built with `raw_bytes=True` keep that mode: they are searched with raw,
+percent-encoded path bytes. A tree's `limits` and `prefilter` are kept too: the
+prefilter is rebuilt from the routes when the buffer is opened.
+"""
+import itertools
+import mmap
+import os
+import re
+import struct
+import sys
+from collections.abc import Callable, Iterator, Sequence
+from multiprocessing import shared_memory
+from typing import Any, cast
+from urllib.parse import unquote
+
+from . import node, tree, utils
+from .limits import LimitAction, LookupLimitError, LookupLimits, PathTooLongError, SearchBudget
+from .prefilter import Prefilter
+
+MAGIC = b"TKRT"
+VERSION = 3
+FLAG_RELAXED_TRAILING_SLASH = 1
+FLAG_RAW_BYTES = 2
+FLAG_CASE_INSENSITIVE = 4
+FLAG_LIMITS = 8
+FLAG_LIMITS_RAISE = 16
+FLAG_PREFILTER = 32
+KIND_STATIC = 0
+KIND_DYNAMIC = 1
+NO_HANDLER = -1
+
+# magic, version, flags, node_count, nodes_offset, children_offset,
+# strings_offset, separator_offset, separator_length, max_path_length,
+# max_nodes_visited, max_regex_calls (0 for no limit), prefilter_false_positive_rate
+HEADER = struct.Struct("<4sHHIIIIIIIIId")
+# kind, static_count, dynamic_count, label_offset, label_length, name_offset,
+# name_length, regex_offset, regex_length, children_index, handler
+NODE = struct.Struct("<BxHHxxIIIIIIIi")
+CHILD = struct.Struct("<I")
+
+# Files written by `write_tree_file`: a header, a packed tree, then the values
+# section (one VALUE record per handler, followed by the value bytes).
+FILE_MAGIC = b"TKRF"
+FILE_VERSION = 1
+# magic, version, route_count, value_count, tree_length
+FILE_HEADER = struct.Struct("<4sHxxIIQ")
+# offset (from the end of the records) and length of a value
+VALUE = struct.Struct("<II")
+
+
+class PackedTreeError(ValueError):
+    pass
+
+
+def _decode_capture(value: bytes) -> str:
+    return value.decode("utf-8", "replace")
+
+
+def _label_bytes(nd: node.RadixNode) -> bytes:
+    return nd.path if isinstance(nd.path, bytes) else nd.path.encode("utf-8")
+
+
+class _Packer:
+    """Accumulates the sections of a packed tree"""
+
+    __slots__ = ["nodes", "children", "strings", "string_offsets", "handler_index", "handlers"]
+
+    def __init__(self, handlers: Sequence[Any] | None):
+        self.nodes: list[bytes] = []
+        self.children: list[int] = []
+        self.strings = bytearray()
+        self.string_offsets: dict[bytes, int] = {}
+        self.handlers: list[Any] = list(handlers) if handlers is not None else []
+        # handlers are often unhashable, so we index them by identity
+        self.handler_index: dict[int, int] | None = (
+            {id(handler): idx for idx, handler in enumerate(self.handlers)}
+            if handlers is not None
+            else None
+        )
+
+    def string(self, value: str | bytes) -> tuple[int, int]:
+        encoded = value if isinstance(value, bytes) else value.encode("utf-8")
+        offset = self.string_offsets.get(encoded)
+        if offset is None:
+            offset = len(self.strings)
+            self.string_offsets[encoded] = offset
+            self.strings.extend(encoded)
+        return offset, len(encoded)
+
+    def handler(self, handler: Any) -> int:
+        if handler is None:
+            return NO_HANDLER
+        if self.handler_index is None:
+            self.handlers.append(handler)
+            return len(self.handlers) - 1
+        try:
+            return self.handler_index[id(handler)]
+        except KeyError:
+            raise PackedTreeError(f"Handler missing from handler table: {handler!r}") from None
+
+    def pack_nodes(self, root: node.RadixNode) -> None:
+        """Assigns node indexes depth-first, then writes one record per node"""
+        order: list[node.RadixNode] = []
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            order.append(current)
+            stack.extend(reversed(list(current.children)))
+        index = {id(nd): idx for idx, nd in enumerate(order)}
+
+        for current in order:
+            label_off, label_len = self.string(current.path)
+            name_off = name_len = regex_off = regex_len = 0
+            kind = KIND_STATIC
+            if isinstance(current, node.DynamicNode):
+                kind = KIND_DYNAMIC
+                name_off, name_len = self.string(current.parser.name)
+                regex_off, regex_len = self.string(current.parser.regex)
+
+            children_index = len(self.children)
+            # sorted, so that lookups can find the static child to follow by bisection
+            static_children = sorted(current.children.static_nodes, key=_label_bytes)
+            dynamic_children = current.children.dynamic_nodes
+            self.children.extend(index[id(child)] for child in static_children)
+            self.children.extend(index[id(child)] for child in dynamic_children)
+            self.nodes.append(
+                NODE.pack(
+                    kind,
+                    len(static_children),
+                    len(dynamic_children),
+                    label_off,
+                    label_len,
+                    name_off,
+                    name_len,
+                    regex_off,
+                    regex_len,
+                    children_index,
+                    self.handler(current.handler),
+                )
+            )
+
+
+def pack_tree(
+    route_tree: "tree.Tree", handlers: Sequence[Any] | None = None
+) -> tuple[bytes, list[Any]]:
+    """
+    Encodes a `Tree` into the packed binary format.
+
+    Args:
+        route_tree (Tree): The tree to encode.
+        handlers (Sequence[Any]): Optional handler table. When given, leaves store each
+            handler's position in this sequence, so that other processes can rebuild the
+            same table (e.g. from the same list of routes). When omitted, handlers are
+            numbered in the order they are found.
+
+    Returns:
+        Tuple[bytes, handler-list]: the encoded tree and the handler table to use with it.
+    """
+    packer = _Packer(handlers)
+    packer.pack_nodes(route_tree._root)
+    sep_off, sep_len = packer.string(route_tree.separator)
+
+    flags = 0
+    if route_tree.trailing_slash_match is tree.TrailingSlashMatch.RELAXED:
+        flags |= FLAG_RELAXED_TRAILING_SLASH
+    if route_tree.raw_bytes:
+        flags |= FLAG_RAW_BYTES
+    if route_tree.case_insensitive:
+        flags |= FLAG_CASE_INSENSITIVE
+    limits = route_tree.limits
+    if limits is not None:
+        flags |= FLAG_LIMITS
+        if limits.action is LimitAction.RAISE:
+            flags |= FLAG_LIMITS_RAISE
+    false_positive_rate = 0.0
+    if route_tree.prefilter is not None:
+        flags |= FLAG_PREFILTER
+        false_positive_rate = route_tree.prefilter.prefixes.false_positive_rate
+
+    nodes_offset = HEADER.size
+    children_offset = nodes_offset + NODE.size * len(packer.nodes)
+    strings_offset = children_offset + CHILD.size * len(packer.children)
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        flags,
+        len(packer.nodes),
+        nodes_offset,
+        children_offset,
+        strings_offset,
+        sep_off,
+        sep_len,
+        (limits and limits.max_path_length) or 0,
+        (limits and limits.max_nodes_visited) or 0,
+        (limits and limits.max_regex_calls) or 0,
+        false_positive_rate,
+    )
+    children = struct.pack(f"<{len(packer.children)}I", *packer.children)
+    return b"".join((header, *packer.nodes, children, bytes(packer.strings))), packer.handlers
+
+
+class PackedTree:
+    """
+    Searches a packed tree directly from its buffer.
+
+    This class offers the same `get_handler` as `Tree`, so it can be used
+    by an `AsgiRouter` in place of a `Tree`. It is read-only.
+
+    The `limits` and `prefilter` of the packed tree apply to `get_handler` as they
+    do in a `Tree`. The prefilter is rebuilt from the routes, once per buffer.
+
+    Args:
+        buffer: Any object supporting the buffer protocol (bytes, mmap, shared memory).
+        handlers (Sequence[Any]): This process' handler table.
+    """
+
+    def __init__(self, buffer: Any, handlers: Sequence[Any]):
+        self._buf = memoryview(buffer)
+        if len(self._buf) < HEADER.size:
+            raise PackedTreeError("Buffer too small for a packed tree")
+        (
+            magic,
+            version,
+            flags,
+            self.node_count,
+            self._nodes_offset,
+            self._children_offset,
+            self._strings_offset,
+            sep_off,
+            sep_len,
+            max_path_length,
+            max_nodes_visited,
+            max_regex_calls,
+            false_positive_rate,
+        ) = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise PackedTreeError("Buffer does not hold a packed tree")
+        if version != VERSION:
+            raise PackedTreeError(f"Unsupported packed tree version: {version}")
+
+        self.handlers = handlers
+        self._separator = self._string(sep_off, sep_len)
+        self.separator = self._separator.decode("utf-8")
+        self.trailing_slash_match = (
+            tree.TrailingSlashMatch.RELAXED
+            if flags & FLAG_RELAXED_TRAILING_SLASH
+            else tree.TrailingSlashMatch.STRICT
+        )
+        self.raw_bytes = bool(flags & FLAG_RAW_BYTES)
+        self.case_insensitive = bool(flags & FLAG_CASE_INSENSITIVE)
+        self._regex_flags = re.IGNORECASE if self.case_insensitive else 0
+        # Compiled patterns are per-process: the buffer only holds their source
+        self._patterns: dict[int, re.Pattern] = {}
+        self._names: dict[int, str] = {}
+        self.limits = (
+            LookupLimits(
+                max_path_length=max_path_length or None,
+                max_nodes_visited=max_nodes_visited or None,
+                max_regex_calls=max_regex_calls or None,
+                action=LimitAction.RAISE if flags & FLAG_LIMITS_RAISE else LimitAction.MISS,
+            )
+            if flags & FLAG_LIMITS
+            else None
+        )
+        self.prefilter: Prefilter | None = None
+        if flags & FLAG_PREFILTER:
+            self.prefilter = Prefilter(
+                self.separator, false_positive_rate=false_positive_rate, raw_bytes=self.raw_bytes
+            )
+            for route, _ in self._routes(b""):
+                # routes as they are stored: percent-encoded bytes in raw trees
+                self.prefilter.add(route if self.raw_bytes else route.decode("utf-8"))
+
+    def _string(self, offset: int, length: int) -> bytes:
+        start = self._strings_offset + offset
+        return bytes(self._buf[start : start + length])
+
+    def _node(self, idx: int) -> tuple:
+        return NODE.unpack_from(self._buf, self._nodes_offset + idx * NODE.size)
+
+    def _child(self, idx: int) -> int:
+        return CHILD.unpack_from(self._buf, self._children_offset + idx * CHILD.size)[0]
+
+    def _name(self, name_off: int, name_len: int) -> str:
+        name = self._names.get(name_off)
+        if name is None:
+            name = self._string(name_off, name_len).decode("utf-8")
+            self._names[name_off] = name
+        return name
+
+    def _pattern(self, idx: int, regex_off: int, regex_len: int) -> re.Pattern:
+        pattern = self._patterns.get(idx)
+        if pattern is None:
+            pattern = re.compile(self._string(regex_off, regex_len), self._regex_flags)
+            self._patterns[idx] = pattern
+        return pattern
+
+    def _candidates(
+        self, children_index: int, static_count: int, dynamic_count: int, path: bytes, pos: int
+    ) -> list[int]:
+        """
+        Returns the children that may match `path[pos:]`, in search order: the static
+        children whose label starts with the same byte (found by bisecting the sorted
+        static children), then every dynamic child.
+        """
+        candidates = []
+        if static_count and pos < len(path):
+            first = path[pos]
+            lo, hi = children_index, children_index + static_count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._first_byte(self._child(mid)) < first:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            # distinct characters may still share their first UTF-8 byte
+            while lo < children_index + static_count:
+                child = self._child(lo)
+                if self._first_byte(child) != first:
+                    break
+                candidates.append(child)
+                lo += 1
+        candidates.extend(
+            self._child(child)
+            for child in range(children_index + static_count, children_index + static_count + dynamic_count)
+        )
+        return candidates
+
+    def _first_byte(self, idx: int) -> int:
+        label_off, label_len = NODE.unpack_from(self._buf, self._nodes_offset + idx * NODE.size)[3:5]
+        return self._buf[self._strings_offset + label_off] if label_len else -1
+
+    def _search(
+        self,
+        idx: int,
+        path: bytes,
+        pos: int,
+        captures: list[tuple[str, int, int]],
+        budget: SearchBudget | None = None,
+    ) -> int:
+        """
+        Mirrors `RadixNode.search_path`: returns the index of the first node that
+        completely matches `path[pos:]`, or -1. Each node visited (and regex run) is
+        charged to `budget`, if any: like `RadixNode.search_limited`, a budgeted search
+        visits every child instead of only the candidates for the next byte.
+        """
+        if budget is not None:
+            budget.visit()
+        (
+            kind,
+            static_count,
+            dynamic_count,
+            label_off,
+            label_len,
+            name_off,
+            name_len,
+            regex_off,
+            regex_len,
+            children_index,
+            _,
+        ) = self._node(idx)
+
+        if kind == KIND_DYNAMIC:
+            if budget is not None:
+                budget.regex_call()
+            match = self._pattern(idx, regex_off, regex_len).match(path, pos)
+            if match is None:
+                return -1
+            end = match.end()
+            captures.append((self._name(name_off, name_len), pos, end))
+        else:
+            start = self._strings_offset + label_off
+            end = pos + label_len
+            if self._buf[start : start + label_len] != path[pos:end]:
+                return -1
+        if end == len(path):
+            return idx
+
+        if budget is None:
+            children = self._candidates(children_index, static_count, dynamic_count, path, end)
+        else:
+            children = [
+                self._child(child)
+                for child in range(children_index, children_index + static_count + dynamic_count)
+            ]
+        for child in children:
+            found = self._search(child, path, end, captures, budget)
+            if found != -1:
+                return found
+        return -1
+
+    def _encode(self, path: str | bytes) -> tuple[bytes, bytes]:
+        """Returns `path` as bytes, and the (folded) bytes to search for"""
+        if isinstance(path, bytes):
+            encoded = path
+        elif self.raw_bytes:
+            encoded = utils.quote_label(path)
+        else:
+            encoded = path.encode("utf-8")
+
+        search_key = encoded
+        if self.case_insensitive:
+            if isinstance(path, str) and not self.raw_bytes:
+                search_key = path.casefold().encode("utf-8")
+            else:
+                # percent-encoded bytes: only ASCII letters can be folded
+                search_key = encoded.lower()
+        return encoded, search_key
+
+    def _capture_map(
+        self, encoded: bytes, search_key: bytes, captures: list[tuple[str, int, int]]
+    ) -> utils.CaptureMap:
+        decode = utils.unquote_capture if self.raw_bytes else _decode_capture
+        return utils.CaptureMap(
+            encoded if len(search_key) == len(encoded) else search_key, captures, decode=decode
+        )
+
+    def _handler(self, idx: int) -> Any:
+        handler_idx = self._node(idx)[-1]
+        return self.handlers[handler_idx] if handler_idx != NO_HANDLER else None
+
+    def get_handler(self, path: str | bytes) -> tuple[Any, utils.CaptureMap]:
+        encoded, search_key = self._encode(path)
+        # paths are measured in characters, or in bytes for raw paths (as in `Tree`)
+        length = len(path) if isinstance(path, str) and not self.raw_bytes else len(encoded)
+        if (
+            self.trailing_slash_match is tree.TrailingSlashMatch.RELAXED
+            and len(encoded) > 1
+            and search_key.endswith(self._separator)
+        ):
+            encoded = encoded[:-1]
+            search_key = search_key[:-1]
+            length -= 1
+
+        limits = self.limits
+        if limits is not None and limits.max_path_length is not None and length > limits.max_path_length:
+            return self._limit_exceeded(
+                encoded, search_key, PathTooLongError("Path is longer than `max_path_length`")
+            )
+        prefilter = self.prefilter
+        if prefilter is not None and not prefilter.may_match(
+            search_key if self.raw_bytes else search_key.decode("utf-8")
+        ):
+            return self._handler(0), self._capture_map(encoded, search_key, [])
+
+        captures: list[tuple[str, int, int]] = []
+        try:
+            found = self._search(0, search_key, 0, captures, SearchBudget(limits) if limits else None)
+        except LookupLimitError as exc:
+            return self._limit_exceeded(encoded, search_key, exc)
+        context = self._capture_map(encoded, search_key, captures)
+        if found != -1:
+            handler = self._handler(found)
+            if handler:
+                return handler, context
+        return self._handler(0), context
+
+    def _limit_exceeded(
+        self, encoded: bytes, search_key: bytes, error: LookupLimitError
+    ) -> tuple[Any, utils.CaptureMap]:
+        if self.limits is not None and self.limits.action is LimitAction.RAISE:
+            raise error
+        return self._handler(0), self._capture_map(encoded, search_key, [])
+
+    def longest_prefix(self, path: str | bytes) -> tuple[Any, utils.CaptureMap]:
+        """
+        Returns the handler of the deepest route that covers `path`, and the values
+        captured on the way (see `Tree.longest_prefix`).
+        """
+        encoded, search_key = self._encode(path)
+        separator = self._separator
+        end = len(search_key)
+        found = -1
+        found_pos = -1
+        found_captures: list[tuple[str, int, int]] = []
+        captures: list[tuple[str, int, int]] = []
+        # Each entry is a node index, the offset it starts at, and how many captures lead to it
+        _, static_count, dynamic_count, _, root_len, *_, children_index, _ = self._node(0)
+        stack = [
+            (child, root_len, 0)
+            for child in reversed(
+                self._candidates(children_index, static_count, dynamic_count, search_key, root_len)
+            )
+        ]
+        while stack:
+            idx, pos, depth = stack.pop()
+            del captures[depth:]
+            (
+                kind,
+                static_count,
+                dynamic_count,
+                label_off,
+                label_len,
+                name_off,
+                name_len,
+                regex_off,
+                regex_len,
+                children_index,
+                handler_idx,
+            ) = self._node(idx)
+            if kind == KIND_DYNAMIC:
+                match = self._pattern(idx, regex_off, regex_len).match(search_key, pos)
+                if match is None:
+                    continue
+                new_pos = match.end()
+                captures.append((self._name(name_off, name_len), pos, new_pos))
+            else:
+                start = self._strings_offset + label_off
+                new_pos = pos + label_len
+                if self._buf[start : start + label_len] != search_key[pos:new_pos]:
+                    continue
+
+            if (
+                new_pos > found_pos
+                and handler_idx != NO_HANDLER
+                and (
+                    new_pos == end
+                    or search_key.startswith(separator, new_pos)
+                    or search_key.endswith(separator, 0, new_pos)
+                )
+            ):
+                found, found_pos, found_captures = idx, new_pos, list(captures)
+            if new_pos < end:
+                depth = len(captures)
+                stack.extend(
+                    (child, new_pos, depth)
+                    for child in reversed(
+                        self._candidates(children_index, static_count, dynamic_count, search_key, new_pos)
+                    )
+                )
+
+        context = self._capture_map(encoded, search_key, found_captures)
+        return self._handler(found if found != -1 else 0), context
+
+    def _routes(self, prefix: bytes) -> Iterator[tuple[bytes, int]]:
+        """
+        Yields `(route, node index)` for the nodes holding a handler whose route starts
+        with `prefix`, in lexicographic order (see `node.iter_routes`).
+        """
+        labels: list[bytes] = []
+        stack: list[tuple[int, int, bytes]] = [(0, 0, prefix)]
+        while stack:
+            idx, depth, remaining = stack.pop()
+            del labels[depth:]
+            (
+                _,
+                static_count,
+                dynamic_count,
+                label_off,
+                label_len,
+                *_,
+                children_index,
+                handler_idx,
+            ) = self._node(idx)
+            label = self._string(label_off, label_len)
+            if remaining:
+                if label.startswith(remaining):
+                    remaining = b""
+                elif remaining.startswith(label):
+                    remaining = remaining[len(label) :]
+                else:
+                    continue
+            labels.append(label)
+
+            if not remaining and handler_idx != NO_HANDLER and idx != 0:
+                yield b"".join(labels), idx
+            if static_count or dynamic_count:
+                depth = len(labels)
+                children = [
+                    self._child(child)
+                    for child in range(children_index, children_index + static_count + dynamic_count)
+                ]
+                # UTF-8 sorts like the text it encodes: routes come out in the order `Tree.keys` uses
+                children.sort(key=self._label, reverse=True)
+                stack.extend((child, depth, remaining) for child in children)
+
+    def _label(self, idx: int) -> bytes:
+        record = self._node(idx)
+        return self._string(record[3], record[4])
+
+    def keys(self, prefix: str = "", limit: int | None = None) -> Iterator[str]:
+        """Yields the routes that start with `prefix`, as `Tree.keys` does"""
+        for route, _ in self.items(prefix=prefix, limit=limit):
+            yield route
+
+    def values(self, prefix: str = "", limit: int | None = None) -> Iterator[Any]:
+        """Yields the handlers of the routes that start with `prefix` (see `Tree.keys`)"""
+        for _, handler in self.items(prefix=prefix, limit=limit):
+            yield handler
+
+    def items(self, prefix: str = "", limit: int | None = None) -> Iterator[tuple[str, Any]]:
+        """
+        Yields `(route, handler)` for the routes that start with `prefix`, as
+        `Tree.items` does. Only the current branch is read from the buffer.
+
+        Args:
+            prefix (str): Only yield routes starting with this text.
+            limit (int): Yield at most this many routes.
+        """
+        if limit is not None and limit < 0:
+            raise ValueError("`limit` must not be negative")
+        stored = node.static_label(prefix, self.raw_bytes, self.case_insensitive)
+        encoded = stored if isinstance(stored, bytes) else stored.encode("utf-8")
+        for raw_route, idx in itertools.islice(self._routes(encoded), limit):
+            route = raw_route.decode("utf-8")
+            if self.raw_bytes:
+                # static parts are stored percent-encoded
+                route = "".join(
+                    part.raw if isinstance(part, utils.DynamicParseNode) else unquote(part)
+                    for part in utils.parse_dynamic(route, self.separator)
+                )
+            yield route, self._handler(idx)
+
+    def insert(self, path: str, handler: Any) -> None:
+        raise TypeError("A PackedTree is read-only")
+
+    def unpack(self) -> node.RadixNode:
+        """
+        Rebuilds the nodes of this tree (the inverse of `pack_tree`), with their
+        handlers taken from the handler table, and returns the root.
+        """
+        # Children come after their parent in depth-first order, so building the
+        # nodes from last to first means each node's children already exist
+        nodes: list[node.RadixNode] = [None] * self.node_count  # type: ignore[list-item]
+        for idx in range(self.node_count - 1, -1, -1):
+            (
+                kind,
+                static_count,
+                dynamic_count,
+                label_off,
+                label_len,
+                name_off,
+                name_len,
+                regex_off,
+                regex_len,
+                children_index,
+                _,
+            ) = self._node(idx)
+            count = static_count + dynamic_count
+            children = (
+                node.NodeChildSet(
+                    nodes[self._child(child)] for child in range(children_index, children_index + count)
+                )
+                if count
+                else None
+            )
+            label = self._string(label_off, label_len)
+            handler = self._handler(idx)
+            if idx == 0:
+                nodes[idx] = node.RadixNode(
+                    label if self.raw_bytes else label.decode("utf-8"),  # type: ignore
+                    children=children,
+                    handler=handler,
+                )
+            elif kind == KIND_DYNAMIC:
+                parser = utils.DynamicParseNode(label.decode("utf-8"), self._name(name_off, name_len))
+                # stored as parsed (and hardened) when the route was inserted
+                parser.regex = self._string(regex_off, regex_len).decode("utf-8")
+                pattern = (
+                    parser.compile(self.raw_bytes, self.case_insensitive)
+                    if self.raw_bytes or self.case_insensitive
+                    else None
+                )
+                nodes[idx] = node.DynamicNode(parser, children=children, handler=handler, pattern=pattern)
+            else:
+                nodes[idx] = node.StaticNode(
+                    label if self.raw_bytes else label.decode("utf-8"), children=children, handler=handler
+                )
+        return nodes[0]
+
+    def release(self) -> None:
+        """Releases the underlying buffer (required before closing shared memory)"""
+        self._buf.release()
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)  # type: ignore
+    # Before Python 3.13 attaching always registers the segment with the resource
+    # tracker. Worker processes started by `multiprocessing` share their parent's
+    # tracker, where registering an already-registered segment has no effect.
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedRouteTable:
+    """
+    A packed tree in a `multiprocessing.shared_memory` segment.
+
+    Create the table once in the parent process, then attach to it by name in each
+    worker. Only the process that created the segment should `unlink` it. Workers
+    should be started by the creating process (as pre-fork servers do), so that they
+    share its `multiprocessing` resource tracker on Python versions before 3.13.
+
+    Example:
+
+        # parent
+        table = SharedRouteTable.create(router.tree, handlers=router.routes)
+        # each worker, with the same routes in the same order
+        table = SharedRouteTable.attach(name, handlers=routes)
+        router = AsgiRouter.from_route_table(table)
+
+    Args:
+        shm (SharedMemory): The shared memory segment holding the packed tree.
+        handlers (Sequence[Any]): This process' handler table.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, handlers: Sequence[Any]):
+        self.shm = shm
+        self.handlers = handlers
+        self.tree = PackedTree(shm.buf, handlers)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def create(
+        cls,
+        route_tree: "tree.Tree",
+        handlers: Sequence[Any] | None = None,
+        name: str | None = None,
+    ) -> "SharedRouteTable":
+        """Packs `route_tree` into a new shared memory segment"""
+        data, handler_table = pack_tree(route_tree, handlers=handlers)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        cast(memoryview, shm.buf)[: len(data)] = data
+        return cls(shm, handler_table)
+
+    @classmethod
+    def attach(cls, name: str, handlers: Sequence[Any]) -> "SharedRouteTable":
+        """Attaches to a segment created by `SharedRouteTable.create` in another process"""
+        return cls(_attach_shared_memory(name), handlers)
+
+    def close(self) -> None:
+        """Detaches this process from the segment"""
+        self.tree.release()
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """Destroys the segment: call once, from the creating process"""
+        self.shm.unlink()
+
+
+def _encode_value(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    raise PackedTreeError(f"Cannot store handler without an `encode` function: {value!r}")
+
+
+def write_tree_file(
+    route_tree: "tree.Tree",
+    path: str | os.PathLike,
+    encode: Callable[[Any], bytes] | None = None,
+) -> None:
+    """
+    Writes `route_tree` to an immutable file that `MappedTree` searches in place.
+
+    Handlers are stored as byte strings in a values section, each distinct value
+    once. The file is written under a temporary name and then renamed to `path`, so
+    processes that have the previous file mapped keep reading it unchanged.
+
+    Args:
+        route_tree (Tree): The tree to write.
+        path (str | PathLike): Where to write it.
+        encode (Callable): Converts a handler to bytes. By default, handlers must be
+            `bytes` or `str` (stored as UTF-8).
+    """
+    data, handlers = pack_tree(route_tree)
+    encode = encode or _encode_value
+    records = bytearray()
+    values = bytearray()
+    offsets: dict[bytes, int] = {}
+    for handler in handlers:
+        value = encode(handler)
+        offset = offsets.get(value)
+        if offset is None:
+            offset = offsets[value] = len(values)
+            values.extend(value)
+        records.extend(VALUE.pack(offset, len(value)))
+    header = FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, len(route_tree), len(handlers), len(data))
+
+    tmp_path = f"{os.fspath(path)}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as fl:
+            fl.write(header)
+            fl.write(data)
+            fl.write(records)
+            fl.write(values)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class _ValueTable(Sequence):
+    """The handler table of a `MappedTree`: values are read from the file on access"""
+
+    __slots__ = ["_buf", "_records_offset", "_values_offset", "_count", "_decode"]
+
+    def __init__(
+        self, buffer: memoryview, offset: int, count: int, decode: Callable[[bytes], Any] | None
+    ):
+        self._buf = buffer
+        self._records_offset = offset
+        self._values_offset = offset + count * VALUE.size
+        self._count = count
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, idx: int) -> Any:  # type: ignore[override]
+        if not 0 <= idx < self._count:
+            raise IndexError(idx)
+        offset, length = VALUE.unpack_from(self._buf, self._records_offset + idx * VALUE.size)
+        start = self._values_offset + offset
+        value = bytes(self._buf[start : start + length])
+        return self._decode(value) if self._decode is not None else value
+
+
+class MappedTree(PackedTree):
+    """
+    Searches a file written by `write_tree_file` through `mmap`, without loading it.
+
+    Opening the file reads only its header: the operating system pages the rest in
+    as lookups touch it, and processes that map the same file share those pages.
+    Handlers are the byte strings stored in the file, or what `decode` makes of them.
+    As with any lookup, a falsy value counts as a miss in `get_handler`.
+
+    Example:
+
+        write_tree_file(shard_map, "shards.tkrt", encode=str.encode)
+        with MappedTree("shards.tkrt", decode=bytes.decode) as shards:
+            shard, _ = shards.longest_prefix("/tenants/acme/invoices/7")
+            # shard is a name such as "eu-1", or None when no route covers the path
+
+    Values that decode to something falsy (such as `0` with `decode=int`) are found by
+    `longest_prefix` and `items`: compare what they return with `None`, not its truth.
+
+    Args:
+        path (str | PathLike): The file to map.
+        decode (Callable): Converts the stored bytes of a handler when it's read.
+    """
+
+    def __init__(self, path: str | os.PathLike, decode: Callable[[bytes], Any] | None = None):
+        with open(path, "rb") as fl:
+            size = os.fstat(fl.fileno()).st_size
+            if size < FILE_HEADER.size:
+                raise PackedTreeError(f"Not a tree file: {os.fspath(path)}")
+            self._mmap = mmap.mmap(fl.fileno(), 0, access=mmap.ACCESS_READ)
+        self._file = memoryview(self._mmap)
+        magic, version, self.route_count, value_count, tree_length = FILE_HEADER.unpack_from(
+            self._file, 0
+        )
+        values_offset = FILE_HEADER.size + tree_length
+        if magic != FILE_MAGIC:
+            error = f"Not a tree file: {os.fspath(path)}"
+        elif version != FILE_VERSION:
+            error = f"Unsupported tree file version: {version}"
+        elif values_offset + value_count * VALUE.size > size:
+            error = f"Truncated tree file: {os.fspath(path)}"
+        else:
+            error = ""
+        if error:
+            self._close_file()
+            raise PackedTreeError(error)
+
+        handlers = _ValueTable(self._file, values_offset, value_count, decode)
+        tree_buffer = self._file[FILE_HEADER.size : values_offset]
+        try:
+            super().__init__(tree_buffer, handlers)
+        except PackedTreeError:
+            # every view of the map must be released before it can be closed
+            if hasattr(self, "_buf"):
+                self._buf.release()
+            tree_buffer.release()
+            self._close_file()
+            raise
+        tree_buffer.release()
+
+    def __len__(self) -> int:
+        return self.route_count
+
+    def __enter__(self) -> "MappedTree":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _close_file(self) -> None:
+        self._file.release()
+        self._mmap.close()
+
+    def close(self) -> None:
+        """Unmaps the file: the tree can't be searched afterwards"""
+        self.release()
+        self._close_file()
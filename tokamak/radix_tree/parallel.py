@@ -0,0 +1,124 @@
+"""
+Building large trees on several processes.
+
+Inserting a route parses it and walks the tree, all in Python, so building a tree
+of millions of routes takes minutes on one core. `build_tree` spreads that work:
+
+  1. Routes are sorted and cut into contiguous ranges, so that each partition
+     holds routes sharing their leading characters.
+  2. Each partition is built into a tree of its own in a worker process, and sent
+     back packed (see `tokamak.radix_tree.packed`): a few bytes per node instead of
+     a pickled object graph. Handlers stay in the parent: workers only see paths.
+  3. The parent unpacks each subtree and grafts it under the root as it arrives.
+     Partitions only overlap at the edges of their ranges, so grafting only walks
+     the few nodes they share near the top.
+
+Unpacking and grafting happen in the parent, one partition at a time, and are
+much cheaper than inserting: they bound the speedup more cores can bring.
+"""
+import os
+from collections.abc import Iterable, Mapping
+from concurrent.futures import Executor, ProcessPoolExecutor
+from operator import itemgetter
+from typing import Any
+
+from . import node, packed
+from .tree import Tree
+
+PARTITIONS_PER_WORKER = 4
+
+
+def _build_partition(
+    paths: list[str], start: int, options: dict[str, Any]
+) -> tuple[bytes, list[int], int]:
+    """
+    Runs in a worker: builds a tree of `paths`, using their positions (from `start`)
+    as handlers, and returns it packed with its handler table and route count.
+    """
+    partition = Tree(**options)
+    for idx, path in enumerate(paths, start):
+        partition.insert(path, idx)
+    data, handlers = packed.pack_tree(partition)
+    return data, handlers, len(partition)
+
+
+def build_tree(
+    routes: Mapping[str, Any] | Iterable[tuple[str, Any]],
+    workers: int | None = None,
+    executor: Executor | None = None,
+    **options: Any,
+) -> Tree:
+    """
+    Builds a `Tree` of `routes` on several processes. The result is the same as
+    inserting each route in turn.
+
+    Example:
+
+        routes = {f"/files/{name}": shard for name, shard in manifest}
+        tree = build_tree(routes, workers=8, case_insensitive=True)
+
+    Args:
+        routes: Paths and their handlers, as a mapping or as pairs.
+        workers (int): How many processes to use (by default, one per CPU). With a
+            single worker, routes are inserted in this process.
+        executor (Executor): Run partitions on this executor instead of a new
+            `ProcessPoolExecutor` (for instance, one using another start method).
+        options: Passed on to `Tree`.
+    """
+    new_tree = Tree(**options)
+    # Sort by each route as the tree stores it, so that spellings of the same route
+    # ("/a" and "/a/" with relaxed trailing slashes, "/a" and "/A" in case-insensitive
+    # trees) are adjacent
+    keyed = []
+    for path, handler in routes.items() if isinstance(routes, Mapping) else routes:
+        stored = node.tree_path(new_tree._route_path(path), new_tree.raw_bytes, new_tree.case_insensitive)
+        keyed.append((stored, path, handler))
+    keyed.sort(key=itemgetter(0))
+    # Inserting a route again with the same handler changes nothing: drop repeats
+    # before workers see them with different positions
+    pairs = [
+        (path, handler)
+        for idx, (stored, path, handler) in enumerate(keyed)
+        if not idx or (stored, handler) != (keyed[idx - 1][0], keyed[idx - 1][2])
+    ]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 and executor is None:
+        for path, handler in pairs:
+            new_tree.insert(path, handler)
+        return new_tree
+
+    # Workers only need what decides the shape of the tree
+    shape = {
+        "separator": new_tree.separator,
+        "trailing_slash_match": new_tree.trailing_slash_match,
+        "raw_bytes": new_tree.raw_bytes,
+        "case_insensitive": new_tree.case_insensitive,
+    }
+    paths = [path for path, _ in pairs]
+    handlers = [handler for _, handler in pairs]
+    partitions = max(1, min(len(paths), workers * PARTITIONS_PER_WORKER))
+    bounds = [len(paths) * idx // partitions for idx in range(partitions + 1)]
+
+    pool = executor if executor is not None else ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            pool.submit(_build_partition, paths[start:end], start, shape)
+            for start, end in zip(bounds, bounds[1:], strict=False)
+        ]
+        root = new_tree._root
+        for future in futures:
+            data, table, count = future.result()
+            subtree = packed.PackedTree(data, [handlers[idx] for idx in table]).unpack()
+            conflicts, shared = node.merge_tree(root, subtree, consume=True)
+            if conflicts:
+                raise ValueError(f"Duplicate route with different handlers: {conflicts[0]}")
+            new_tree._count += count - shared
+    finally:
+        if executor is None:
+            pool.shutdown(cancel_futures=True)
+
+    if new_tree.prefilter is not None:
+        for path in paths:
+            new_tree._add_to_prefilter(new_tree._route_path(path))
+    return new_tree
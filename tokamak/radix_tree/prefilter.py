@@ -0,0 +1,195 @@
+"""
+A negative-lookup prefilter for route trees.
+
+Scanners probe servers with many random paths (`/wp-admin/setup.php`, `/.env`, ...)
+and each of them walks the tree before failing. A `Prefilter` is built as routes
+are inserted and rejects, in constant time, most paths that cannot match any route:
+
+  - a set of every valid first segment (`repos` for `/repos/{owner}`), then
+  - a Bloom filter over the first two segments of routes whose first two
+    segments are static (`repos/{owner}` is dynamic, so `repos` is left "open").
+
+A prefilter never rejects a path that could match: a Bloom filter may answer
+"maybe" for a path that isn't there (a false positive, which just means we search
+the tree as usual), but never "no" for a key that was added.
+"""
+import math
+from typing import Any
+
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+DEFAULT_CAPACITY = 1024
+PARAM_START = "{"
+
+
+class BloomFilter:
+    """
+    A scalable Bloom filter.
+
+    It starts with room for `capacity` keys at the requested false-positive rate.
+    Whenever it fills up, a new filter with twice the capacity (and half the
+    false-positive rate) is added, so the overall rate stays below the one
+    requested however many keys are added.
+
+    Keys may be `str` or `bytes`. Positions are derived from Python's `hash`, so
+    a filter is only meaningful inside the process that built it. `count` (and
+    `len`) skips keys that are already in the filter, or appear to be.
+
+    Args:
+        capacity (int): Number of keys the first filter is sized for.
+        false_positive_rate (float): Target probability of a false positive.
+    """
+
+    __slots__ = ["false_positive_rate", "count", "_filters"]
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+    ):
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("`false_positive_rate` must be between 0 and 1")
+        if capacity < 1:
+            raise ValueError("`capacity` must be positive")
+        self.false_positive_rate = false_positive_rate
+        self.count = 0
+        # (bits, bit_count, hash_count, capacity) for each filter
+        self._filters: list[tuple[bytearray, int, int, int]] = []
+        # The rates of successive filters form a geometric series summing to the target
+        self._add_filter(capacity, false_positive_rate / 2)
+
+    def _add_filter(self, capacity: int, rate: float) -> None:
+        bit_count = max(8, math.ceil(-capacity * math.log(rate) / math.log(2) ** 2))
+        hash_count = max(1, round(bit_count / capacity * math.log(2)))
+        self._filters.append((bytearray((bit_count + 7) // 8), bit_count, hash_count, capacity))
+
+    @staticmethod
+    def _positions(key: Any, bit_count: int, hash_count: int) -> list[int]:
+        # double hashing: the two halves of one 64-bit hash give every position
+        value = hash(key) & 0xFFFFFFFFFFFFFFFF
+        first = value & 0xFFFFFFFF
+        step = (value >> 32) | 1
+        return [(first + idx * step) % bit_count for idx in range(hash_count)]
+
+    def add(self, key: str | bytes) -> None:
+        if key in self:
+            return None
+        bits, bit_count, hash_count, capacity = self._filters[-1]
+        if self.count >= sum(flt[3] for flt in self._filters):
+            self._add_filter(capacity * 2, self.false_positive_rate / 2 ** (len(self._filters) + 1))
+            bits, bit_count, hash_count, _ = self._filters[-1]
+        for pos in self._positions(key, bit_count, hash_count):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+        return None
+
+    def __contains__(self, key: Any) -> bool:
+        for bits, bit_count, hash_count, _ in self._filters:
+            for pos in self._positions(key, bit_count, hash_count):
+                if not bits[pos >> 3] & (1 << (pos & 7)):
+                    break
+            else:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(len(flt[0]) for flt in self._filters)
+
+
+class Prefilter:
+    """
+    Rejects paths that cannot match any route of a tree.
+
+    Keys are taken from paths as they are stored in the tree: pass case-folded
+    paths to a case-insensitive tree's prefilter, and raw `bytes` paths to the
+    prefilter of a tree matching raw paths.
+
+    `lookups` and `rejected` count calls to `may_match` and how many of them
+    were short-circuited. They are not synchronized between threads, so treat
+    them as approximate when looking up from several threads.
+
+    Args:
+        separator (str): The tree's path separator.
+        false_positive_rate (float): Target false-positive rate of the Bloom filter.
+        raw_bytes (bool): Keys are raw path `bytes` instead of strings.
+    """
+
+    __slots__ = [
+        "separator",
+        "first_segments",
+        "open_segments",
+        "prefixes",
+        "all_open",
+        "lookups",
+        "rejected",
+    ]
+
+    def __init__(
+        self,
+        separator: str = "/",
+        false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+        raw_bytes: bool = False,
+    ):
+        self.separator: Any = separator.encode("ascii") if raw_bytes else separator
+        self.first_segments: set[Any] = set()
+        # first segments followed by a dynamic second segment: the Bloom filter can't help
+        self.open_segments: set[Any] = set()
+        self.prefixes = BloomFilter(false_positive_rate=false_positive_rate)
+        # a dynamic first segment means any path may match
+        self.all_open = False
+        self.lookups = 0
+        self.rejected = 0
+
+    def _keys(self, path: Any) -> tuple[Any, Any]:
+        """The first segment of `path` and its first two segments (without the leading separator)"""
+        sep = self.separator
+        n = len(sep)
+        first_end = path.find(sep, n)
+        if first_end == -1:
+            first = path[n:]
+            return first, first
+        second_end = path.find(sep, first_end + n)
+        if second_end == -1:
+            return path[n:first_end], path[n:]
+        return path[n:first_end], path[n:second_end]
+
+    def add(self, path: str | bytes) -> None:
+        """
+        Adds a route path. Static parts must be written as they are stored in the tree;
+        dynamic parameters keep their `{name}` syntax.
+        """
+        param: Any = PARAM_START.encode("ascii") if isinstance(path, bytes) else PARAM_START
+        first, prefix = self._keys(path)
+        if param in first:
+            self.all_open = True
+            return None
+        self.first_segments.add(first)
+        if param in prefix:
+            self.open_segments.add(first)
+        else:
+            self.prefixes.add(prefix)
+        return None
+
+    def may_match(self, path: Any) -> bool:
+        """Returns False only if `path` cannot match any route that was added"""
+        self.lookups += 1
+        if self.all_open:
+            return True
+        if not path.startswith(self.separator):
+            self.rejected += 1
+            return False
+        first, prefix = self._keys(path)
+        if first not in self.first_segments:
+            self.rejected += 1
+            return False
+        if first in self.open_segments or prefix in self.prefixes:
+            return True
+        self.rejected += 1
+        return False
+
+    def reset_counters(self) -> None:
+        self.lookups = 0
+        self.rejected = 0
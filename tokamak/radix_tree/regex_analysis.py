@@ -0,0 +1,346 @@
+"""
+Finding nested quantifiers in parameter regexes, and hardening them (see
+`limits.harden_regex`).
+
+The analysis works on regexes parsed by CPython's own (private) regex parser, so
+this module is only imported when a regex is first hardened: other Python
+implementations, or future versions without that parser, just leave regexes as
+they are.
+"""
+import re
+import re._constants as sre_constants  # type: ignore
+import re._parser as sre_parse  # type: ignore
+from typing import Any
+
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+# Escapes that may span more than two characters or refer to groups: we don't tokenize them
+_UNSUPPORTED_ESCAPES = "xuUNgpP0123456789"
+_BOUNDED_REPEAT = re.compile(r"\{(?=,?\d)(\d*)(,?)(\d*)\}")
+# Character ranges larger than this are never expanded when comparing character sets
+_MAX_RANGE = 1024
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: re.compile(r"\d"),
+    sre_constants.CATEGORY_NOT_DIGIT: re.compile(r"\D"),
+    sre_constants.CATEGORY_SPACE: re.compile(r"\s"),
+    sre_constants.CATEGORY_NOT_SPACE: re.compile(r"\S"),
+    sre_constants.CATEGORY_WORD: re.compile(r"\w"),
+    sre_constants.CATEGORY_NOT_WORD: re.compile(r"\W"),
+}
+_DISJOINT_CATEGORIES = {
+    frozenset((sre_constants.CATEGORY_DIGIT, sre_constants.CATEGORY_NOT_DIGIT)),
+    frozenset((sre_constants.CATEGORY_DIGIT, sre_constants.CATEGORY_SPACE)),
+    frozenset((sre_constants.CATEGORY_DIGIT, sre_constants.CATEGORY_NOT_WORD)),
+    frozenset((sre_constants.CATEGORY_SPACE, sre_constants.CATEGORY_NOT_SPACE)),
+    frozenset((sre_constants.CATEGORY_SPACE, sre_constants.CATEGORY_WORD)),
+    frozenset((sre_constants.CATEGORY_WORD, sre_constants.CATEGORY_NOT_WORD)),
+}
+
+
+def _subpatterns(op: Any, av: Any) -> list[Any]:
+    """The parsed subpatterns nested in one parsed item"""
+    if op in _REPEATS or op is sre_constants.POSSESSIVE_REPEAT:
+        return [av[2]]
+    if op is sre_constants.SUBPATTERN:
+        return [av[3]]
+    if op is sre_constants.BRANCH:
+        return list(av[1])
+    if op is sre_constants.ATOMIC_GROUP:
+        return [av]
+    if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return [av[1]]
+    return []
+
+
+def _contains_repeat(parsed: Any) -> bool:
+    """Whether a parsed pattern contains a quantifier that may repeat more than once"""
+    for op, av in parsed:
+        if op in _REPEATS and av[1] > 1:
+            return True
+        if any(_contains_repeat(sub) for sub in _subpatterns(op, av)):
+            return True
+    return False
+
+
+def _has_nested_repeat(parsed: Any) -> bool:
+    for op, av in parsed:
+        if op in _REPEATS and av[1] > 1 and _contains_repeat(av[2]):
+            return True
+        if op is sre_constants.ATOMIC_GROUP:
+            # an atomic group never backtracks into its contents once it has matched
+            continue
+        if any(_has_nested_repeat(sub) for sub in _subpatterns(op, av)):
+            return True
+    return False
+
+
+def has_nested_quantifiers(regex: str) -> bool:
+    """
+    Whether `regex` repeats something that itself contains a repeat, such as
+    `(a+)+` or `(\\w+\\s?)*`: on an input that almost matches, the regex engine
+    tries every way of splitting the input between the two quantifiers.
+    """
+    return _has_nested_repeat(sre_parse.parse(regex))
+
+
+def _class_end(regex: str, start: int) -> int:
+    """The index just past the character class opening at `start`, or -1"""
+    idx = start + 1
+    if regex[idx : idx + 1] == "^":
+        idx += 1
+    if regex[idx : idx + 1] == "]":
+        idx += 1
+    while idx < len(regex):
+        if regex[idx] == "\\":
+            idx += 2
+            continue
+        if regex[idx] == "]":
+            return idx + 1
+        idx += 1
+    return -1
+
+
+def _group_end(regex: str, start: int) -> int:
+    """The index just past the group opening at `start`, or -1"""
+    depth = 0
+    idx = start
+    while idx < len(regex):
+        char = regex[idx]
+        if char == "\\":
+            idx += 2
+            continue
+        if char == "[":
+            idx = _class_end(regex, idx)
+            if idx == -1:
+                return -1
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return idx + 1
+        idx += 1
+    return -1
+
+
+def _top_level_items(regex: str) -> list[tuple[str, str]] | None:
+    """
+    Splits `regex` into its top-level `(atom, quantifier)` items, or returns None
+    if it uses syntax we don't tokenize (top-level alternation, numbered escapes, ...).
+    """
+    items: list[tuple[str, str]] = []
+    idx = 0
+    while idx < len(regex):
+        char = regex[idx]
+        if char == "|":
+            return None
+        if char == "\\":
+            if regex[idx + 1 : idx + 2] in ("", *_UNSUPPORTED_ESCAPES):
+                return None
+            end = idx + 2
+        elif char == "[":
+            end = _class_end(regex, idx)
+        elif char == "(":
+            end = _group_end(regex, idx)
+        elif char in "*+?{)":
+            return None
+        else:
+            end = idx + 1
+        if end == -1:
+            return None
+        atom = regex[idx:end]
+
+        idx = end
+        if regex[idx : idx + 1] in ("*", "+", "?"):
+            idx += 1
+        elif repeat := _BOUNDED_REPEAT.match(regex, idx):
+            idx = repeat.end()
+        if idx > end and regex[idx : idx + 1] in ("?", "+"):
+            idx += 1  # lazy or possessive
+        items.append((atom, regex[end:idx]))
+    return items
+
+
+def _charset(op: Any, av: Any) -> tuple[bool, list[Any]] | None:
+    """A single-character matcher as `(negated, [(op, av), ...])`, or None for anything else"""
+    if op is sre_constants.LITERAL:
+        return False, [(op, av)]
+    if op is sre_constants.NOT_LITERAL:
+        return True, [(sre_constants.LITERAL, av)]
+    if op is sre_constants.ANY:
+        return True, [(sre_constants.LITERAL, ord("\n"))]
+    if op is sre_constants.IN:
+        if av and av[0][0] is sre_constants.NEGATE:
+            return True, list(av[1:])
+        return False, list(av)
+    return None
+
+
+def _member(items: list[Any], char: str) -> bool:
+    code = ord(char)
+    for op, av in items:
+        if op is sre_constants.LITERAL and av == code:
+            return True
+        if op is sre_constants.RANGE and av[0] <= code <= av[1]:
+            return True
+        if op is sre_constants.CATEGORY and _CATEGORIES[av].match(char):
+            return True
+    return False
+
+
+def _materialize(items: list[Any]) -> set[str] | None:
+    """
+    Every character in a set of literals and (small) ranges, with its other case,
+    since case-insensitive trees compile patterns with IGNORECASE. None if that's
+    not practical.
+    """
+    chars: set[str] = set()
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            codes = range(av, av + 1)
+        elif op is sre_constants.RANGE and av[1] - av[0] < _MAX_RANGE:
+            codes = range(av[0], av[1] + 1)
+        else:
+            return None
+        for code in codes:
+            chars.update((chr(code), chr(code).lower(), chr(code).upper()))
+    return chars
+
+
+def _disjoint(left: tuple[bool, list[Any]], right: tuple[bool, list[Any]]) -> bool:
+    """Whether two single-character matchers can't match the same character. False when unsure."""
+    if left[0] and right[0]:
+        return False
+    if left[0]:
+        left, right = right, left
+    items, (negated, other_items) = left[1], right
+    if any(op is sre_constants.CATEGORY and av not in _CATEGORIES for op, av in items + other_items):
+        return False
+
+    chars = _materialize(items)
+    if negated:
+        # every character that `left` matches must be excluded by `right`
+        return chars is not None and all(_member(other_items, char) for char in chars)
+    if chars is not None:
+        return not any(_member(other_items, char) for char in chars)
+    other_chars = _materialize(other_items)
+    if other_chars is not None:
+        return not any(_member(items, char) for char in other_chars)
+    if all(op is sre_constants.CATEGORY for op, _ in items + other_items):
+        return all(
+            frozenset((one, two)) in _DISJOINT_CATEGORIES for _, one in items for _, two in other_items
+        )
+    return False
+
+
+def _sequence(parsed: Any) -> list[tuple[tuple[bool, list[Any]], int, int]] | None:
+    """
+    Flattens a parsed pattern into `(matcher, min, max)` elements: single-character
+    matchers, each optionally repeated greedily. Returns None for anything else
+    (alternation, lazy quantifiers, repeated groups, anchors, flags, ...).
+    """
+    elements: list[tuple[tuple[bool, list[Any]], int, int]] = []
+    for op, av in parsed:
+        if op is sre_constants.MAX_REPEAT:
+            low, high, sub = av
+            if len(sub) != 1 or (matcher := _charset(*sub[0])) is None:
+                return None
+            elements.append((matcher, low, high))
+        elif op is sre_constants.SUBPATTERN:
+            if av[1] or av[2]:
+                return None
+            inner = _sequence(av[3])
+            if inner is None:
+                return None
+            elements.extend(inner)
+        elif (matcher := _charset(op, av)) is not None:
+            elements.append((matcher, 1, 1))
+        else:
+            return None
+    return elements
+
+
+def _repeats_greedily(quantifier: str) -> bool:
+    """Whether a quantifier is greedy (backtracking) and may repeat more than once"""
+    if quantifier in ("", "?") or quantifier[-1] in "?+" and len(quantifier) > 1:
+        return False  # none, optional, lazy or already possessive
+    if quantifier in ("*", "+"):
+        return True
+    low, comma, high = _BOUNDED_REPEAT.fullmatch(quantifier).groups()  # type: ignore
+    if not comma:
+        return int(low) > 1
+    return not high or int(high) > 1
+
+
+def _is_safe_to_harden(atom: str, following: list[tuple[str, str]]) -> bool:
+    """
+    Making a repeated group atomic changes what a regex matches only if backtracking
+    into the group could let what follows it match, so it's always safe when nothing
+    follows the group. Otherwise we harden only when we can show that the first way
+    the group matches reaches as far as any other could:
+
+      - the group is followed by a required character that it can't match
+        (`([a-z]+-?)+/`), so any other way of matching it would stop earlier, and
+      - the group is a sequence of single-character matchers where nothing a repeat
+        gives back could be matched by what follows it, except by the same repeat
+        in the group's next repetition: `(\\w+\\s?)+.` or `(a+)+b`, but not
+        `(\\w+\\d?)+.` or `(a+b?a)+c`.
+    """
+    if not following:
+        return True
+    body = _sequence(sre_parse.parse(atom))
+    stop = _sequence(sre_parse.parse(following[0][0]))
+    if not body or sum(low for _, low, _ in body) == 0:
+        return False
+    if not stop or len(stop) != 1 or stop[0][1] < 1 or following[0][1] not in ("", "+"):
+        return False
+    if not all(_disjoint(matcher, stop[0][0]) for matcher, _, _ in body):
+        return False
+
+    # what may start the group's next repetition
+    starts: list[tuple[int, tuple[bool, list[Any]]]] = []
+    for idx, (matcher, low, _) in enumerate(body):
+        starts.append((idx, matcher))
+        if low:
+            break
+    for idx, (matcher, low, high) in enumerate(body):
+        if low == high:
+            continue
+        followers: list[tuple[int, tuple[bool, list[Any]]]] = []
+        for next_idx in range(idx + 1, len(body)):
+            followers.append((next_idx, body[next_idx][0]))
+            if body[next_idx][1]:
+                break
+        else:
+            followers.extend(starts)
+        for other_idx, other in followers:
+            if other_idx == idx and high is sre_constants.MAXREPEAT:
+                continue  # the next repetition would just split the same run differently
+            if not _disjoint(matcher, other):
+                return False
+    return True
+
+
+def harden(regex: str) -> str:
+    """
+    Returns `regex` with each top-level repeat containing nested quantifiers wrapped in
+    an atomic group, where that provably doesn't change what the regex matches.
+    Raises `re.error` for regexes it can't parse.
+    """
+    if not has_nested_quantifiers(regex):
+        return regex
+    result = regex
+    items = _top_level_items(regex)
+    if items is not None:
+        hardened: list[str] = []
+        for idx, (atom, quantifier) in enumerate(items):
+            text = atom + quantifier
+            if (
+                _repeats_greedily(quantifier)
+                and has_nested_quantifiers(text)
+                and _is_safe_to_harden(atom, items[idx + 1 :])
+            ):
+                text = f"(?>{text})"
+            hardened.append(text)
+        result = "".join(hardened)
+    return result
@@ -0,0 +1,257 @@
+"""
+Routing of topics (such as `orders.eu.created`) for in-process event dispatch.
+
+A `TopicTree` is a `Tree` whose keys are topics made of separator-delimited
+segments, with two wildcards:
+
+  - `*` matches exactly one segment: `orders.*.created` matches `orders.eu.created`.
+  - `#` matches any number of segments, including none, and may only be the last
+    segment: `orders.#` matches `orders`, `orders.eu` and `orders.eu.created`.
+
+Topics may also contain named parameters, which match up to the next separator:
+`orders.{region}.created`. Wildcards capture their values too, named after their
+position in the topic (`_1` for the second segment).
+
+Nodes don't backtrack into a parameter's match, which is why `#` must come last.
+"""
+import itertools
+import threading
+from collections.abc import Iterator
+from typing import Any
+
+from . import node, utils
+from .limits import LookupLimits
+from .tree import TrailingSlashMatch, Tree
+
+SINGLE_LEVEL = "*"
+MULTI_LEVEL = "#"
+
+
+def split_topic(topic: str, separator: str = ".") -> list[str]:
+    """Splits a topic into segments, leaving separators inside parameters alone"""
+    segments = []
+    depth = start = 0
+    idx = 0
+    while idx < len(topic):
+        char = topic[idx]
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif depth == 0 and topic.startswith(separator, idx):
+            segments.append(topic[start:idx])
+            idx += len(separator)
+            start = idx
+            continue
+        idx += 1
+    segments.append(topic[start:])
+    return segments
+
+
+class TopicTree(Tree):
+    """
+    A tree of topics with `*` (single-level) and `#` (multi-level) wildcards.
+
+    Example:
+
+        topics = TopicTree()
+        topics.insert("orders.*.created", on_order_created)
+        topics.insert("payments.#", audit)
+        handler, context = topics.get_handler("orders.eu.created")
+        # handler is on_order_created, context == {"_1": "eu"}
+
+    Exact segments are tried before parameters and wildcards. As with paths, the
+    first topic that matches is used, and the order in which sibling parameters and
+    wildcards (`orders.*` and `orders.#`) are tried is not specified.
+
+    As a mapping, the tree is keyed by topics: `topics["payments.#"]`, `list(topics)`
+    and `len(topics)` show the topics as they were inserted. The parent topics that
+    `#` topics also match (`payments` for `payments.#`) are not routes of their own.
+    Parameters named like wildcards (`{_1}` in the second segment) are shown as
+    wildcards.
+
+    Args:
+        separator (str): What separates the segments of a topic.
+        default_handler (Any): Handler returned when no topic matches.
+        thread_safe (bool): Copy-on-write inserts (see `Tree`).
+        case_insensitive (bool): Match topics regardless of case.
+        prefilter (bool): Reject topics whose first segment no route starts with
+            (see `tokamak.radix_tree.prefilter`).
+        limits (LookupLimits): Bounds on the work a single lookup may do.
+    """
+
+    def __init__(
+        self,
+        separator: str = ".",
+        default_handler: Any = None,
+        thread_safe: bool = False,
+        case_insensitive: bool = False,
+        prefilter: bool = False,
+        limits: LookupLimits | None = None,
+    ):
+        if not separator:
+            raise ValueError("Topic separator must not be empty")
+        super().__init__(
+            separator=separator,
+            default_handler=default_handler,
+            trailing_slash_match=TrailingSlashMatch.STRICT,
+            thread_safe=thread_safe,
+            case_insensitive=case_insensitive,
+            prefilter=prefilter,
+            limits=limits,
+        )
+        # Parents of `#` topics that were inserted only so that `#` matches zero segments.
+        # They aren't counted in `len()`, nor shown as keys.
+        self._implicit: set[str] = set()
+        self._topic_lock = threading.RLock()
+
+    def topic_path(self, topic: str) -> str:
+        """
+        Returns the path that `topic` is stored under: wildcards are replaced by
+        parameters and the separator is prepended.
+        """
+        segments = split_topic(topic, self.separator)
+        last = len(segments) - 1
+        for idx, segment in enumerate(segments):
+            if segment == SINGLE_LEVEL:
+                segments[idx] = f"{{_{idx}}}"
+            elif segment == MULTI_LEVEL:
+                if idx != last:
+                    raise ValueError(f"`{MULTI_LEVEL}` may only be the last segment of a topic: {topic}")
+                segments[idx] = f"{{_{idx}:.+}}"
+        return self.separator + self.separator.join(segments)
+
+    def _topic(self, route: str) -> str:
+        """The topic for a route as it is stored: the reverse of `topic_path`"""
+        segments = split_topic(route[len(self.separator) :], self.separator)
+        last = len(segments) - 1
+        for idx, segment in enumerate(segments):
+            if segment == f"{{_{idx}}}":
+                segments[idx] = SINGLE_LEVEL
+            elif idx == last and segment == f"{{_{idx}:.+}}":
+                segments[idx] = MULTI_LEVEL
+        return self.separator.join(segments)
+
+    def insert(self, topic: str, handler: Any) -> None:  # type: ignore[override]
+        """
+        Adds a handler for `topic`, which may contain wildcards and parameters.
+
+        A topic ending in `#` also matches its parent topic (`orders.#` matches
+        `orders`) unless that topic has a handler of its own, inserted before or after.
+        """
+        if handler is None:
+            raise ValueError(f"Missing handler for topic: {topic}")
+        path = self.topic_path(topic)
+        with self._topic_lock:
+            if path in self._implicit and not self.frozen:
+                # The parent of a `#` topic is now handled explicitly. Replacing a handler
+                # is a single assignment, so readers see either the old or the new one.
+                found = self._find(path)
+                if found is not None:
+                    found.handler = handler
+                self._implicit.discard(path)
+                self._count += 1
+                return None
+
+            super().insert(path, handler)
+            parent_path = self._multi_level_parent(topic)
+            if parent_path is not None and self._find(parent_path) is None:
+                super().insert(parent_path, handler)
+                self._implicit.add(parent_path)
+                self._count -= 1
+        return None
+
+    def _multi_level_parent(self, topic: str) -> str | None:
+        """The path of the parent topic that a `#` topic also matches, if any"""
+        parent, _, last = topic.rpartition(self.separator)
+        if last == MULTI_LEVEL and parent:
+            return self.topic_path(parent)
+        return None
+
+    def _topic_route(self, topic: str) -> str:
+        """The path of a topic that is a route of its own, or KeyError"""
+        try:
+            path = self.topic_path(topic)
+        except ValueError:
+            raise KeyError(topic) from None
+        if path in self._implicit:
+            raise KeyError(topic)
+        return path
+
+    def __getitem__(self, topic: str) -> Any:
+        """Returns the handler stored for `topic` (with its wildcards, as inserted)"""
+        try:
+            return super().__getitem__(self._topic_route(topic))
+        except KeyError:
+            raise KeyError(topic) from None
+
+    def __setitem__(self, topic: str, handler: Any) -> None:
+        """Stores `handler` for `topic`, replacing any handler it had (see `insert`)"""
+        if handler is None:
+            raise ValueError(f"Missing handler for topic: {topic}")
+        with self._topic_lock:
+            if topic not in self:
+                self.insert(topic, handler)
+                return None
+            super().__setitem__(self.topic_path(topic), handler)
+            parent_path = self._multi_level_parent(topic)
+            if parent_path is not None and parent_path in self._implicit:
+                # the parent matches on behalf of the `#` topic: it takes the new handler too
+                super().__setitem__(parent_path, handler)
+        return None
+
+    def __delitem__(self, topic: str) -> None:
+        """Removes `topic`, along with the parent topic it implicitly matched, if any"""
+        with self._topic_lock:
+            try:
+                super().__delitem__(self._topic_route(topic))
+            except KeyError:
+                raise KeyError(topic) from None
+            parent_path = self._multi_level_parent(topic)
+            if parent_path is not None and parent_path in self._implicit:
+                super().__delitem__(parent_path)
+                self._implicit.discard(parent_path)
+                # it wasn't counted
+                self._count += 1
+        return None
+
+    def items(  # type: ignore[override]
+        self, prefix: str = "", limit: int | None = None
+    ) -> Iterator[tuple[str, Any]]:
+        """
+        Yields `(topic, handler)` for the topics in this tree that start with `prefix`
+        (see `Tree.keys`). Topics of `case_insensitive` trees are case-folded.
+        """
+        if limit is not None and limit < 0:
+            raise ValueError("`limit` must not be negative")
+        implicit = {node.tree_path(path, case_insensitive=self.case_insensitive) for path in self._implicit}
+        routes = (
+            (self._topic(route), handler)
+            for route, handler in super().items(prefix=self.topic_path(prefix))
+            if route not in implicit
+        )
+        return itertools.islice(routes, limit)
+
+    def _find(self, path: str) -> node.RadixNode | None:
+        """The node holding a handler for the route `path` (not a topic), if any"""
+        stored = node.tree_path(path, case_insensitive=self.case_insensitive)
+        for result in self._root.prefix_search(stored):
+            if (
+                result.complete_match
+                and result.node is not self._root
+                and result.node.handler is not None
+            ):
+                return result.node
+        return None
+
+    def get_handler(self, topic: str) -> tuple[Any, utils.CaptureMap]:  # type: ignore[override]
+        """Returns the handler for `topic` and the values captured from it"""
+        return super().get_handler(self.separator + topic)
+
+    def iter_matches(self, topic: str) -> Iterator[tuple[Any, utils.CaptureMap]]:  # type: ignore[override]
+        """Yields `(handler, context)` for every topic pattern matching `topic`"""
+        return super().iter_matches(self.separator + topic)
+
+    def longest_prefix(self, topic: str) -> tuple[Any, utils.CaptureMap]:  # type: ignore[override]
+        """Returns the handler of the deepest topic pattern covering `topic`"""
+        return super().longest_prefix(self.separator + topic)
@@ -1,7 +1,17 @@
 import enum
+import itertools
+import os
+import sys
+import threading
+from collections import Counter
+from collections.abc import Iterator, Mapping, MutableMapping
+from operator import itemgetter
 from typing import Any
+from urllib.parse import unquote
 
-from . import node
+from . import codegen, node, utils
+from .limits import LimitAction, LookupLimitError, LookupLimits, PathTooLongError, SearchBudget
+from .prefilter import DEFAULT_FALSE_POSITIVE_RATE, Prefilter
 
 
 class TrailingSlashMatch(enum.Enum):
@@ -9,9 +19,138 @@ class TrailingSlashMatch(enum.Enum):
     RELAXED = 2
 
 
-class Tree:
+class TreeStats:
+    """
+    A structural report on a `Tree`, produced by `Tree.stats()`.
+
+    The root is counted in `node_count` (as `len(root)` does) but is neither static
+    nor dynamic, and its default handler is not counted in `handler_count`.
+
+    Depths count nodes below the root: a route stored on a child of the root has depth 1.
+    `mean_depth` is the mean depth of the nodes holding a handler (the routes), which
+    is roughly how many nodes a successful lookup visits.
+
+    `estimated_bytes` adds up `sys.getsizeof` for the nodes, their child sets and their
+    labels (each shared label is counted once). It leaves out handlers and compiled
+    regexes, so treat it as a trend to watch rather than an exact figure.
+    """
+
+    __slots__ = [
+        "node_count",
+        "leaf_count",
+        "handler_count",
+        "static_count",
+        "dynamic_count",
+        "max_depth",
+        "mean_depth",
+        "fanout",
+        "regex_count",
+        "estimated_bytes",
+    ]
+
+    def __init__(
+        self,
+        node_count: int,
+        leaf_count: int,
+        handler_count: int,
+        static_count: int,
+        dynamic_count: int,
+        max_depth: int,
+        mean_depth: float,
+        fanout: dict[int, int],
+        regex_count: int,
+        estimated_bytes: int,
+    ):
+        self.node_count = node_count
+        self.leaf_count = leaf_count
+        self.handler_count = handler_count
+        self.static_count = static_count
+        self.dynamic_count = dynamic_count
+        self.max_depth = max_depth
+        self.mean_depth = mean_depth
+        # number of children -> number of nodes with that many children
+        self.fanout = fanout
+        self.regex_count = regex_count
+        self.estimated_bytes = estimated_bytes
+
+    def as_dict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class RouteDiff:
+    """
+    The changes that turn one set of routes into another, produced by `Tree.diff`
+    and applied with `Tree.apply`. Routes are written as `Tree.keys` lists them.
+
+    `added` maps new routes to their handlers, `removed` maps the routes that are
+    gone to the handlers they had, and `changed` maps the routes whose handler
+    changed to `(old handler, new handler)`.
+    """
+
+    __slots__ = ["added", "removed", "changed"]
+
+    def __init__(
+        self,
+        added: dict[str, Any] | None = None,
+        removed: dict[str, Any] | None = None,
+        changed: dict[str, tuple[Any, Any]] | None = None,
+    ):
+        self.added = added if added is not None else {}
+        self.removed = removed if removed is not None else {}
+        self.changed = changed if changed is not None else {}
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __len__(self) -> int:
+        """The number of routes that differ"""
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Tree(MutableMapping):
     """
     Radix Tree class
+
+    A tree is also a mapping of routes (such as `/users/{id}`) to their handlers:
+    `tree[route]` finds a route exactly, without matching parameters, `del tree[route]`
+    removes one, and `len(tree)` (the number of routes) is kept up to date. Trees
+    compare equal by their routes, so they are not hashable; an empty tree is still truthy.
+
+    With `thread_safe=True`, lookups may run from any number of threads while
+    other threads insert (including on free-threaded builds of Python). Writers
+    never modify nodes that readers can see: each insert copies the nodes along
+    its path, inserts into the copy, and publishes the new root with a single
+    reference assignment. Readers take no locks; writers serialize on a lock.
+
+    Args:
+        separator (str): The path separator. Parameters without a regex match up to it.
+        default_handler (Any): Handler returned when no path matches.
+        trailing_slash_match (TrailingSlashMatch): Strictness property for trailing slashes
+        thread_safe (bool): Copy-on-write inserts so that concurrent readers always see
+            a complete tree.
+        raw_bytes (bool): Match raw, percent-encoded path bytes (an ASGI scope's
+            `raw_path`) instead of decoded strings. Routes are still inserted as
+            strings: their static parts are stored percent-encoded. Captured values
+            are percent-decoded only when they are accessed.
+        case_insensitive (bool): Match paths regardless of case. Static labels are
+            case-folded once, when inserted, and each path is folded once per lookup.
+            Captured values keep the case of the path that was looked up.
+        prefilter (bool): Maintain a `Prefilter` while inserting, so that lookups of
+            paths that cannot match any route (such as scanner traffic) return a miss
+            without searching the tree. See `tokamak.radix_tree.prefilter`.
+        prefilter_false_positive_rate (float): How often the prefilter's Bloom filter
+            may let through a path that doesn't match (which is then searched as usual).
+        limits (LookupLimits): Bounds on the work a single lookup may do (path length,
+            nodes visited, regex calls). A lookup that exceeds them returns a miss or
+            raises `LookupLimitError`, depending on `limits.action`.
     """
 
     def __init__(
@@ -19,18 +158,51 @@ class Tree:
         separator: str = "/",
         default_handler: Any = None,
         trailing_slash_match: TrailingSlashMatch = TrailingSlashMatch.RELAXED,
+        thread_safe: bool = False,
+        raw_bytes: bool = False,
+        case_insensitive: bool = False,
+        prefilter: bool = False,
+        prefilter_false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+        limits: LookupLimits | None = None,
     ):
-        if default_handler is not None:
-            self._root: node.RadixNode = node.RadixNode(
-                "", separator=separator, leaf=node.LeafNode(default_handler)
-            )
-        else:
-            self._root = node.RadixNode("", separator=separator)
-
+        self._root: node.RadixNode = node.RadixNode(
+            b"" if raw_bytes else "", handler=default_handler  # type: ignore
+        )
         self.separator = separator
+        self.raw_bytes = raw_bytes
+        self.case_insensitive = case_insensitive
+        self._match_separator: str | bytes = separator.encode("ascii") if raw_bytes else separator
         self.trailing_slash_match = trailing_slash_match
+        self.thread_safe = thread_safe
+        self._write_lock: threading.Lock | None = threading.Lock() if thread_safe else None
+        self.prefilter: Prefilter | None = (
+            Prefilter(
+                separator,
+                false_positive_rate=prefilter_false_positive_rate,
+                raw_bytes=raw_bytes,
+            )
+            if prefilter
+            else None
+        )
+        self.limits = limits
+        self._compiled: codegen.CompiledMatcher | None = None
+        self.frozen = False
+        # How many routes (nodes holding a handler) the tree has
+        self._count = 0
 
     def insert(self, path: str, handler: Any) -> None:
+        if self.frozen:
+            raise ValueError("Cannot insert into a frozen tree")
+        path = self._route_path(path)
+        if self._write_lock is None:
+            self._insert(path, handler)
+            return None
+        with self._write_lock:
+            self._insert(path, handler)
+        return None
+
+    def _route_path(self, path: str) -> str:
+        """Checks a route and drops its trailing separator (unless that's significant)"""
         if not path.startswith(self.separator):
             raise ValueError(f"Path must start with '{self.separator}'")
 
@@ -40,23 +212,581 @@ class Tree:
             and path[-1] == self.separator
         ):
             path = path[:-1]
-        self._root.insert(path, handler)
+        return path
+
+    def _find_route(self, root: node.RadixNode, path: str) -> list[node.RadixNode] | None:
+        return node.find_route(
+            root,
+            path,
+            raw_bytes=self.raw_bytes,
+            case_insensitive=self.case_insensitive,
+            separator=self.separator,
+        )
+
+    def _insert(self, path: str, handler: Any) -> None:
+        """Inserts a checked route: in thread-safe trees, the caller holds the write lock"""
+        # A compiled matcher only knows the routes it was compiled with
+        self._compiled = None
+        found = self._find_route(self._root, path)
+        is_new = found is None or found[-1].handler is None
+        if self._write_lock is None:
+            self._root.insert(
+                path,
+                handler,
+                raw_bytes=self.raw_bytes,
+                case_insensitive=self.case_insensitive,
+                separator=self.separator,
+            )
+            self._add_to_prefilter(path)
+        else:
+            new_root = node.copy_insert_path(
+                self._root, node.tree_path(path, self.raw_bytes, self.case_insensitive)
+            )
+            new_root.insert(
+                path,
+                handler,
+                raw_bytes=self.raw_bytes,
+                case_insensitive=self.case_insensitive,
+                separator=self.separator,
+            )
+            # The prefilter must know the path before readers can find it in the tree
+            self._add_to_prefilter(path)
+            self._root = new_root
+        if is_new:
+            self._count += 1
+        return None
+
+    def _add_to_prefilter(self, path: str) -> None:
+        if self.prefilter is None:
+            return None
+        self._add_stored_to_prefilter(node.tree_path(path, self.raw_bytes, self.case_insensitive))
+        return None
+
+    def _add_stored_to_prefilter(self, stored: str) -> None:
+        self.prefilter.add(stored.encode("ascii") if self.raw_bytes else stored)  # type: ignore
+        return None
+
+    def get_handler(self, path: str | bytes) -> tuple[Any, utils.CaptureMap]:
+        """
+        Returns the handler for `path` and the values captured from it.
+
+        A `raw_bytes` tree expects raw path bytes, but also accepts decoded
+        strings, which it percent-encodes first.
+        """
+        if self.raw_bytes and isinstance(path, str):
+            path = utils.quote_label(path)
 
-    def get_handler(self, path: str) -> tuple[Any, dict[str, str]]:
         if (
             self.trailing_slash_match is TrailingSlashMatch.RELAXED
             and len(path) > 1
-            and path[-1] == self.separator
+            and path.endswith(self._match_separator)  # type: ignore
+        ):
+            path = path[:-1]
+
+        # Read the root once: in thread-safe mode it may be replaced while we search
+        root = self._root
+        limits = self.limits
+        if (
+            limits is not None
+            and limits.max_path_length is not None
+            and len(path) > limits.max_path_length
+        ):
+            return self._limit_exceeded(root, path, PathTooLongError("Path is longer than `max_path_length`"))
+
+        folded = node.fold_label(path) if self.case_insensitive else path
+        if self.prefilter is not None and not self.prefilter.may_match(folded):
+            return root.handler, utils.CaptureMap(path, [])
+
+        captures: list[tuple[str, int, int]] = []
+        if limits is not None:
+            try:
+                result = root.search_limited(folded, 0, captures, SearchBudget(limits))
+            except LookupLimitError as exc:
+                return self._limit_exceeded(root, path, exc)
+            context = self._capture_map(path, folded, captures)
+        else:
+            compiled = self._compiled
+            searcher = compiled if compiled is not None and compiled.root is root else root
+            if not self.case_insensitive:
+                result, context = searcher.search_path(path)  # type: ignore
+            else:
+                result = searcher.search(folded, 0, captures)
+                context = self._capture_map(path, folded, captures)
+        if result and result.handler:
+            return result.handler, context
+        return root.handler, context
+
+    def iter_matches(self, path: str | bytes) -> Iterator[tuple[Any, utils.CaptureMap]]:
+        """
+        Yields `(handler, context)` for every route that matches `path`, lazily, in
+        the order lookups try them: the first one is what `get_handler` returns
+        (unless it stops at a node without a handler, see `RadixNode.search`).
+
+        The tree is walked once: routes sharing a prefix don't match it again. Each
+        context only holds the values captured by its own route. The default handler
+        is never yielded.
+        """
+        if self.raw_bytes and isinstance(path, str):
+            path = utils.quote_label(path)
+
+        if (
+            self.trailing_slash_match is TrailingSlashMatch.RELAXED
+            and len(path) > 1
+            and path.endswith(self._match_separator)  # type: ignore
         ):
             path = path[:-1]
 
-        context: dict[str, str] = {}
-        result, context = self._root.search_path(path, context=context)
-        if result and result.leaf and result.leaf.handler:
-            return result.leaf.handler, context
-        if self._root.leaf is not None:
-            return self._root.leaf.handler, context
-        return None, context
+        root = self._root
+        limits = self.limits
+        if (
+            limits is not None
+            and limits.max_path_length is not None
+            and len(path) > limits.max_path_length
+        ):
+            self._limit_exceeded(root, path, PathTooLongError("Path is longer than `max_path_length`"))
+            return None
+
+        folded = node.fold_label(path) if self.case_insensitive else path
+        if self.prefilter is not None and not self.prefilter.may_match(folded):
+            return None
+
+        budget = SearchBudget(limits) if limits is not None else None
+        try:
+            for matched, captures in node.iter_matches(root, folded, budget):
+                yield matched.handler, self._capture_map(path, folded, captures)
+        except LookupLimitError as exc:
+            self._limit_exceeded(root, path, exc)
+        return None
+
+    def longest_prefix(self, path: str | bytes) -> tuple[Any, utils.CaptureMap]:
+        """
+        Returns the handler of the deepest route that covers `path` (and the values
+        captured on the way), the way an IP routing table picks the longest prefix.
+
+        A route covers a path when it's a prefix of the path ending at a separator:
+        `/admin` covers `/admin` and `/admin/users`, but not `/administrator`.
+        Returns the default handler when no route covers `path`.
+
+        Only branches of the tree that match `path` are walked: without parameters,
+        that's a single walk down. Between routes of the same length, the first one
+        a lookup would try wins.
+        """
+        if self.raw_bytes and isinstance(path, str):
+            path = utils.quote_label(path)
+
+        root = self._root
+        limits = self.limits
+        if (
+            limits is not None
+            and limits.max_path_length is not None
+            and len(path) > limits.max_path_length
+        ):
+            return self._limit_exceeded(root, path, PathTooLongError("Path is longer than `max_path_length`"))
+
+        folded = node.fold_label(path) if self.case_insensitive else path
+        captures: list[tuple[str, int, int]] = []
+        budget = SearchBudget(limits) if limits is not None else None
+        try:
+            found = node.longest_prefix(root, folded, self._match_separator, captures, budget)
+        except LookupLimitError as exc:
+            return self._limit_exceeded(root, path, exc)
+        context = self._capture_map(path, folded, captures)
+        if found is not None:
+            return found.handler, context
+        return root.handler, context
+
+    @staticmethod
+    def _capture_map(path: Any, folded: Any, captures: list[tuple[str, int, int]]) -> utils.CaptureMap:
+        # Captures are offsets into the folded path: they line up with the original
+        # path unless folding changed its length (as with "ß" -> "ss").
+        return utils.CaptureMap(
+            path if len(folded) == len(path) else folded,
+            captures,
+            decode=utils.unquote_capture if isinstance(path, bytes) else None,
+        )
+
+    def _limit_exceeded(
+        self, root: node.RadixNode, path: Any, error: LookupLimitError
+    ) -> tuple[Any, utils.CaptureMap]:
+        if self.limits is not None and self.limits.action is LimitAction.RAISE:
+            raise error
+        return root.handler, utils.CaptureMap(path, [])
+
+    def __getitem__(self, path: str) -> Any:
+        """
+        Returns the handler stored for the route `path`. This is an exact lookup of
+        the route itself (`tree["/users/{id}"]`): use `get_handler` to match paths.
+        """
+        try:
+            route = self._route_path(path)
+        except ValueError:
+            raise KeyError(path) from None
+        found = self._find_route(self._root, route)
+        if found is None or found[-1].handler is None:
+            raise KeyError(path)
+        return found[-1].handler
+
+    def __setitem__(self, path: str, handler: Any) -> None:
+        """Stores `handler` for the route `path`, replacing any handler it had"""
+        if handler is None:
+            raise ValueError("Cannot store `None`: it means a node has no handler")
+        if self.frozen:
+            raise ValueError("Cannot insert into a frozen tree")
+        route = self._route_path(path)
+        if self._write_lock is None:
+            self._set_handler(route, handler)
+            return None
+        with self._write_lock:
+            self._set_handler(route, handler)
+        return None
+
+    def _set_handler(self, route: str, handler: Any) -> None:
+        found = self._find_route(self._root, route)
+        if found is None or found[-1].handler is None:
+            self._insert(route, handler)
+            return None
+        if self._write_lock is None:
+            found[-1].handler = handler
+            return None
+        new_root = node.copy_insert_path(
+            self._root, node.tree_path(route, self.raw_bytes, self.case_insensitive)
+        )
+        new_found = self._find_route(new_root, route)
+        new_found[-1].handler = handler  # type: ignore
+        self._compiled = None
+        self._root = new_root
+        return None
+
+    def __delitem__(self, path: str) -> None:
+        """
+        Removes the route `path`. Nodes that no other route needs are removed, and
+        labels are merged again where the route had split them.
+
+        The prefilter (if any) keeps the route: it may let more paths through to the
+        tree, but never rejects a path that matches.
+        """
+        if self.frozen:
+            raise ValueError("Cannot delete from a frozen tree")
+        try:
+            route = self._route_path(path)
+        except ValueError:
+            raise KeyError(path) from None
+        if self._write_lock is None:
+            self._delete(route, path)
+            return None
+        with self._write_lock:
+            self._delete(route, path)
+        return None
+
+    def _delete(self, route: str, path: str) -> None:
+        found = self._find_route(self._root, route)
+        if found is None or found[-1].handler is None:
+            raise KeyError(path)
+        self._compiled = None
+        if self._write_lock is None:
+            node.remove_route(found)
+        else:
+            new_root = node.copy_insert_path(
+                self._root, node.tree_path(route, self.raw_bytes, self.case_insensitive)
+            )
+            node.remove_route(self._find_route(new_root, route))  # type: ignore
+            self._root = new_root
+        self._count -= 1
+        return None
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        """The number of routes: kept up to date by inserts and deletes"""
+        return self._count
+
+    def __bool__(self) -> bool:
+        """
+        A Tree is always truthy, like a RadixNode: a tree without routes still
+        has its default handler, and `if router.tree` shouldn't depend on `len`.
+        """
+        return True
+
+    def keys(self, prefix: str = "", limit: int | None = None) -> Iterator[str]:  # type: ignore[override]
+        """
+        Yields the routes in this tree that start with `prefix`, sorted by the form
+        they are stored in. Routes of `case_insensitive` trees are case-folded.
+
+        Routes are rebuilt while walking down the tree, so only the current branch is
+        held in memory, and walking stops after `limit` routes (for autocompletion).
+
+        Args:
+            prefix (str): Only yield routes starting with this text.
+            limit (int): Yield at most this many routes.
+        """
+        for route, _ in self.items(prefix=prefix, limit=limit):
+            yield route
+
+    def values(self, prefix: str = "", limit: int | None = None) -> Iterator[Any]:  # type: ignore[override]
+        """Yields the handlers of the routes that start with `prefix` (see `keys`)"""
+        for _, handler in self.items(prefix=prefix, limit=limit):
+            yield handler
+
+    def items(  # type: ignore[override]
+        self, prefix: str = "", limit: int | None = None
+    ) -> Iterator[tuple[str, Any]]:
+        """
+        Yields `(route, handler)` for the routes in this tree that start with `prefix`
+        (see `keys`).
+
+        Args:
+            prefix (str): Only yield routes starting with this text.
+            limit (int): Yield at most this many routes.
+        """
+        if limit is not None and limit < 0:
+            raise ValueError("`limit` must not be negative")
+        if self.raw_bytes or self.case_insensitive:
+            prefix = node.label_str(node.static_label(prefix, self.raw_bytes, self.case_insensitive))
+        routes = node.iter_routes(self._root, prefix)
+        for route, found in itertools.islice(routes, limit):
+            yield self._route_text(route), found.handler
+
+    def _route_text(self, stored: str) -> str:
+        """A route as it is stored (see `node.tree_path`), as it's shown to callers"""
+        if not self.raw_bytes:
+            return stored
+        # static parts are stored percent-encoded
+        return "".join(
+            part.raw if isinstance(part, utils.DynamicParseNode) else unquote(part)
+            for part in utils.parse_dynamic(stored, self.separator)
+        )
+
+    def merge(self, other: "Tree", consume: bool = False) -> list[str]:
+        """
+        Adds the routes of `other` to this tree, and returns the routes that have a
+        different handler in each tree, sorted. Those keep the handler from this tree;
+        routes with the same handler in both are not conflicts.
+
+        Merging visits each node of `other` once and attaches whole subtrees this tree
+        doesn't have, so it takes time linear in the size of `other` (and of the part
+        of this tree the two share), not a walk down this tree per route.
+
+        Args:
+            other (Tree): A tree created with the same options (separator, trailing
+                slashes, `raw_bytes` and `case_insensitive`).
+            consume (bool): Move the nodes of `other` into this tree instead of copying
+                them, which is faster and leaves `other` empty. `other` is otherwise
+                left untouched.
+        """
+        if self.frozen:
+            raise ValueError("Cannot merge into a frozen tree")
+        if consume and other.frozen:
+            raise ValueError("Cannot consume a frozen tree")
+        if other is self:
+            raise ValueError("Cannot merge a tree into itself")
+        self._check_compatible(other, "merge")
+        if self._write_lock is None:
+            return self._merge(other, consume)
+        with self._write_lock:
+            return self._merge(other, consume)
+
+    def _merge(self, other: "Tree", consume: bool) -> list[str]:
+        incoming = other._root
+        if self.prefilter is not None:
+            for route, _ in node.iter_routes(incoming):
+                self._add_stored_to_prefilter(route)
+        self._compiled = None
+        if self._write_lock is None:
+            conflicts, shared = node.merge_tree(self._root, incoming, consume=consume)
+        else:
+            # readers may be walking this tree: copy the nodes the merge changes
+            new_root = self._root.copy()
+            conflicts, shared = node.merge_tree(new_root, incoming, consume=consume, copy_on_write=True)
+            self._root = new_root
+        self._count += other._count - shared
+
+        if consume:
+            other._root = node.RadixNode(incoming.path, handler=incoming.handler)
+            other._count = 0
+            other._compiled = None
+        return [self._route_text(route) for route in conflicts]
+
+    def diff(self, other: "Tree | Mapping[str, Any]") -> RouteDiff:
+        """
+        Returns the changes that turn the routes of this tree into those of `other`: a
+        tree created with the same options, or a mapping of routes to handlers (such as
+        a reloaded route manifest). Handlers are compared with `==`.
+
+        Routes in a mapping are written as for `insert`. Parameters are compared as
+        written, so `{id}` and `{id:*}` differ here even though they match the same.
+        """
+        mine = {route: found.handler for route, found in node.iter_routes(self._root)}
+        if isinstance(other, Tree):
+            self._check_compatible(other, "compare")
+            theirs = {route: found.handler for route, found in node.iter_routes(other._root)}
+        else:
+            theirs = {
+                node.tree_path(self._route_path(path), self.raw_bytes, self.case_insensitive): handler
+                for path, handler in sorted(other.items(), key=itemgetter(0))
+            }
+
+        diff = RouteDiff()
+        for route, handler in mine.items():
+            if route not in theirs:
+                diff.removed[self._route_text(route)] = handler
+            elif theirs[route] != handler:
+                diff.changed[self._route_text(route)] = (handler, theirs[route])
+        for route, handler in theirs.items():
+            if route not in mine:
+                diff.added[self._route_text(route)] = handler
+        return diff
+
+    def apply(self, diff: RouteDiff) -> None:
+        """
+        Applies the changes in `diff` (see `diff`): routes are removed, given their new
+        handler, and added. Only the nodes along those routes are touched, so a small
+        diff is much cheaper than building the tree again.
+
+        Frozen trees can be updated this way. Where routes were added or removed, their
+        parents' alternations are rebuilt. A compiled matcher (`compile_to_python`) is
+        kept when only handlers change, and dropped otherwise: compile the tree again.
+        """
+        # Check before changing anything, so that a stale diff changes nothing
+        for path in itertools.chain(diff.removed, diff.changed):
+            if path not in self:
+                raise KeyError(path)
+        if any(handler is None for handler in diff.added.values()):
+            raise ValueError("Cannot store `None`: it means a node has no handler")
+        if self._write_lock is None:
+            self._apply(diff)
+            return None
+        with self._write_lock:
+            self._apply(diff)
+        return None
+
+    def _apply(self, diff: RouteDiff) -> None:
+        for path in diff.removed:
+            self._delete(self._route_path(path), path)
+        for path, (_, handler) in diff.changed.items():
+            found = self._find_route(self._root, self._route_path(path))
+            # a single assignment: readers see either the old or the new handler
+            found[-1].handler = handler  # type: ignore
+        for path, handler in diff.added.items():
+            self._set_handler(self._route_path(path), handler)
+
+        if self.frozen:
+            touched: dict[int, node.RadixNode] = {}
+            for path in itertools.chain(diff.removed, diff.added):
+                chain = node.find_route(
+                    self._root,
+                    self._route_path(path),
+                    raw_bytes=self.raw_bytes,
+                    case_insensitive=self.case_insensitive,
+                    separator=self.separator,
+                    partial=True,
+                )
+                touched.update((id(found), found) for found in chain)  # type: ignore
+            node.update_alternations(touched.values())
+        return None
+
+    def _check_compatible(self, other: "Tree", action: str) -> None:
+        if (self.separator, self.trailing_slash_match, self.raw_bytes, self.case_insensitive) != (
+            other.separator,
+            other.trailing_slash_match,
+            other.raw_bytes,
+            other.case_insensitive,
+        ):
+            raise ValueError(f"Cannot {action} trees created with different options")
+
+    def freeze(self) -> None:
+        """
+        Marks the tree as complete: no more routes may be inserted.
+
+        Nodes with several dynamic children (such as `{id:[0-9]+}` and `{slug:[a-z-]+}`)
+        get a single alternation of their regexes, so a lookup tries them all with one
+        regex call instead of one call per child. Matching is otherwise unchanged.
+        """
+        if self._write_lock is None:
+            node.build_alternations(self._root)
+            self.frozen = True
+            return None
+        with self._write_lock:
+            node.build_alternations(self._root)
+            self.frozen = True
+        return None
+
+    def compile_to_python(self, cache_path: str | os.PathLike | None = None) -> codegen.CompiledMatcher:
+        """
+        Generates a Python function that matches paths against the current routes,
+        and uses it for lookups until the next insert. Lookups with `limits` still
+        walk the tree.
+
+        The generated source is available as `.source` on the returned matcher. With
+        a `cache_path`, it is also written next to that file, under a name including
+        a hash of the source (`.cache_file`), and Python's byte-compiled copy of it is
+        reused across restarts while the routes stay the same.
+
+        Args:
+            cache_path (str | PathLike): Optional file name to store the generated source
+                under (see `codegen.cache_file_for`).
+        """
+        compiled = codegen.compile_tree(self._root, cache_path=cache_path)
+        self._compiled = compiled
+        return compiled
+
+    def stats(self) -> TreeStats:
+        """
+        Walks the tree once (without recursion) and reports on its structure.
+
+        Useful for spotting route tables with deep or wide nodes, which make lookups
+        slower, and for watching memory use grow across deploys.
+        """
+        node_count = leaf_count = handler_count = static_count = dynamic_count = 0
+        max_depth = route_depths = 0
+        fanout: Counter[int] = Counter()
+        regexes: set[str] = set()
+        seen: set[int] = set()
+        estimated_bytes = 0
+
+        def size_once(obj: Any) -> int:
+            if id(obj) in seen:
+                return 0
+            seen.add(id(obj))
+            return sys.getsizeof(obj)
+
+        # The shared empty child set and empty sets cost nothing per node
+        seen.update((id(node.NO_CHILDREN), id(node.NO_NODES)))
+        stack: list[tuple[node.RadixNode, int]] = [(self._root, 0)]
+        while stack:
+            current, depth = stack.pop()
+            node_count += 1
+            max_depth = max(max_depth, depth)
+            children = current.children
+            fanout[len(children)] += 1
+            if not children:
+                leaf_count += 1
+            if current.handler is not None and depth > 0:
+                handler_count += 1
+                route_depths += depth
+            if isinstance(current, node.DynamicNode):
+                dynamic_count += 1
+                regexes.add(current.parser.regex)
+            elif depth > 0:
+                static_count += 1
+
+            estimated_bytes += sys.getsizeof(current) + size_once(current.path)
+            estimated_bytes += size_once(children)
+            estimated_bytes += size_once(children.static_nodes) + size_once(children.dynamic_nodes)
+            stack.extend((child, depth + 1) for child in children)
+
+        return TreeStats(
+            node_count=node_count,
+            leaf_count=leaf_count,
+            handler_count=handler_count,
+            static_count=static_count,
+            dynamic_count=dynamic_count,
+            max_depth=max_depth,
+            mean_depth=route_depths / handler_count if handler_count else 0.0,
+            fanout=dict(sorted(fanout.items())),
+            regex_count=len(regexes),
+            estimated_bytes=estimated_bytes,
+        )
 
     def prettyprint(self) -> None:  # pragma: no cover
         return self._root.prettyprint()
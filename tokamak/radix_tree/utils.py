@@ -4,8 +4,14 @@ import logging
 import re
 import typing
 from collections import deque
+from collections.abc import Callable, Iterator, Mapping
+from urllib.parse import quote, unquote_to_bytes
+
+from . import limits
 
 logger = logging.getLogger("tokamak")
+# Characters allowed unescaped in a URL path (RFC 3986 `pchar` plus the separator)
+PATH_SAFE_CHARS = "/:@!$&'()*+,;=-._~"
 
 
 @enum.unique
@@ -25,11 +31,18 @@ class ParamToken(enum.Enum):
 
 
 class DynamicParseNode:
+    """
+    A parameter parsed out of a path, such as `{id}` or `{id:[0-9]+}`.
+
+    A parameter without a regex (or with `*`) matches everything up to the next
+    `separator`.
+    """
+
     MATCH_UP_TO_SLASH = "[^/]+"
     VALID_NAME_REGEX = re.compile(r"([a-zA-Z_][a-zA-Z0-9_]*)")
-    __slots__ = ["raw", "name", "regex", "_pattern"]
+    __slots__ = ["raw", "name", "regex", "_pattern", "_bytes_pattern"]
 
-    def __init__(self, raw: str, name: str, regex: str | None = None):
+    def __init__(self, raw: str, name: str, regex: str | None = None, separator: str = "/"):
         if any(
             (
                 len(raw) == 0,
@@ -42,10 +55,12 @@ class DynamicParseNode:
         self.raw = raw
         self.name = name
         if regex == ParamToken.STAR.value or regex is None:
-            self.regex: str = self.MATCH_UP_TO_SLASH
+            self.regex: str = self.match_up_to(separator)
         else:
-            self.regex = regex
+            # nested quantifiers are made atomic where that can't change what matches
+            self.regex = limits.harden_regex(regex)
         self._pattern: re.Pattern | None = None
+        self._bytes_pattern: re.Pattern | None = None
 
         match = self.VALID_NAME_REGEX.match(self.name)
         if not self.name or not match:
@@ -53,6 +68,15 @@ class DynamicParseNode:
         if not match.end() == len(self.name):
             raise ValueError("Invalid parameter name")
 
+    @classmethod
+    def match_up_to(cls, separator: str) -> str:
+        """The default regex of a parameter: everything up to the next `separator`"""
+        if separator == "/":
+            return cls.MATCH_UP_TO_SLASH
+        if len(separator) == 1:
+            return f"[^{re.escape(separator)}]+"
+        return f"(?:(?!{re.escape(separator)}).)+"
+
     def __eq__(self, other) -> bool:  # type: ignore
         return (
             self.raw == other.raw
@@ -69,6 +93,24 @@ class DynamicParseNode:
         self._pattern = re.compile(pat)
         return self._pattern
 
+    @property
+    def bytes_pattern(self) -> re.Pattern:
+        """The same pattern, compiled for matching `bytes` (raw, percent-encoded paths)"""
+        if self._bytes_pattern is not None:
+            return self._bytes_pattern
+
+        pat: str = rf"(?P<{self.name}>{self.regex})"
+        self._bytes_pattern = re.compile(pat.encode("utf-8"))
+        return self._bytes_pattern
+
+    def compile(self, raw_bytes: bool = False, ignore_case: bool = False) -> re.Pattern:
+        """Returns this parameter's pattern for matching `str` or raw `bytes` paths"""
+        if not ignore_case:
+            return self.bytes_pattern if raw_bytes else self.pattern
+
+        pat: str = rf"(?P<{self.name}>{self.regex})"
+        return re.compile(pat.encode("utf-8") if raw_bytes else pat, re.IGNORECASE)
+
     def match(
         self, query: str
     ) -> tuple[int, dict[str, str] | None]:
@@ -78,6 +120,67 @@ class DynamicParseNode:
         return -1, None
 
 
+class CaptureMap(Mapping):
+    """
+    A read-only mapping of the values captured by dynamic nodes during a search.
+
+    While searching, dynamic nodes only record `(name, start, end)` offsets into the
+    path being searched. Strings are sliced out of the path (and decoded, if a
+    `decode` function is given) only when a value is accessed, so handlers that never
+    read their context never pay for it.
+
+    If a name was captured more than once, the last capture wins.
+
+    Args:
+        path (str): The path that was searched.
+        captures (list): `(name, start, end)` tuples in the order they were captured.
+        decode (Callable): Optional function applied to each sliced value.
+    """
+
+    __slots__ = ["_path", "_captures", "_decode"]
+
+    def __init__(
+        self,
+        path: typing.Any,
+        captures: list[tuple[str, int, int]],
+        decode: Callable[[typing.Any], str] | None = None,
+    ):
+        self._path = path
+        self._captures = captures
+        self._decode = decode
+
+    def __getitem__(self, key: str) -> str:
+        for name, start, end in reversed(self._captures):
+            if name == key:
+                value = self._path[start:end]
+                if self._decode is not None:
+                    return self._decode(value)
+                return value
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(dict.fromkeys(name for name, _, _ in self._captures))
+
+    def __len__(self) -> int:
+        return len({name for name, _, _ in self._captures})
+
+    def __bool__(self) -> bool:
+        return bool(self._captures)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+def quote_label(label: str) -> bytes:
+    """Percent-encodes a static label (or a whole request path) into raw path bytes"""
+    return quote(label, safe=PATH_SAFE_CHARS).encode("ascii")
+
+
+def unquote_capture(value: bytes) -> str:
+    """Decodes a value captured from a raw path: percent-decoding, then UTF-8"""
+    return unquote_to_bytes(value).decode("utf-8", "replace")
+
+
 @functools.lru_cache(maxsize=65536)
 def first_nonequal_idx(left: str, right: str) -> int:
     """
@@ -101,7 +204,9 @@ def first_nonequal_idx(left: str, right: str) -> int:
     return idx
 
 
-def parse_dynamic(path: str) -> typing.Iterator[typing.Union[str, "DynamicParseNode"]]:
+def parse_dynamic(
+    path: str, separator: str = "/"
+) -> typing.Iterator[typing.Union[str, "DynamicParseNode"]]:
     """
     This method discerns the dynamic elements in a string.
 
@@ -124,6 +229,8 @@ def parse_dynamic(path: str) -> typing.Iterator[typing.Union[str, "DynamicParseN
         <tokamak.types.DynamicParseNode at 0x7f82e1b3a280>,
         '/bla/bla/',
         <tokamak.types.DynamicParseNode at 0x7f82e1b3a220>]
+
+    Parameters without a regex match everything up to the next `separator`.
     """
     stack: deque[int] = deque()
     regex_stack: deque[int] = deque()
@@ -182,7 +289,7 @@ def parse_dynamic(path: str) -> typing.Iterator[typing.Union[str, "DynamicParseN
                 has_regex = False
                 raw = path[start : idx + 1]
                 name = path[start + 1 : colon]
-                yield DynamicParseNode(raw, name, regex=regex)
+                yield DynamicParseNode(raw, name, regex=regex, separator=separator)
                 last_dyn_node_idx = idx
                 inside_dyn = False
 
@@ -1,7 +1,7 @@
-from collections.abc import Callable, Iterable
+from collections.abc import Callable, Iterable, Mapping
 
 from tokamak import methods as tokmethods
-from tokamak.radix_tree import tree
+from tokamak.radix_tree import explain, limits, packed, tree
 
 
 class RouterError(ValueError):
@@ -16,6 +16,10 @@ class MethodNotAllowedError(RouterError):
     pass
 
 
+# Most routes accept only GET, so they all share this one (immutable) set
+DEFAULT_METHODS: frozenset[str] = frozenset((tokmethods.Method.GET.value,))
+
+
 class Route:
     """
     A Route for a Tokamak Application represents:
@@ -33,6 +37,8 @@ class Route:
         methods (List[str]): A list of accepted methods for this endpoint
     """
 
+    __slots__ = ["handler", "path", "methods"]
+
     def __init__(
         self,
         path: str = "",
@@ -43,10 +49,8 @@ class Route:
             raise ValueError(f"Missing `handler` function for path: {path}")
         self.handler = handler
         self.path = path
-        self.methods = (
-            set(m.upper() for m in methods)
-            if methods
-            else {tokmethods.Method.GET.value}
+        self.methods: frozenset[str] = (
+            frozenset(m.upper() for m in methods) if methods else DEFAULT_METHODS
         )
 
     def can_handle(self, method: str):
@@ -88,17 +92,114 @@ class AsgiRouter:
     Args:
         routes (Iterable[Route]): An optional iterable of routes to add.
         trailing_slash_match (TrailingSlashMatch): Strictness property for trailing slashes
+        match_raw_path (bool): Match requests by their raw, percent-encoded path bytes
+            (`scope["raw_path"]`) instead of the decoded path.
+        case_insensitive (bool): Match paths regardless of case.
+        prefilter (bool): Reject paths that cannot match any route (such as scanner
+            traffic) before searching the tree.
+        lookup_limits (LookupLimits): Bounds on the work a single lookup may do. With
+            `LimitAction.RAISE`, `get_route` raises `LookupLimitError` when they're exceeded.
     """
 
     def __init__(
         self,
         routes: Iterable[Route] | None = None,
         trailing_slash_match: tree.TrailingSlashMatch = tree.TrailingSlashMatch.RELAXED,
+        match_raw_path: bool = False,
+        case_insensitive: bool = False,
+        prefilter: bool = False,
+        lookup_limits: limits.LookupLimits | None = None,
     ):
-        self.tree = tree.Tree(trailing_slash_match=trailing_slash_match)
+        self.match_raw_path = match_raw_path
+        self.tree: tree.Tree | packed.PackedTree = tree.Tree(
+            trailing_slash_match=trailing_slash_match,
+            raw_bytes=match_raw_path,
+            case_insensitive=case_insensitive,
+            prefilter=prefilter,
+            limits=lookup_limits,
+        )
+        # Routes in the order they were added: this is the handler table for shared route tables
+        self.routes: list[Route] = []
+        # The router that paths matching none of these routes are looked up in (see `overlay`)
+        self.base: AsgiRouter | None = None
         if routes:
             self.build_route_tree(routes)
 
+    @classmethod
+    def from_route_table(cls, table: packed.SharedRouteTable) -> "AsgiRouter":
+        """
+        Creates a read-only router that matches directly against a shared route table.
+
+        Example:
+
+            # In the parent process, before starting workers:
+            table = AsgiRouter(routes=ROUTES).share()
+
+            # In each worker, with the same routes in the same order:
+            table = SharedRouteTable.attach(name, handlers=ROUTES)
+            router = AsgiRouter.from_route_table(table)
+
+        The router keeps the shared tree's options, including its `prefilter` and
+        `lookup_limits`.
+
+        Args:
+            table (SharedRouteTable): A table created by `AsgiRouter.share`.
+        """
+        router = cls(match_raw_path=table.tree.raw_bytes)
+        router.tree = table.tree
+        router.routes = list(table.handlers)
+        return router
+
+    def share(self, name: str | None = None) -> packed.SharedRouteTable:
+        """
+        Packs this router's tree into a shared memory segment, so that worker
+        processes can attach to it instead of each building their own tree.
+
+        Leaves refer to routes by their position in `self.routes`, so workers
+        must attach with the same routes, in the same order. The tree's `prefilter`
+        and `lookup_limits` are shared with it.
+
+        Args:
+            name (str): Optional name for the shared memory segment.
+        """
+        if not isinstance(self.tree, tree.Tree) or self.base is not None:
+            raise RouterError("Only a router built from routes can be shared")
+        return packed.SharedRouteTable.create(self.tree, handlers=self.routes, name=name)
+
+    def overlay(self, routes: Iterable[Route] | None = None) -> "AsgiRouter":
+        """
+        Creates a router whose own routes are layered over this one's: paths that
+        match none of its routes are looked up in this router. Nothing is copied, so
+        any number of overlays (one per tenant, for instance) can share this router,
+        and each only costs as much memory as its own routes.
+
+        Example:
+
+            base = AsgiRouter(routes=COMMON_ROUTES)
+            tenants = {name: base.overlay(routes) for name, routes in TENANT_ROUTES.items()}
+
+        Overlay routes take precedence over base routes for every path they match,
+        including a parameter such as `/{page}` over a static base route. Overlays
+        are created with this router's options. This router's tree is frozen, so
+        that no overlay sees the base change under it: add its routes first.
+
+        Args:
+            routes (Iterable[Route]): An optional iterable of routes to add to the overlay.
+        """
+        if isinstance(self.tree, tree.Tree) and not self.tree.frozen:
+            self.tree.freeze()
+        layer = type(self)(
+            trailing_slash_match=self.tree.trailing_slash_match,
+            match_raw_path=self.tree.raw_bytes,
+            case_insensitive=self.tree.case_insensitive,
+            prefilter=self.tree.prefilter is not None,
+            lookup_limits=self.tree.limits,
+        )
+        layer.base = self
+        if routes:
+            layer.build_route_tree(routes)
+        return layer
+
     def build_route_tree(self, routes: Iterable[Route]) -> None:
         """
         Builds the full routing tree.
@@ -117,20 +218,57 @@ class AsgiRouter:
             route (Route): A route to add.
         """
         self.tree.insert(route.path, route)
+        self.routes.append(route)
 
-    def get_route(self, path: str) -> tuple[Route, dict[str, str]]:
+    def get_route(self, path: str | bytes) -> tuple[Route, Mapping[str, str]]:
         """
         Search for a matching route by path.
 
         Args:
-            path (str): The path to search for.
+            path (str | bytes): The path to search for. Routers created with
+                `match_raw_path=True` take raw path bytes.
 
         Returns:
-            Tuple[Router, context-dictionary]
+            Tuple[Router, context-mapping]: values in the context are only
+            extracted from the path when they are accessed.
 
-        Raises `UnknownEndpointError` if no path matched.
+        Raises `UnknownEndpointError` if no path matched, and `LookupLimitError` if
+        the lookup exceeded the router's `lookup_limits` (with `LimitAction.RAISE`).
         """
         route, context = self.tree.get_handler(path)
         if not route:
+            if self.base is not None:
+                return self.base.get_route(path)
+            if isinstance(path, bytes):
+                path = path.decode("latin-1")
             raise UnknownEndpointError(f"Unknown path: {path}")
         return route, context
+
+    def explain(self, path: str | bytes) -> explain.Explanation:
+        """
+        Looks `path` up the way `get_route` does, and returns every step of the lookup:
+        each label compared, each regex tried, each branch given up on and why, and
+        the route found in the end (see `tokamak.radix_tree.explain`).
+
+        Example:
+
+            print(router.explain("/files/backup_format"))
+
+        This is a separate, slower copy of the search: `get_route` itself pays nothing
+        for it. An overlay's explanation continues with its base router's steps.
+
+        Args:
+            path (str | bytes): The path to look up.
+        """
+        if not isinstance(self.tree, tree.Tree):
+            raise RouterError("Only a router built from routes can explain lookups")
+        explanation = explain.explain(self.tree, path)
+        if explanation.route is not None or self.base is None:
+            return explanation
+        reason = "no route matched: the lookup goes on in the base router"
+        explanation.steps.append(explain.SearchStep(explain.BASE, "", 0, None, reason))
+        base_explanation = self.base.explain(path)
+        base_explanation.steps[:0] = explanation.steps
+        base_explanation.visited += explanation.visited
+        base_explanation.regex_calls += explanation.regex_calls
+        return base_explanation
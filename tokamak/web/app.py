@@ -4,6 +4,7 @@ from collections.abc import Awaitable, Callable
 from functools import partial
 
 from tokamak import methods, router
+from tokamak.radix_tree.limits import LookupLimitError, PathTooLongError
 from tokamak.web import errors
 from tokamak.web.request import Request
 from tokamak.web.response import Response
@@ -126,11 +127,22 @@ class Tokamak:
         HTTP request handler.
         """
         path: str = scope.get("path", "")
+        lookup: str | bytes = path
+        if self.router.match_raw_path:
+            # Skip decoding: captured values are only decoded if a handler reads them
+            lookup = scope.get("raw_path") or path
         try:
-            route, context = self.router.get_route(path)
+            route, context = self.router.get_route(lookup)
         except router.UnknownEndpointError:
             await unknown_handler(scope, receive, send)
             return None
+        except PathTooLongError:
+            await errors.PathTooLongResponse(send)
+            return None
+        except LookupLimitError:
+            # the path is short enough, but matching it takes more work than allowed
+            await errors.LookupLimitExceededResponse(send)
+            return None
 
         # In order to support timeout-cancellations, we open a oneshot channel here
         # Request handlers must put their responses onto the channel
@@ -7,6 +7,8 @@ MethodNotAllowedErrorResponse = response.Response(
 RequestCancelledResponse = response.Response(
     body=b"Request time limit exceeded", status_code=408
 )
+PathTooLongResponse = response.Response(body=b"URI Too Long", status_code=414)
+LookupLimitExceededResponse = response.Response(body=b"Lookup limit exceeded", status_code=400)
 RateLimitedResponse = response.Response(body=b"Rate limit exceeded", status_code=429)
 
 
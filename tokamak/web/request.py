@@ -1,5 +1,5 @@
 import logging
-from collections.abc import Callable
+from collections.abc import Callable, Mapping
 
 from tokamak.web.response import Response
 
@@ -23,7 +23,7 @@ class Request:
 
     Args:
 
-        context (Dict[str, str]): Context from the matching path
+        context (Mapping[str, str]): Context from the matching path
         scope (dict): Request scope dictionary
         receive (Channel): Channel for receiving the request body
         path (str): Path matched for this request
@@ -33,7 +33,7 @@ class Request:
 
     def __init__(
         self,
-        context: dict[str, str],
+        context: Mapping[str, str],
         scope: dict[str, str],
         receive,
         path: str,